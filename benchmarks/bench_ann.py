@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""Recall@k against latency of the IVF index, compared with exact search.
+
+Generates --entities unit vectors clustered around --clusters random centres
+(real embeddings group by topic; --clusters 0 gives uniform random vectors,
+the worst case for IVF), builds the index with write_ivf_index into a
+temporary directory and loads it memory-mapped, like the search service.
+Exact search is the full matrix-vector product the service falls back to;
+it ranks by the same cosine similarity as notebook 03's
+`vec_distance_cosine ... ORDER BY distance` and is the ground truth. Per
+nprobe the table gives recall@k and latency of the raw ANN search and of
+the triple-factor top_k that reranks its candidates (recall against exact
+triple-factor results). With --sqlite-vec-rows and sqlite-vec loadable,
+the notebook's SQL brute force is timed too, on that many rows.
+
+Usage:
+    python -m benchmarks.bench_ann
+    python -m benchmarks.bench_ann --entities 1000000 --dim 768 --nprobe 4 8 16 32
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.run import _peak_rss_mb
+from src.services.ann_index import normalize_rows, write_ivf_index
+from src.services.retrieval import RetrievalIndex
+
+GENERATE_BLOCK = 100_000
+
+
+def clustered_vectors(n: int, dim: int, clusters: int, spread: float, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((max(clusters, 1), dim), dtype=np.float32)
+    vectors = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, GENERATE_BLOCK):
+        stop = min(start + GENERATE_BLOCK, n)
+        block = rng.standard_normal((stop - start, dim), dtype=np.float32)
+        if clusters:
+            block *= np.float32(spread)
+            block += centres[rng.integers(0, clusters, stop - start)]
+        vectors[start:stop] = block
+    return normalize_rows(vectors)
+
+
+def percentiles(times):
+    times = sorted(times)
+    return times[len(times) // 2], times[min(len(times) - 1, int(len(times) * 0.95))]
+
+
+def timed(fn, queries):
+    results, times = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(fn(query))
+        times.append((time.perf_counter() - start) * 1000)
+    return results, percentiles(times)
+
+
+def recall(found, expected):
+    return sum(len(set(f.tolist()) & set(e.tolist())) / max(len(e), 1) for f, e in zip(found, expected)) / len(expected)
+
+
+def bench_sqlite_vec(vectors: np.ndarray, queries: np.ndarray, top_k: int, total: int) -> None:
+    """Notebook 03's brute-force SQL on the first rows, if this Python can load sqlite-vec."""
+    try:
+        import sqlite_vec
+        conn = sqlite3.connect(":memory:")
+        conn.enable_load_extension(True)
+        sqlite_vec.load(conn)
+    except (ImportError, AttributeError, sqlite3.Error) as e:
+        print(f"sqlite-vec brute force: skipped ({e.__class__.__name__}: {e})")
+        return
+    conn.execute(f"CREATE VIRTUAL TABLE entity_embeddings USING vec0(entity_id INTEGER PRIMARY KEY, "
+                 f"embedding FLOAT[{vectors.shape[1]}])")
+    conn.executemany("INSERT INTO entity_embeddings VALUES (?, ?)",
+                     [(i, vectors[i].tobytes()) for i in range(len(vectors))])
+    sql = ("SELECT entity_id, vec_distance_cosine(embedding, ?) AS distance FROM entity_embeddings "
+           "ORDER BY distance LIMIT ?")
+    _, (p50, p95) = timed(lambda q: conn.execute(sql, (q.tobytes(), top_k)).fetchall(), queries)
+    conn.close()
+    print(f"sqlite-vec brute force on {len(vectors)}: p50 {p50:.1f} ms, p95 {p95:.1f} ms, "
+          f"~{p50 * total / len(vectors):.0f} ms at {total}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="IVF recall@k vs latency against exact search")
+    parser.add_argument("--entities", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--clusters", type=int, default=2000, help="Topic centres; 0 for uniform random vectors")
+    parser.add_argument("--spread", type=float, default=0.6, help="Per-dimension noise around a centre, relative to it")
+    parser.add_argument("--nlist", type=int, default=None, help="Inverted lists (default ~4*sqrt(entities))")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--sqlite-vec-rows", type=int, default=0, help="Also time notebook 03's SQL brute force")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    vectors = clustered_vectors(args.entities, args.dim, args.clusters, args.spread, args.seed)
+    rng = np.random.default_rng(args.seed + 1)
+    # Queries near stored vectors, as a query about a topic in the corpus would be: noise of norm ~spread
+    noise = rng.standard_normal((args.queries, args.dim), dtype=np.float32) * np.float32(args.spread / np.sqrt(args.dim))
+    queries = normalize_rows(vectors[rng.choice(args.entities, args.queries, replace=False)] + noise)
+    if args.sqlite_vec_rows:
+        bench_sqlite_vec(vectors[:args.sqlite_vec_rows], queries[:min(args.queries, 10)], args.top_k, args.entities)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        ivf = write_ivf_index(os.path.join(tmp, "entity_embeddings"), np.arange(args.entities), vectors, args.nlist)
+        print(f"{args.entities} x {args.dim}, {args.clusters or 'no'} clusters: IVF with {ivf.nlist} lists "
+              f"built in {time.perf_counter() - start:.1f}s, peak RSS {_peak_rss_mb():.0f} MB")
+        # The index's memory-mapped vectors serve the exact search too, so only one copy is around
+        del vectors
+        pageranks = rng.pareto(2.0, args.entities).astype(np.float32)
+        half_lives = rng.choice(np.array([7, 30, 365], dtype=np.float32), args.entities)
+        index = RetrievalIndex.from_arrays(ivf.ids, ivf.vectors, half_lives, pageranks, normalized=True)
+        index.ann = ivf
+        exact = lambda q: index.top_k(q, args.top_k, 1.0, 0.0, 0.0, exact=True)[0]
+        exact_triple = lambda q: index.top_k(q, args.top_k, content_age_days=10.0, exact=True)[0]
+        exact(queries[0])  # fault the mapped pages in before timing
+
+        truth, (p50, p95) = timed(exact, queries)
+        truth_triple, _ = timed(exact_triple, queries)
+        print(f"exact top-{args.top_k}: p50 {p50:.1f} ms, p95 {p95:.1f} ms")
+        print(f"{'nprobe':>6} {'scanned':>8} {'recall':>7} {'p50 ms':>7} {'p95 ms':>7} {'speedup':>8} "
+              f"{'triple recall':>14} {'triple p50':>11}")
+        sizes = np.diff(ivf.offsets)
+        for nprobe in args.nprobe:
+            found, (ann_p50, ann_p95) = timed(lambda q: ivf.search(q, args.top_k, nprobe)[0], queries)
+            triple, (triple_p50, _) = timed(
+                lambda q: index.top_k(q, args.top_k, content_age_days=10.0, nprobe=nprobe)[0], queries)
+            scanned = nprobe * float(sizes.mean()) / args.entities
+            print(f"{nprobe:>6} {scanned:>8.1%} {recall(found, truth):>7.3f} {ann_p50:>7.2f} {ann_p95:>7.2f} "
+                  f"{p50 / ann_p50:>7.0f}x {recall(triple, truth_triple):>14.3f} {triple_p50:>11.2f}")
+        del index, ivf
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""Throughput of the embedding stage against a stub /api/embed server, offline.
+
+Embeds a synthetic graphrag.db twice: the way notebook 03 did (one text per
+request, struct-packed, one INSERT per row) and through embed_graph
+(batched, concurrent, executemany). The stub answers with random
+EMBED_DIM-float vectors after a simulated delay of --latency-ms per request
+plus --per-text-ms per input, serving up to --server-parallel requests at
+once like OLLAMA_NUM_PARALLEL, so the numbers reflect request overhead and
+client-side work rather than a real model.
+
+Usage:
+    python -m benchmarks.bench_embedding
+    python -m benchmarks.bench_embedding --entities 20000 --batch-size 128 --concurrency 8
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import struct
+import tempfile
+import time
+
+import httpx
+from fastapi import FastAPI, Request, Response
+
+from benchmarks.synthetic import write_synthetic_db
+from src.services.embedding import EMBEDDING_STATE_TABLE, EMBEDDING_TARGETS, EmbeddingClient, embed_graph
+
+EMBED_DIM = 768
+
+
+def stub_embed_server(latency_ms: float, per_text_ms: float, parallel: int) -> FastAPI:
+    app = FastAPI()
+    slots = asyncio.Semaphore(parallel)
+    rnd = random.Random(0)
+    # Pre-encoded vectors: FastAPI's own encoder would make the stub the bottleneck
+    pool = [json.dumps([rnd.uniform(-1, 1) for _ in range(EMBED_DIM)]) for _ in range(64)]
+
+    @app.post("/api/embed")
+    async def embed(request: Request):
+        texts = (await request.json())["input"]
+        texts = [texts] if isinstance(texts, str) else texts
+        async with slots:
+            await asyncio.sleep((latency_ms + per_text_ms * len(texts)) / 1000)
+        body = ",".join(pool[len(text) % len(pool)] for text in texts)
+        return Response('{"model": "stub", "embeddings": [' + body + ']}', media_type="application/json")
+
+    return app
+
+
+def prepare(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path)
+    conn.execute(f"DROP TABLE IF EXISTS {EMBEDDING_STATE_TABLE}")
+    # Plain BLOB tables stand in for the vec0 ones, so sqlite-vec isn't needed to run this
+    for target in EMBEDDING_TARGETS:
+        conn.execute(f"DROP TABLE IF EXISTS {target.table}")
+        conn.execute(f"CREATE TABLE {target.table} ({target.id_column} INTEGER PRIMARY KEY, embedding BLOB)")
+    conn.commit()
+    return conn
+
+
+async def serial_baseline(app: FastAPI, conn: sqlite3.Connection) -> int:
+    """Notebook 03 before the embedding stage: a request and an INSERT per text."""
+    written = 0
+    async with httpx.AsyncClient(base_url="http://stub", transport=httpx.ASGITransport(app=app)) as client:
+        for target in EMBEDDING_TARGETS:
+            for row in conn.execute(target.query).fetchall():
+                response = await client.post("/api/embed", json={"model": "stub", "input": target.text(*row[1:])})
+                embedding = response.json()["embeddings"][0]
+                conn.execute(f"INSERT INTO {target.table} ({target.id_column}, embedding) VALUES (?, ?)",
+                             (row[0], struct.pack(f"{len(embedding)}f", *embedding)))
+                written += 1
+    conn.commit()
+    return written
+
+
+async def batched(app: FastAPI, conn: sqlite3.Connection, batch_size: int, concurrency: int) -> int:
+    async with EmbeddingClient(base_url="http://stub", model="stub", concurrency=concurrency,
+                               transport=httpx.ASGITransport(app=app)) as client:
+        return sum(c["written"] for c in (await embed_graph(client, conn, batch_size=batch_size)).values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding stage throughput against a stub server")
+    parser.add_argument("--entities", type=int, default=5_000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="Stub delay per request")
+    parser.add_argument("--per-text-ms", type=float, default=0.2, help="Stub delay per input text")
+    parser.add_argument("--server-parallel", type=int, default=4, help="Requests the stub serves at once")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "graphrag.db")
+        write_synthetic_db(db_path, args.entities, seed=args.seed)
+        print(f"{args.entities} entities; stub: {args.latency_ms} ms/request + {args.per_text_ms} ms/text, "
+              f"{args.server_parallel} parallel")
+        print(f"{'stage':<34} {'rows':>8} {'seconds':>9} {'rows/s':>9}")
+        for label, run in (
+            ("serial (1 text/request)", serial_baseline),
+            (f"batched ({args.batch_size}/request, {args.concurrency} in flight)",
+             lambda app, conn: batched(app, conn, args.batch_size, args.concurrency)),
+        ):
+            # A fresh stub per run: its semaphore belongs to the event loop that first uses it
+            app = stub_embed_server(args.latency_ms, args.per_text_ms, args.server_parallel)
+            conn = prepare(db_path)
+            start = time.perf_counter()
+            rows = asyncio.run(run(app, conn))
+            seconds = time.perf_counter() - start
+            conn.close()
+            print(f"{label:<34} {rows:>8} {seconds:>9.2f} {rows / seconds:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
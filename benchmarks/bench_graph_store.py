@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Memory and time of the columnar GraphStore against the dict-of-dicts model.
+
+Loads entities and relationships from a synthetic graphrag.db both ways and
+reports load time, retained Python heap (tracemalloc) and payload build time.
+
+Usage:
+    python -m benchmarks.bench_graph_store
+    python -m benchmarks.bench_graph_store --entities 100000 --relationships 200000
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.synthetic import write_synthetic_db
+from src.services.graph_service import (
+    build_viz_payload,
+    gc_paused,
+    load_chunk_lookup,
+    load_community_summaries,
+    load_entities,
+    load_entity_chunk_map,
+    load_relationships,
+    load_semantic_groups,
+    prepare_viz_data,
+)
+from src.services.graph_store import load_graph_store
+
+
+def measure(fn):
+    """Run fn once; return (result, seconds, retained MB, peak MB) of Python allocations."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    with gc_paused():
+        result = fn()
+    seconds = time.perf_counter() - start
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, retained / 2**20, peak / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GraphStore vs dict model benchmark")
+    parser.add_argument("--entities", type=int, default=500_000)
+    parser.add_argument("--relationships", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "graphrag.db")
+        write_synthetic_db(db_path, args.entities, n_edges=args.relationships, seed=args.seed)
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        rest = dict(
+            community_summaries=load_community_summaries(cursor),
+            chunk_lookup=load_chunk_lookup(cursor),
+            semantic_groups=load_semantic_groups(cursor),
+            entity_chunk_map=load_entity_chunk_map(cursor),
+        )
+
+        dicts, dict_load, dict_mb, dict_peak = measure(lambda: (load_entities(cursor), load_relationships(cursor)))
+        store, store_load, store_mb, store_peak = measure(lambda: load_graph_store(cursor))
+        conn.close()
+
+        _, dict_build, _, dict_build_peak = measure(lambda: prepare_viz_data(*dicts, **rest))
+        _, store_build, _, store_build_peak = measure(lambda: build_viz_payload(store, **rest))
+
+    print(f"{args.entities} entities, {store.n_edges} relationships")
+    print(f"{'model':<12} {'load (s)':>9} {'held MB':>9} {'load peak MB':>13} {'build (s)':>10} {'build peak MB':>14}")
+    print(f"{'dicts':<12} {dict_load:>9.2f} {dict_mb:>9.1f} {dict_peak:>13.1f} {dict_build:>10.2f} {dict_build_peak:>14.1f}")
+    print(f"{'GraphStore':<12} {store_load:>9.2f} {store_mb:>9.1f} {store_peak:>13.1f} {store_build:>10.2f} {store_build_peak:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""Scaling benchmark for prepare_viz_data on synthetic graphs.
+
+With the per-call indexes the build should grow linearly: the ns/entity
+column stays roughly flat from 1k to 1M entities.
+
+Usage:
+    python -m benchmarks.bench_prepare_viz
+    python -m benchmarks.bench_prepare_viz --sizes 1000 10000 100000
+"""
+
+import argparse
+import time
+
+from benchmarks.synthetic import synthetic_graph_inputs
+from src.services.graph_service import prepare_viz_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="prepare_viz_data scaling benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'entities':>10} {'edges':>10} {'communities':>12} {'build (s)':>10} {'ns/entity':>10}")
+    for n in args.sizes:
+        inputs = synthetic_graph_inputs(n)
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            data = prepare_viz_data(**inputs)
+            best = min(best, time.perf_counter() - start)
+        print(f"{n:>10} {len(inputs['edges']):>10} {len(data['communityData']):>12} "
+              f"{best:>10.3f} {best / n * 1e9:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Query latency of the vectorized triple-factor retrieval, against notebook 03's row-by-row scoring.
+
+Builds a RetrievalIndex of random unit vectors for --entities entities and
+times top-k queries (p50 / p95 / mean). The row-by-row baseline (a Python
+loop over every entity combining the three factors, as the notebook did)
+runs on --baseline-entities and is scaled linearly to the full size. With
+--load-entities, a synthetic graphrag.db with an entity_embeddings table is
+also written and load_retrieval_index timed on it.
+
+Usage:
+    python -m benchmarks.bench_retrieval
+    python -m benchmarks.bench_retrieval --entities 1000000 --dim 768 --queries 50
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.run import _peak_rss_mb
+from benchmarks.synthetic import write_synthetic_db
+from src.services.retrieval import RetrievalIndex, load_retrieval_index
+
+GENERATE_BLOCK = 100_000
+
+
+def random_index(n: int, dim: int, seed: int) -> RetrievalIndex:
+    rng = np.random.default_rng(seed)
+    embeddings = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, GENERATE_BLOCK):
+        stop = min(start + GENERATE_BLOCK, n)
+        embeddings[start:stop] = rng.standard_normal((stop - start, dim), dtype=np.float32)
+    half_lives = rng.choice(np.array([7, 30, 365], dtype=np.float32), n)
+    pageranks = rng.pareto(2.0, n).astype(np.float32)
+    return RetrievalIndex.from_arrays(np.arange(n), embeddings, half_lives, pageranks)
+
+
+def row_by_row(embeddings, half_lives, pageranks, query, top_k, weights=(0.6, 0.2, 0.2), age=1.0):
+    """Notebook 03's scoring loop: one entity at a time in Python."""
+    q = query / np.linalg.norm(query)
+    max_pagerank = max(pageranks)
+    results = []
+    for i in range(len(embeddings)):
+        vector = embeddings[i]
+        semantic = float(np.dot(vector, q) / np.linalg.norm(vector))
+        temporal = 0.5 ** (age / half_lives[i])
+        graph = pageranks[i] / max_pagerank
+        results.append((weights[0] * semantic + weights[1] * temporal + weights[2] * graph, i))
+    results.sort(key=lambda r: -r[0])
+    return results[:top_k]
+
+
+def time_queries(index: RetrievalIndex, queries, top_k: int):
+    times = []
+    for query in queries:
+        start = time.perf_counter()
+        index.top_k(query, top_k, content_age_days=1.0)
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return times[len(times) // 2], times[min(len(times) - 1, int(len(times) * 0.95))], sum(times) / len(times)
+
+
+def bench_load(n: int, dim: int, seed: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "graphrag.db")
+        write_synthetic_db(path, n, seed=seed)
+        rng = np.random.default_rng(seed)
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE entity_embeddings (entity_id INTEGER PRIMARY KEY, embedding BLOB)")
+        ids = [row[0] for row in conn.execute("SELECT id FROM entities")]
+        for start in range(0, len(ids), GENERATE_BLOCK):
+            block = ids[start:start + GENERATE_BLOCK]
+            vectors = rng.standard_normal((len(block), dim), dtype=np.float32)
+            conn.executemany("INSERT INTO entity_embeddings VALUES (?, ?)",
+                             [(entity_id, vectors[i].tobytes()) for i, entity_id in enumerate(block)])
+        conn.commit()
+        conn.close()
+        start = time.perf_counter()
+        index = load_retrieval_index(path)
+        print(f"load_retrieval_index: {len(index)} entities x {index.dim} in {time.perf_counter() - start:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Triple-factor retrieval latency")
+    parser.add_argument("--entities", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--baseline-entities", type=int, default=20_000,
+                        help="Entities the row-by-row baseline scores; 0 to skip it")
+    parser.add_argument("--load-entities", type=int, default=0, help="Also time loading an index of this many from SQLite")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = random_index(args.entities, args.dim, args.seed)
+    print(f"{args.entities} entities x {args.dim} dims: index built in {time.perf_counter() - start:.1f}s, "
+          f"{index.embeddings.nbytes / 2 ** 20:.0f} MB matrix, peak RSS {_peak_rss_mb():.0f} MB")
+    rng = np.random.default_rng(args.seed + 1)
+    queries = rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+
+    p50, p95, mean = time_queries(index, queries, args.top_k)
+    print(f"vectorized top-{args.top_k}: p50 {p50:.1f} ms, p95 {p95:.1f} ms, mean {mean:.1f} ms")
+
+    if args.baseline_entities:
+        n = min(args.baseline_entities, args.entities)
+        start = time.perf_counter()
+        row_by_row(index.embeddings[:n], index.half_lives[:n].tolist(), index.graph_scores[:n].tolist(),
+                   queries[0], args.top_k)
+        seconds = time.perf_counter() - start
+        print(f"row-by-row on {n}: {seconds * 1000:.0f} ms, ~{seconds * args.entities / n:.1f} s "
+              f"at {args.entities} ({seconds * 1000 * args.entities / n / p50:.0f}x the vectorized p50)")
+    del index
+
+    if args.load_entities:
+        bench_load(args.load_entities, args.dim, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Bytes on the wire and parse time of the columnar graph format against JSON.
+
+Builds the /data payload for a synthetic graph, encodes it both ways and
+reports raw, gzip and (if installed) brotli sizes. Parse time is measured
+with json.loads / decode_columnar, and, when node is on PATH, with
+JSON.parse / the decodeColumnar shipped in graph.js, which is what the
+browser actually runs.
+
+Usage:
+    python -m benchmarks.bench_wire_format
+    python -m benchmarks.bench_wire_format --entities 200000 --repeat 3
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synthetic import synthetic_graph_inputs
+from src.services.columnar import COLUMNAR_MEDIA_TYPE, decode_columnar
+from src.services.graph_service import build_viz_payload
+from src.services.graph_store import GraphStore
+from src.services.payload import JSON_MEDIA_TYPE, encode_payload
+
+GRAPH_JS = Path(__file__).resolve().parent.parent / "src" / "web" / "static" / "js" / "graph.js"
+
+# Times JSON.parse and decodeColumnar (lifted out of graph.js) on the two bodies
+NODE_SCRIPT = """
+const fs = require('fs');
+eval(process.env.DECODER.replace('function decodeColumnar', 'global.decodeColumnar = function'));
+const text = fs.readFileSync(process.argv[1], 'utf8');
+const bin = fs.readFileSync(process.argv[2]);
+const buffer = bin.buffer.slice(bin.byteOffset, bin.byteOffset + bin.length);
+function best(fn) {
+  let min = Infinity;
+  for (let i = 0; i < Number(process.argv[3]); i++) {
+    const start = process.hrtime.bigint();
+    fn();
+    min = Math.min(min, Number(process.hrtime.bigint() - start) / 1e6);
+  }
+  return min;
+}
+console.log(JSON.stringify({ json: best(() => JSON.parse(text)), columnar: best(() => decodeColumnar(buffer)) }));
+"""
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def node_parse_ms(json_body, columnar_body, repeat):
+    node = shutil.which("node")
+    if node is None:
+        return None
+    decoder = re.search(r"  function decodeColumnar\(buffer\) \{.*?\n  \}\n", GRAPH_JS.read_text(), re.S).group(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path, bin_path = os.path.join(tmp, "payload.json"), os.path.join(tmp, "payload.bin")
+        Path(json_path).write_bytes(json_body)
+        Path(bin_path).write_bytes(columnar_body)
+        out = subprocess.run([node, "-e", NODE_SCRIPT, json_path, bin_path, str(repeat)],
+                             capture_output=True, text=True, check=True, env=dict(os.environ, DECODER=decoder))
+    return json.loads(out.stdout)
+
+
+def compare(label, data, repeat):
+    start = time.perf_counter()
+    as_json = encode_payload(data, None, "bench", JSON_MEDIA_TYPE)
+    json_encode = time.perf_counter() - start
+    start = time.perf_counter()
+    as_columnar = encode_payload(data, None, "bench", COLUMNAR_MEDIA_TYPE)
+    columnar_encode = time.perf_counter() - start
+
+    py_json = best_of(lambda: json.loads(as_json.body), repeat)
+    py_columnar = best_of(lambda: decode_columnar(as_columnar.body), repeat)
+    browser = node_parse_ms(as_json.body, as_columnar.body, repeat)
+
+    def kb(body):
+        return f"{len(body) / 1024:.0f}" if body is not None else "-"
+
+    for name, payload, encode_s, py_ms in (("json", as_json, json_encode, py_json),
+                                           ("columnar", as_columnar, columnar_encode, py_columnar)):
+        node_ms = f"{browser[name]:.1f}" if browser else "-"
+        print(f"{label:<22} {name:<10} {kb(payload.body):>9} {kb(payload.gzip):>9} {kb(payload.br):>9} "
+              f"{encode_s:>11.2f} {py_ms:>12.1f} {node_ms:>14}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar vs JSON graph payload benchmark")
+    parser.add_argument("--entities", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    inputs = synthetic_graph_inputs(args.entities, seed=args.seed)
+    entities, edges = inputs.pop("entities"), inputs.pop("edges")
+    data = build_viz_payload(GraphStore.from_dicts(entities, edges), **inputs)
+    largest = max(data["communityData"], key=lambda c: len(data["communityData"][c]["entities"]))
+
+    print(f"{args.entities} entities, {len(edges)} relationships")
+    print(f"{'payload':<22} {'format':<10} {'raw KB':>9} {'gzip KB':>9} {'br KB':>9} {'encode (s)':>11} "
+          f"{'py parse ms':>12} {'node parse ms':>14}")
+    # /data, and the largest /community/{id} body, which is what the UI fetches on expand
+    for label, payload in (("/data", data), (f"/community/{largest}", data["communityData"][largest])):
+        compare(label, payload, args.repeat)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""Per-stage benchmark of the graph pipeline against a synthetic graphrag.db.
+
+For every stage (each load_* function, prepare_viz_data, serialization and
+the HTTP round-trip through TestClient) it records wall time, peak RSS and
+payload bytes, and can write the results as JSON so two runs can be diffed.
+Synthetic databases are also materialized (viz_materialize) and /data is
+timed cold again; a warning is printed when that exceeds COLD_DATA_SLOWDOWN
+times loading, building and encoding the payload directly.
+
+Usage:
+    python -m benchmarks.run --entities 10000 100000 --output results.json
+    python -m benchmarks.run --entities 100000 --compare results.json
+    python -m benchmarks.run --db notebooks/graphrag.db
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import sqlite3
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from benchmarks.synthetic import payload_size, write_synthetic_db
+from src.services import graph_service
+from src.services.payload import encode_payload
+from src.services.viz_materialize import materialize_viz
+
+# Allowed cold /data time relative to loading, building and encoding the payload directly
+COLD_DATA_SLOWDOWN = 2.0
+LOADERS = [
+    "load_entities",
+    "load_relationships",
+    "load_community_summaries",
+    "load_chunk_lookup",
+    "load_semantic_groups",
+    "load_entity_chunk_map",
+]
+
+
+def _read_status_kb(field: str) -> Optional[int]:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss() -> bool:
+    """Reset the kernel's high-water mark so VmHWM covers only the next stage (Linux only)."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb() -> float:
+    hwm = _read_status_kb("VmHWM")
+    if hwm is not None:
+        return hwm / 1024
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes everywhere else
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class StageRecorder:
+    def __init__(self):
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        # Without clear_refs the peak is process-lifetime, i.e. monotone across stages
+        self.per_stage_rss = _reset_peak_rss()
+
+    @contextmanager
+    def stage(self, name: str):
+        record: Dict[str, Any] = {}
+        if self.per_stage_rss:
+            _reset_peak_rss()
+        start = time.perf_counter()
+        yield record
+        record["seconds"] = round(time.perf_counter() - start, 6)
+        record["peak_rss_mb"] = round(_peak_rss_mb(), 1)
+        self.stages[name] = record
+
+
+def bench_database(db_path: str, materialize: bool = False) -> Dict[str, Any]:
+    rec = StageRecorder()
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    loaded = {}
+    try:
+        for name in LOADERS:
+            with rec.stage(name) as r:
+                loaded[name] = getattr(graph_service, name)(cursor)
+            r["rows"] = len(loaded[name])
+    finally:
+        conn.close()
+
+    inputs = dict(
+        entities=loaded["load_entities"],
+        edges=loaded["load_relationships"],
+        community_summaries=loaded["load_community_summaries"],
+        chunk_lookup=loaded["load_chunk_lookup"],
+        semantic_groups=loaded["load_semantic_groups"],
+        entity_chunk_map=loaded["load_entity_chunk_map"],
+    )
+    with rec.stage("prepare_viz_data") as r:
+        data = graph_service.prepare_viz_data(**inputs)
+    r["bytes"] = payload_size(data)
+    r["communities"] = len(data["communityData"])
+
+    with rec.stage("serialize") as r:
+        payload = encode_payload(data, None, "bench")
+    r["bytes"] = len(payload.body)
+    r["gzip_bytes"] = len(payload.gzip)
+    if payload.br is not None:
+        r["br_bytes"] = len(payload.br)
+    del data, payload, inputs, loaded
+
+    bench_http(db_path, rec, materialize)
+    return {"stages": rec.stages, "per_stage_rss": rec.per_stage_rss}
+
+
+def bench_http(db_path: str, rec: StageRecorder, materialize: bool = False) -> None:
+    from fastapi.testclient import TestClient
+
+    from src import config
+    from src.api import graph
+    from src.main import app
+
+    old_config_path, old_graph_path, old_warmer = config.DB_PATH, graph.DB_PATH, config.GRAPH_WARMER_ENABLED
+    config.DB_PATH = graph.DB_PATH = db_path
+    config.GRAPH_WARMER_ENABLED = False  # measure the request path, not a background prewarm
+    for cache in (graph._cache, graph._contexts, graph._community_cache):
+        cache.clear()
+    try:
+        with TestClient(app) as client:
+            for name, url in [("http_data_cold", "/api/graph/data"),
+                              ("http_data_warm", "/api/graph/data"),
+                              ("http_overview", "/api/graph/overview")]:
+                with rec.stage(name) as r:
+                    response = client.get(url, headers={"Accept-Encoding": "gzip"})
+                r["status"] = response.status_code
+                r["bytes"] = len(response.content)
+                r["wire_bytes"] = int(response.headers.get("content-length", len(response.content)))
+            if materialize:
+                # With the pipeline's viz tables a cold /data reads the layout instead of computing it
+                with rec.stage("materialize_viz"):
+                    materialize_viz(db_path)
+                with rec.stage("http_data_materialized") as r:
+                    response = client.get("/api/graph/data", headers={"Accept-Encoding": "gzip"})
+                r["status"] = response.status_code
+                r["bytes"] = len(response.content)
+    finally:
+        config.DB_PATH, graph.DB_PATH, config.GRAPH_WARMER_ENABLED = old_config_path, old_graph_path, old_warmer
+
+
+def check_cold_data(run: Dict[str, Any]) -> List[str]:
+    """Warnings for a cold /data on materialized tables that is much slower than building the payload offline."""
+    stages = run["stages"]
+    if "http_data_materialized" not in stages:
+        return []
+    build = sum(stages[name]["seconds"] for name in LOADERS + ["prepare_viz_data", "serialize"])
+    cold = stages["http_data_materialized"]["seconds"]
+    if cold <= COLD_DATA_SLOWDOWN * build:
+        return []
+    return [f"{run['label']}: cold /data took {cold:.2f}s, over {COLD_DATA_SLOWDOWN}x the {build:.2f}s offline build"]
+
+
+def compare(current: Dict[str, Any], previous: Dict[str, Any]) -> None:
+    prev_runs = {run["label"]: run for run in previous.get("runs", [])}
+    for run in current["runs"]:
+        prev = prev_runs.get(run["label"])
+        if prev is None:
+            print(f"\n{run['label']}: no baseline in comparison file")
+            continue
+        print(f"\n{run['label']} vs baseline")
+        print(f"{'stage':<26} {'seconds':>10} {'Δ%':>8} {'peak MB':>9} {'Δ%':>8} {'bytes':>12} {'Δ%':>8}")
+        for name, stage in run["stages"].items():
+            base = prev["stages"].get(name, {})
+            cols = []
+            for metric in ("seconds", "peak_rss_mb", "bytes"):
+                value, old = stage.get(metric), base.get(metric)
+                delta = f"{(value - old) / old * 100:+.1f}" if value is not None and old else "-"
+                cols.append(("-" if value is None else value, delta))
+            print(f"{name:<26} {cols[0][0]:>10} {cols[0][1]:>8} {cols[1][0]:>9} {cols[1][1]:>8} {cols[2][0]:>12} {cols[2][1]:>8}")
+
+
+def print_run(run: Dict[str, Any]) -> None:
+    print(f"\n{run['label']}")
+    print(f"{'stage':<26} {'seconds':>10} {'peak MB':>9} {'bytes':>12} {'rows':>10}")
+    for name, stage in run["stages"].items():
+        print(f"{name:<26} {stage['seconds']:>10.4f} {stage['peak_rss_mb']:>9.1f} "
+              f"{stage.get('bytes', ''):>12} {stage.get('rows', ''):>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Graph pipeline stage benchmark")
+    parser.add_argument("--entities", type=int, nargs="+", default=[1_000, 10_000, 100_000],
+                        help="Synthetic database sizes to generate and benchmark")
+    parser.add_argument("--db", help="Benchmark an existing database instead of synthetic ones")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write machine-readable results to this JSON file")
+    parser.add_argument("--compare", help="Previous --output file to diff against")
+    args = parser.parse_args()
+
+    runs: List[Dict[str, Any]] = []
+    if args.db:
+        runs.append({"label": os.path.basename(args.db), **bench_database(args.db)})
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            for n in args.entities:
+                db_path = os.path.join(tmp, f"graphrag_{n}.db")
+                counts = write_synthetic_db(db_path, n, seed=args.seed)
+                run = {"label": f"synthetic-{n}", "rows": counts, **bench_database(db_path, materialize=True)}
+                runs.append(run)
+                os.remove(db_path)
+
+    results = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "runs": runs,
+    }
+    for run in runs:
+        print_run(run)
+    for warning in (w for run in runs for w in check_cold_data(run)):
+        print(f"WARNING {warning}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""Synthetic GraphRAG data with production-like shape.
+
+Usage:
+    python -m benchmarks.synthetic --out /tmp/graphrag.db --entities 100000
+
+Community sizes and node degrees follow Zipf-like distributions (a few huge
+communities and hubs, a long tail of tiny ones), most edges stay inside a
+community, and a share of entities are orphans, mirroring what Leiden
+produces on the nightly corpus.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+from src.services.db import content_hash
+
+
+def _zipf_cum_weights(n: int, exponent: float) -> List[float]:
+    return list(itertools.accumulate(1.0 / (rank ** exponent) for rank in range(1, n + 1)))
+
+
+def synthetic_graph_inputs(n_entities: int, n_edges: Optional[int] = None, n_communities: Optional[int] = None,
+                           n_chunks: Optional[int] = None, n_semantic_groups: Optional[int] = None,
+                           orphan_rate: float = 0.1, seed: int = 42) -> Dict[str, Any]:
+    """In-memory inputs shaped like the graph_service loaders' output (prepare_viz_data kwargs).
+
+    Defaults scale with n_entities: 2 edges, 1/25 community, 1/4 chunk and
+    1/50 semantic group per entity.
+    """
+    rnd = random.Random(seed)
+    n_communities = n_communities or max(1, n_entities // 25)
+    n_chunks = n_chunks or max(1, n_entities // 4)
+    n_semantic_groups = n_semantic_groups if n_semantic_groups is not None else max(1, n_entities // 50)
+    n_edges = n_edges if n_edges is not None else n_entities * 2
+    types = ["PERSON", "ORGANIZATION", "LOCATION", "EVENT", "PRODUCT", "CONCEPT"]
+
+    names = [f"ENTITY {i}" for i in range(n_entities)]
+    communities = rnd.choices(range(n_communities), cum_weights=_zipf_cum_weights(n_communities, 1.1), k=n_entities)
+    members: Dict[int, List[int]] = {}
+    for idx, cid in enumerate(communities):
+        members.setdefault(cid, []).append(idx)
+
+    entities = {}
+    for idx, name in enumerate(names):
+        entities[name] = {
+            "type": types[idx % len(types)],
+            "description": f"Synthetic entity {idx} in community {communities[idx]}",
+            "pagerank": rnd.random() / n_entities,
+            "degree_centrality": rnd.random(),
+            "betweenness": rnd.random() / 10,
+            "community": communities[idx],
+            "source_refs": '["web:synthetic"]',
+            "num_sources": 1,
+        }
+
+    # Hubs: a Zipf draw over a shuffled order decides which endpoints get picked most
+    connected = [i for i in range(n_entities) if rnd.random() >= orphan_rate] or [0]
+    connected_members: Dict[int, List[int]] = {}
+    for idx in connected:
+        connected_members.setdefault(communities[idx], []).append(idx)
+    rnd.shuffle(connected)
+    hub_weights = _zipf_cum_weights(len(connected), 0.8)
+    edges = []
+    while len(edges) < n_edges and len(connected) > 1:
+        for src in rnd.choices(connected, cum_weights=hub_weights, k=n_edges - len(edges)):
+            if rnd.random() < 0.8:
+                tgt = rnd.choice(connected_members[communities[src]])
+            else:
+                tgt = rnd.choice(connected)
+            if tgt == src:
+                continue
+            edges.append((names[src], names[tgt], {"description": f"{names[src]} relates to {names[tgt]}",
+                                                   "weight": round(rnd.uniform(0.1, 1.0), 2)}))
+
+    community_summaries = {
+        cid: {"title": f"Synthetic topic {cid}", "summary": f"Summary of community {cid}",
+              "key_entities": [names[i] for i in members.get(cid, [])[:5]],
+              "key_insights": [f"Insight {cid}.{k}" for k in range(3)]}
+        for cid in range(n_communities)
+    }
+
+    # "text" is what write_synthetic_db stores; the service itself only carries the hash
+    chunk_lookup = {}
+    for i in range(n_chunks):
+        text = f"Chunk {i} text. " * 20
+        chunk_lookup[i] = {"text": text, "hash": content_hash(text), "source_id": f"web:source-{i % 50}"}
+    entity_chunk_map: Dict[str, list] = {}
+    for idx, name in enumerate(names):
+        for _ in range(1 + (idx % 3)):
+            c = rnd.randrange(n_chunks)
+            entity_chunk_map.setdefault(name, []).append({"chunk_index": c, "source_id": chunk_lookup[c]["source_id"]})
+
+    semantic_groups = []
+    for gid in range(n_semantic_groups):
+        cid = rnd.randrange(n_communities)
+        pool = members.get(cid) or [rnd.randrange(n_entities)]
+        size = rnd.randint(2, 18)  # some exceed MAX_COMPOUND_SIZE on purpose
+        group_members = [names[rnd.choice(pool)] for _ in range(size)]
+        semantic_groups.append({
+            "group_id": gid,
+            "canonical": group_members[0],
+            "members": group_members,
+            "member_similarities": {m: round(rnd.uniform(0.85, 0.99), 4) for m in group_members[1:]},
+        })
+
+    return {
+        "entities": entities,
+        "edges": edges,
+        "community_summaries": community_summaries,
+        "chunk_lookup": chunk_lookup,
+        "semantic_groups": semantic_groups,
+        "entity_chunk_map": entity_chunk_map,
+    }
+
+
+# Same DDL as notebooks/02_graph_construction_communities.ipynb (vec0 tables come from notebook 03)
+GRAPHRAG_SCHEMA = """
+CREATE TABLE sources (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source_id TEXT UNIQUE NOT NULL,
+    source_type TEXT,
+    title TEXT,
+    url TEXT,
+    content_type TEXT,
+    content_length INTEGER,
+    fetched_at TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE entities (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT UNIQUE NOT NULL,
+    type TEXT,
+    description TEXT,
+    pagerank REAL DEFAULT 0,
+    degree_centrality REAL DEFAULT 0,
+    betweenness REAL DEFAULT 0,
+    community_id INTEGER,
+    source_refs TEXT,
+    num_sources INTEGER DEFAULT 1,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE relationships (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source_id INTEGER REFERENCES entities(id),
+    target_id INTEGER REFERENCES entities(id),
+    description TEXT,
+    weight REAL DEFAULT 1.0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE claims (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    subject_id INTEGER REFERENCES entities(id),
+    claim_type TEXT,
+    description TEXT,
+    claim_date TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE community_summaries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    community_id INTEGER UNIQUE NOT NULL,
+    title TEXT,
+    summary TEXT,
+    key_entities TEXT,
+    key_insights TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE chunks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    content TEXT,
+    chunk_index INTEGER,
+    source_ref TEXT,
+    content_hash TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS semantic_groups (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    group_id INTEGER UNIQUE NOT NULL,
+    canonical TEXT NOT NULL,
+    members TEXT NOT NULL,
+    member_similarities TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS entity_chunk_map (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    entity_name TEXT NOT NULL,
+    chunk_index INTEGER NOT NULL,
+    source_id TEXT NOT NULL,
+    FOREIGN KEY (entity_name) REFERENCES entities(name)
+);
+CREATE INDEX idx_entities_name ON entities(name);
+CREATE INDEX idx_entities_community ON entities(community_id);
+CREATE INDEX idx_relationships_source ON relationships(source_id);
+CREATE INDEX idx_relationships_target ON relationships(target_id);
+CREATE INDEX idx_chunks_source ON chunks(source_ref);
+CREATE INDEX idx_sources_source_id ON sources(source_id);
+CREATE INDEX idx_entity_chunk_map_entity ON entity_chunk_map(entity_name);
+CREATE INDEX idx_semantic_groups_gid ON semantic_groups(group_id);
+"""
+
+
+def write_synthetic_db(db_path: str, n_entities: int, **kwargs) -> Dict[str, int]:
+    """Write a schema-compatible graphrag.db and return row counts per table.
+
+    Accepts the same sizing keywords as synthetic_graph_inputs. An existing
+    file at db_path is replaced, like notebook 02 does.
+    """
+    inputs = synthetic_graph_inputs(n_entities, **kwargs)
+    if os.path.exists(db_path):
+        os.remove(db_path)
+
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.executescript(GRAPHRAG_SCHEMA)
+        with conn:
+            source_ids = sorted({c["source_id"] for c in inputs["chunk_lookup"].values()} | {"web:synthetic"})
+            conn.executemany(
+                "INSERT INTO sources (source_id, source_type, title, url, content_type, content_length, fetched_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(sid, "web", f"Synthetic source {sid}", f"https://example.com/{sid}", "news", 1000, "2026-01-01T00:00:00+00:00")
+                 for sid in source_ids],
+            )
+            conn.executemany(
+                "INSERT INTO entities (id, name, type, description, pagerank, degree_centrality, betweenness, community_id, source_refs, num_sources) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                ((i, name, e["type"], e["description"], e["pagerank"], e["degree_centrality"], e["betweenness"],
+                  e["community"], e["source_refs"], e["num_sources"])
+                 for i, (name, e) in enumerate(inputs["entities"].items(), start=1)),
+            )
+            entity_ids = {name: i for i, name in enumerate(inputs["entities"], start=1)}
+            conn.executemany(
+                "INSERT INTO relationships (source_id, target_id, description, weight) VALUES (?, ?, ?, ?)",
+                ((entity_ids[s], entity_ids[t], a["description"], a["weight"]) for s, t, a in inputs["edges"]),
+            )
+            conn.executemany(
+                "INSERT INTO claims (subject_id, claim_type, description, claim_date) VALUES (?, ?, ?, ?)",
+                ((i, "FACT", f"Synthetic claim about entity {i}", "") for i in range(1, len(entity_ids) + 1, 3)),
+            )
+            conn.executemany(
+                "INSERT INTO community_summaries (community_id, title, summary, key_entities, key_insights) VALUES (?, ?, ?, ?, ?)",
+                ((cid, s["title"], s["summary"], json.dumps(s["key_entities"]), json.dumps(s["key_insights"]))
+                 for cid, s in inputs["community_summaries"].items()),
+            )
+            conn.executemany(
+                "INSERT INTO chunks (content, chunk_index, source_ref, content_hash) VALUES (?, ?, ?, ?)",
+                ((c["text"], idx, c["source_id"], c["hash"]) for idx, c in inputs["chunk_lookup"].items()),
+            )
+            conn.executemany(
+                "INSERT INTO semantic_groups (group_id, canonical, members, member_similarities) VALUES (?, ?, ?, ?)",
+                ((g["group_id"], g["canonical"], json.dumps(g["members"]), json.dumps(g["member_similarities"]))
+                 for g in inputs["semantic_groups"]),
+            )
+            conn.executemany(
+                "INSERT INTO entity_chunk_map (entity_name, chunk_index, source_id) VALUES (?, ?, ?)",
+                ((name, ref["chunk_index"], ref["source_id"])
+                 for name, refs in inputs["entity_chunk_map"].items() for ref in refs),
+            )
+        counts = {}
+        for table in ["sources", "entities", "relationships", "claims", "community_summaries", "chunks", "semantic_groups", "entity_chunk_map"]:
+            counts[table] = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        return counts
+    finally:
+        conn.close()
+
+
+def payload_size(data: Any) -> int:
+    return len(json.dumps(data, separators=(",", ":")).encode())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic graphrag.db for scaling tests")
+    parser.add_argument("--out", default="notebooks/graphrag.synthetic.db", help="Output SQLite path")
+    parser.add_argument("--entities", type=int, default=10_000)
+    parser.add_argument("--relationships", type=int, default=None, help="Default: 2 per entity")
+    parser.add_argument("--communities", type=int, default=None, help="Default: 1 per 25 entities")
+    parser.add_argument("--chunks", type=int, default=None, help="Default: 1 per 4 entities")
+    parser.add_argument("--semantic-groups", type=int, default=None, help="Default: 1 per 50 entities")
+    parser.add_argument("--orphan-rate", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    counts = write_synthetic_db(args.out, args.entities, n_edges=args.relationships, n_communities=args.communities,
+                                n_chunks=args.chunks, n_semantic_groups=args.semantic_groups,
+                                orphan_rate=args.orphan_rate, seed=args.seed)
+    print(f"Wrote {args.out}")
+    for table, count in counts.items():
+        print(f"  {table}: {count} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,79 +6,70 @@ Two views available:
   --view entity    (default) Entity-level graph colored by community
   --view community           Community meta-node graph with member counts
 
+Layouts are cached per view: an unchanged DB reuses the previous positions,
+and a changed one starts from them, so reruns are fast and stable.
+
 Usage:
     python scripts/generate_viz_plotly.py
     python scripts/generate_viz_plotly.py --top-communities 10
     python scripts/generate_viz_plotly.py --view community
+    python scripts/generate_viz_plotly.py --layout force     # NumPy layout for large graphs
     python scripts/generate_viz_plotly.py --db path/to/graphrag.db --no-open
 """
 
 import argparse
-import json
-import sqlite3
+import sys
 import webbrowser
 from pathlib import Path
 
 import networkx as nx
-import plotly.graph_objects as go
+import numpy as np
+import plotly.io as pio
 
-# --- Constants ---
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
-COMMUNITY_COLORS = [
-    "#e6194b", "#3cb44b", "#4363d8", "#f58231", "#911eb4",
-    "#42d4f4", "#f032e6", "#bfef45", "#fabed4", "#469990",
-    "#dcbeff", "#9A6324", "#fffac8", "#800000", "#aaffc3",
-]
+from src.config import GRAPH_SNAPSHOT_DIR  # noqa: E402
+from src.services.graph_cache import db_fingerprint, fingerprint_version  # noqa: E402
+from src.services.graph_layout import force_layout  # noqa: E402
+from src.services.graph_service import COMMUNITY_COLORS  # noqa: E402
+from src.services.graph_snapshot import load_graph_snapshot, read_latest, write_latest  # noqa: E402
+
+# --- Constants ---
 
 BG_COLOR = "#0a0a0f"
 GRID_COLOR = "#1a1a2a"
 EDGE_COLOR = "#333333"
 
+# "auto" uses networkx.spring_layout up to this many nodes and the NumPy force layout above
+SPRING_LAYOUT_LIMIT = 1000
+# A layout seeded from the previous run's positions only needs to settle the changes
+SEEDED_ITERATIONS = 10
+SEEDED_TEMPERATURE = 0.01
+# Above this many nodes traces are drawn with WebGL (scattergl) instead of SVG
+WEBGL_NODE_LIMIT = 5000
 
-# --- Data Loading (SQLite) ---
-
-def load_entities(cursor) -> dict[str, dict]:
-    cursor.execute("""
-        SELECT name, type, description, pagerank, degree_centrality,
-               betweenness, community_id, source_refs, num_sources
-        FROM entities
-    """)
-    return {row[0]: {"type": row[1], "description": row[2], "pagerank": row[3],
-                      "degree_centrality": row[4], "betweenness": row[5],
-                      "community": row[6], "source_refs": row[7],
-                      "num_sources": row[8]} for row in cursor.fetchall()}
-
-
-def load_relationships(cursor) -> list[tuple[str, str, dict]]:
-    cursor.execute("""
-        SELECT e1.name, e2.name, r.description, r.weight
-        FROM relationships r
-        JOIN entities e1 ON r.source_id = e1.id
-        JOIN entities e2 ON r.target_id = e2.id
-    """)
-    return [(row[0], row[1], {"description": row[2], "weight": row[3]})
-            for row in cursor.fetchall()]
-
-
-def load_community_summaries(cursor) -> dict[int, dict]:
-    cursor.execute("SELECT community_id, title, summary, key_entities, key_insights FROM community_summaries")
-    return {row[0]: {"title": row[1], "summary": row[2],
-                      "key_entities": json.loads(row[3]),
-                      "key_insights": json.loads(row[4])} for row in cursor.fetchall()}
+# Figures are plain dicts written without plotly's per-property validation,
+# which costs more than everything else once there are hundreds of traces.
 
 
 # --- Graph Building ---
 
-def build_graph(entities, edges):
-    """Build a NetworkX graph from entity/edge dicts, filtered to connected nodes."""
+def build_graph(store):
+    """Build a NetworkX graph from a GraphStore, filtered to connected nodes."""
     G = nx.Graph()
-    for name, attrs in entities.items():
+    for i in range(store.n_entities):
+        name = store.names[i]
         if name.strip():
-            G.add_node(name, **attrs)
-
-    for src, tgt, attrs in edges:
+            community = store.community_of(i)
+            G.add_node(name, type=store.types[store.type_ids[i]], description=store.descriptions[i] or "",
+                       pagerank=store.pagerank[i], degree_centrality=store.degree_centrality[i],
+                       betweenness=store.betweenness[i], community=-1 if community is None else community,
+                       source_refs=store.source_refs[i], num_sources=store.num_sources_of(i))
+
+    for k in range(store.n_edges):
+        src, tgt = store.names[store.edge_src[k]], store.names[store.edge_tgt[k]]
         if src in G and tgt in G:
-            G.add_edge(src, tgt, **attrs)
+            G.add_edge(src, tgt, description=store.edge_descriptions[k] or "", weight=store.weight_of(k))
 
     # Remove isolated nodes
     isolates = list(nx.isolates(G))
@@ -88,32 +79,98 @@ def build_graph(entities, edges):
     return G
 
 
+def edge_index(G, nodes):
+    """Endpoint positions in `nodes` of every edge, in G.edges order."""
+    index = {n: i for i, n in enumerate(nodes)}
+    src = np.fromiter((index[u] for u, _ in G.edges), dtype=np.int64, count=G.number_of_edges())
+    tgt = np.fromiter((index[v] for _, v in G.edges), dtype=np.int64, count=G.number_of_edges())
+    return src, tgt
+
+
+# --- Layout ---
+
+class LayoutCache:
+    """Positions of the last run per view, reused while the DB is unchanged and seeding the next layout otherwise."""
+
+    def __init__(self, db_path: str, method: str, top_communities: int, cache_dir=None):
+        self.db_path = db_path
+        self.method = method
+        self.top_communities = top_communities
+        self.cache_dir = cache_dir
+        self.version = fingerprint_version(db_fingerprint(db_path))
+
+    def layout(self, G, view: str, spring_k: float, iterations: int):
+        """(n, 2) positions of G's nodes, in G.nodes order."""
+        nodes = list(G.nodes)
+        method = self.method
+        if method == "auto":
+            method = "spring" if len(nodes) <= SPRING_LAYOUT_LIMIT else "force"
+        key = ("plotly_layout", view, self.top_communities, method)
+        previous = read_latest(self.db_path, key, self.cache_dir) if self.cache_dir else None
+        seed = previous[1] if previous else {}
+        if previous and previous[0] == self.version and all(n in seed for n in nodes):
+            print(f"Layout: reusing the previous {method} layout")
+            return np.array([seed[n] for n in nodes], dtype=float).reshape(len(nodes), 2)
+
+        seeded = sum(1 for n in nodes if n in seed)
+        print(f"Layout: {method} on {len(nodes)} nodes"
+              + (f", starting from {seeded} positions of the previous run" if seeded else ""))
+        iterations = SEEDED_ITERATIONS if seeded else iterations
+        if method == "spring":
+            pos = nx.spring_layout(G, k=spring_k, iterations=iterations, seed=42,
+                                   pos={n: seed[n] for n in nodes if n in seed} or None)
+            positions = np.array([pos[n] for n in nodes], dtype=float).reshape(len(nodes), 2)
+        else:
+            init = None
+            if seeded:
+                init = np.array([seed.get(n, (np.nan, np.nan)) for n in nodes], dtype=float)
+            src, tgt = edge_index(G, nodes)
+            positions = force_layout(len(nodes), src, tgt, pos=init, iterations=iterations, seed=42,
+                                     temperature=SEEDED_TEMPERATURE if seeded else None)
+
+        if self.cache_dir and self.version is not None:
+            write_latest(self.db_path, key, self.version, dict(zip(nodes, positions.tolist())), self.cache_dir)
+        return positions
+
+
+def edge_coordinates(positions, src, tgt):
+    """x / y arrays for one lines trace (NaN separates segments), and the edge midpoints."""
+    x = np.full(3 * len(src), np.nan)
+    y = np.full(3 * len(src), np.nan)
+    x[0::3], x[1::3] = positions[src, 0], positions[tgt, 0]
+    y[0::3], y[1::3] = positions[src, 1], positions[tgt, 1]
+    mid = (positions[src] + positions[tgt]) / 2
+    return x, y, mid[:, 0], mid[:, 1]
+
+
+def scatter_type(node_count: int) -> str:
+    return "scattergl" if node_count > WEBGL_NODE_LIMIT else "scatter"
+
+
 # --- Entity View ---
 
-def make_entity_figure(G, community_summaries):
-    """Create Plotly figure showing entity nodes colored by community."""
-    pos = nx.spring_layout(G, k=2.5, iterations=80, seed=42)
+def make_entity_figure(G, community_summaries, layouts: LayoutCache):
+    """Plotly figure dict showing entity nodes colored by community."""
+    nodes = list(G.nodes)
+    positions = layouts.layout(G, "entity", spring_k=2.5, iterations=80)
+    trace_type = scatter_type(len(nodes))
 
     # Collect all pagerank values for size scaling
-    pr_values = [G.nodes[n].get("pagerank", 0) for n in G.nodes]
-    pr_min, pr_max = min(pr_values), max(pr_values)
+    attrs = [G.nodes[n] for n in nodes]
+    pagerank = np.fromiter((a.get("pagerank", 0) for a in attrs), dtype=float, count=len(nodes))
+    pr_min, pr_max = pagerank.min(), pagerank.max()
     pr_range = pr_max - pr_min if pr_max > pr_min else 1
+    sizes = 8 + 30 * ((pagerank - pr_min) / pr_range)
+    labelled = pagerank > pr_min + pr_range * 0.3
 
     # Edge traces
-    edge_x, edge_y = [], []
-    edge_hover = []
-    edge_mid_x, edge_mid_y = [], []
-    for src, tgt, attrs in G.edges(data=True):
-        x0, y0 = pos[src]
-        x1, y1 = pos[tgt]
-        edge_x.extend([x0, x1, None])
-        edge_y.extend([y0, y1, None])
-        edge_mid_x.append((x0 + x1) / 2)
-        edge_mid_y.append((y0 + y1) / 2)
-        desc = attrs.get("description", "")
-        edge_hover.append(f"{src} -> {tgt}<br>{desc[:100]}" if desc else f"{src} -> {tgt}")
-
-    edge_trace = go.Scatter(
+    src, tgt = edge_index(G, nodes)
+    edge_x, edge_y, edge_mid_x, edge_mid_y = edge_coordinates(positions, src, tgt)
+    edge_hover = [f"{u} -> {v}<br>{desc[:100]}" if desc else f"{u} -> {v}"
+                  for u, v, desc in G.edges(data="description", default="")]
+
+    edge_trace = dict(
+        type=trace_type,
         x=edge_x, y=edge_y,
         mode="lines",
         line=dict(width=0.8, color=EDGE_COLOR),
@@ -122,7 +179,8 @@ def make_entity_figure(G, community_summaries):
     )
 
     # Invisible midpoint trace for edge hover
-    edge_mid_trace = go.Scatter(
+    edge_mid_trace = dict(
+        type=trace_type,
         x=edge_mid_x, y=edge_mid_y,
         mode="markers",
         marker=dict(size=8, color="rgba(0,0,0,0)"),
@@ -132,49 +190,41 @@ def make_entity_figure(G, community_summaries):
     )
 
     # Group nodes by community for color-coded legend
-    comm_nodes: dict[int, list[str]] = {}
-    for node in G.nodes:
-        cid = G.nodes[node].get("community", -1)
-        comm_nodes.setdefault(cid, []).append(node)
+    communities = np.fromiter((a.get("community", -1) for a in attrs), dtype=np.int64, count=len(nodes))
+    names = np.array(nodes, dtype=object)
 
     node_traces = []
-    for cid in sorted(comm_nodes.keys()):
-        nodes = comm_nodes[cid]
+    for cid in np.unique(communities).tolist():
+        members = np.flatnonzero(communities == cid)
         color = COMMUNITY_COLORS[cid % len(COMMUNITY_COLORS)] if cid >= 0 else "#555555"
         summary = community_summaries.get(cid, {})
         legend_name = summary.get("title", f"Community {cid}")[:40]
+        comm_line = f"Community: {cid} — {summary.get('title', '?')[:50]}<br>"
 
-        xs = [pos[n][0] for n in nodes]
-        ys = [pos[n][1] for n in nodes]
-        sizes = [
-            8 + 30 * ((G.nodes[n].get("pagerank", 0) - pr_min) / pr_range)
-            for n in nodes
-        ]
         hovers = []
-        for n in nodes:
-            a = G.nodes[n]
-            hover = (
-                f"<b>{n}</b><br>"
+        for i in members.tolist():
+            a = attrs[i]
+            hovers.append(
+                f"<b>{nodes[i]}</b><br>"
                 f"Type: {a.get('type', '?')}<br>"
-                f"Community: {cid} — {summary.get('title', '?')[:50]}<br>"
+                f"{comm_line}"
                 f"PageRank: {a.get('pagerank', 0):.4f}<br>"
                 f"Degree: {a.get('degree_centrality', 0):.4f}<br>"
                 f"Sources: {a.get('num_sources', 1)}<br>"
                 f"{a.get('description', '')[:120]}"
             )
-            hovers.append(hover)
 
-        trace = go.Scatter(
-            x=xs, y=ys,
+        trace = dict(
+            type=trace_type,
+            x=positions[members, 0], y=positions[members, 1],
             mode="markers+text",
             marker=dict(
-                size=sizes,
+                size=sizes[members],
                 color=color,
                 line=dict(width=1, color="#222"),
                 opacity=0.85,
             ),
-            text=[n if G.nodes[n].get("pagerank", 0) > pr_min + pr_range * 0.3 else ""
-                  for n in nodes],
+            text=np.where(labelled[members], names[members], "").tolist(),
             textposition="top center",
             textfont=dict(size=9, color="#aaa"),
             hovertext=hovers,
@@ -184,9 +234,7 @@ def make_entity_figure(G, community_summaries):
         )
         node_traces.append(trace)
 
-    fig = go.Figure(data=[edge_trace, edge_mid_trace] + node_traces)
-
-    fig.update_layout(
+    layout = dict(
         title=dict(
             text="DKIA Knowledge Graph — Entity View",
             font=dict(size=18, color="#f58231"),
@@ -209,17 +257,16 @@ def make_entity_figure(G, community_summaries):
         margin=dict(l=10, r=10, t=50, b=10),
     )
 
-    return fig
+    return {"data": [edge_trace, edge_mid_trace] + node_traces, "layout": layout}
 
 
 # --- Community View ---
 
-def make_community_figure(G, community_summaries):
-    """Create Plotly figure showing community meta-nodes."""
+def make_community_figure(G, community_summaries, layouts: LayoutCache):
+    """Plotly figure dict showing community meta-nodes."""
     # Group by community
     comm_members: dict[int, list[str]] = {}
-    for node in G.nodes:
-        cid = G.nodes[node].get("community", -1)
+    for node, cid in G.nodes(data="community", default=-1):
         comm_members.setdefault(cid, []).append(node)
 
     # Build a meta-graph: nodes = communities, edges = cross-community relationships
@@ -230,13 +277,14 @@ def make_community_figure(G, community_summaries):
         summary = community_summaries.get(cid, {})
         pr_sum = sum(G.nodes[m].get("pagerank", 0) for m in members)
         MG.add_node(cid, member_count=len(members), title=summary.get("title", f"C{cid}"),
-                     summary=summary.get("summary", ""), pr_sum=pr_sum,
-                     key_entities=summary.get("key_entities", []),
-                     key_insights=summary.get("key_insights", []))
-
-    for src, tgt, attrs in G.edges(data=True):
-        src_c = G.nodes[src].get("community", -1)
-        tgt_c = G.nodes[tgt].get("community", -1)
+                    summary=summary.get("summary", ""), pr_sum=pr_sum,
+                    key_entities=summary.get("key_entities", []),
+                    key_insights=summary.get("key_insights", []))
+
+    community = dict(G.nodes(data="community", default=-1))
+    for src, tgt in G.edges:
+        src_c = community[src]
+        tgt_c = community[tgt]
         if src_c != tgt_c and src_c in MG and tgt_c in MG:
             if MG.has_edge(src_c, tgt_c):
                 MG[src_c][tgt_c]["weight"] += 1
@@ -245,23 +293,18 @@ def make_community_figure(G, community_summaries):
 
     if MG.number_of_nodes() == 0:
         print("Warning: No communities with >= 2 members")
-        return go.Figure()
+        return {"data": [], "layout": {}}
 
-    pos = nx.spring_layout(MG, k=3, iterations=60, seed=42)
+    cids = list(MG.nodes)
+    positions = layouts.layout(MG, "community", spring_k=3, iterations=60)
 
     # Edges
-    edge_x, edge_y = [], []
-    edge_mid_x, edge_mid_y, edge_hover = [], [], []
-    for s, t, attrs in MG.edges(data=True):
-        x0, y0 = pos[s]
-        x1, y1 = pos[t]
-        edge_x.extend([x0, x1, None])
-        edge_y.extend([y0, y1, None])
-        edge_mid_x.append((x0 + x1) / 2)
-        edge_mid_y.append((y0 + y1) / 2)
-        edge_hover.append(f"C{s} <-> C{t}: {attrs['weight']} cross-community edges")
-
-    edge_trace = go.Scatter(
+    src, tgt = edge_index(MG, cids)
+    edge_x, edge_y, edge_mid_x, edge_mid_y = edge_coordinates(positions, src, tgt)
+    edge_hover = [f"C{s} <-> C{t}: {weight} cross-community edges" for s, t, weight in MG.edges(data="weight")]
+
+    edge_trace = dict(
+        type="scatter",
         x=edge_x, y=edge_y,
         mode="lines",
         line=dict(width=1.5, color="#555"),
@@ -269,7 +312,8 @@ def make_community_figure(G, community_summaries):
         showlegend=False,
     )
 
-    edge_mid_trace = go.Scatter(
+    edge_mid_trace = dict(
+        type="scatter",
         x=edge_mid_x, y=edge_mid_y,
         mode="markers",
         marker=dict(size=10, color="rgba(0,0,0,0)"),
@@ -279,18 +323,13 @@ def make_community_figure(G, community_summaries):
     )
 
     # Nodes
-    counts = [MG.nodes[n]["member_count"] for n in MG.nodes]
-    c_min, c_max = min(counts), max(counts)
+    counts = np.array([MG.nodes[c]["member_count"] for c in cids], dtype=float)
+    c_min, c_max = counts.min(), counts.max()
     c_range = c_max - c_min if c_max > c_min else 1
 
-    xs, ys, sizes, colors, hovers, labels = [], [], [], [], [], []
-    for cid in MG.nodes:
+    colors, hovers, labels = [], [], []
+    for cid in cids:
         d = MG.nodes[cid]
-        x, y = pos[cid]
-        xs.append(x)
-        ys.append(y)
-        size = 20 + 60 * ((d["member_count"] - c_min) / c_range)
-        sizes.append(size)
         colors.append(COMMUNITY_COLORS[cid % len(COMMUNITY_COLORS)] if cid >= 0 else "#555")
         labels.append(d["title"][:30])
 
@@ -307,11 +346,12 @@ def make_community_figure(G, community_summaries):
             hover += f"<br><br>Key insights:<br>{insights}"
         hovers.append(hover)
 
-    node_trace = go.Scatter(
-        x=xs, y=ys,
+    node_trace = dict(
+        type="scatter",
+        x=positions[:, 0], y=positions[:, 1],
         mode="markers+text",
         marker=dict(
-            size=sizes,
+            size=20 + 60 * ((counts - c_min) / c_range),
             color=colors,
             line=dict(width=2, color="#222"),
             opacity=0.85,
@@ -324,9 +364,7 @@ def make_community_figure(G, community_summaries):
         showlegend=False,
     )
 
-    fig = go.Figure(data=[edge_trace, edge_mid_trace, node_trace])
-
-    fig.update_layout(
+    layout = dict(
         title=dict(
             text=f"DKIA Knowledge Graph — Community Overview ({MG.number_of_nodes()} communities)",
             font=dict(size=18, color="#f58231"),
@@ -342,7 +380,7 @@ def make_community_figure(G, community_summaries):
         margin=dict(l=10, r=10, t=50, b=10),
     )
 
-    return fig
+    return {"data": [edge_trace, edge_mid_trace, node_trace], "layout": layout}
 
 
 # --- Main ---
@@ -359,6 +397,13 @@ def main():
                         help="Only include the N largest communities (0 = all)")
     parser.add_argument("--view", choices=["entity", "community"], default="entity",
                         help="Visualization view (default: entity)")
+    parser.add_argument("--layout", choices=["auto", "spring", "force"], default="auto",
+                        help=f"networkx spring layout, NumPy force layout for large graphs, or auto: "
+                             f"spring up to {SPRING_LAYOUT_LIMIT} nodes (default: auto)")
+    parser.add_argument("--cache-dir", default=GRAPH_SNAPSHOT_DIR,
+                        help=f"Snapshot cache directory (default: {GRAPH_SNAPSHOT_DIR})")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Read the database and lay out the graph without the snapshot cache")
     args = parser.parse_args()
 
     db_path = Path(args.db)
@@ -367,46 +412,25 @@ def main():
         raise SystemExit(1)
 
     print(f"Loading data from {db_path}...")
-    conn = sqlite3.connect(str(db_path))
-    cursor = conn.cursor()
-
-    entities = load_entities(cursor)
-    edges = load_relationships(cursor)
-    community_summaries = load_community_summaries(cursor)
-
-    conn.close()
-    print(f"Loaded {len(entities)} entities, {len(edges)} edges, "
+    cache_dir = None if args.no_cache else args.cache_dir
+    # The N largest communities are picked in SQL by the shared loader
+    inputs = load_graph_snapshot(str(db_path), args.top_communities, include_orphans=False, cache_dir=cache_dir)
+    store, community_summaries = inputs["store"], inputs["community_summaries"]
+    print(f"Loaded {store.n_entities} entities, {store.n_edges} edges, "
           f"{len(community_summaries)} community summaries")
 
-    # Sample: keep only top N largest communities
-    if args.top_communities > 0:
-        comm_counts: dict[int, int] = {}
-        for ent in entities.values():
-            cid = ent.get("community", -1)
-            if cid is not None and cid >= 0:
-                comm_counts[cid] = comm_counts.get(cid, 0) + 1
-        top_ids = sorted(comm_counts, key=lambda c: -comm_counts[c])[:args.top_communities]
-        top_set = set(top_ids)
-        print(f"Sampling: keeping top {args.top_communities} communities "
-              f"(ids: {top_ids})")
-
-        entities = {n: e for n, e in entities.items() if e.get("community") in top_set}
-        edges = [(s, t, a) for s, t, a in edges if s in entities and t in entities]
-        community_summaries = {k: v for k, v in community_summaries.items() if k in top_set}
-        print(f"After sampling: {len(entities)} entities, {len(edges)} edges")
-
-    # Build graph
-    G = build_graph(entities, edges)
+    G = build_graph(store)
+    layouts = LayoutCache(str(db_path), args.layout, args.top_communities, cache_dir)
 
     # Generate figure
     if args.view == "community":
-        fig = make_community_figure(G, community_summaries)
+        fig = make_community_figure(G, community_summaries, layouts)
     else:
-        fig = make_entity_figure(G, community_summaries)
+        fig = make_entity_figure(G, community_summaries, layouts)
 
     # Write HTML
     output_path = Path(args.output)
-    fig.write_html(str(output_path), include_plotlyjs="cdn")
+    pio.write_html(fig, str(output_path), include_plotlyjs="cdn", validate=False)
     print(f"Visualization written to: {output_path.absolute()}")
 
     if not args.no_open:
@@ -1,41 +1,340 @@
-import os
-from fastapi import APIRouter
-from src.config import DB_PATH
-from src.services.graph_service import get_graph_data
+import asyncio
+from collections import Counter
+from functools import partial
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from src.config import (
+    DB_MIGRATE,
+    DB_PATH,
+    GRAPH_CACHE_SIZE,
+    GRAPH_COMMUNITY_CACHE_SIZE,
+    GRAPH_CONTEXT_CACHE_SIZE,
+    GRAPH_DELTA_HISTORY,
+    GRAPH_LAYOUT_HINTS,
+    GRAPH_WARM_KEYS,
+)
+from src.services.db import get_pool, migrate_graph_db
+from src.services.graph_cache import GraphCache, SingleFlight, db_fingerprint, fingerprint_version
+from src.services.graph_delta import SnapshotHistory, build_graph_delta, snapshot_context
+from src.services.graph_service import (
+    GraphDataError,
+    VizContext,
+    build_context_payload,
+    build_graph_overview,
+    get_community_data,
+    get_entity_chunks,
+    get_viz_context,
+    iter_viz_records,
+    load_chunk_texts,
+)
+from src.services.payload import (
+    JSON_MEDIA_TYPE,
+    EncodedPayload,
+    choose_encoding,
+    choose_media_type,
+    encode_payload,
+    etag_matches,
+    make_etag,
+    ndjson_chunks,
+)
+from src.services.viz_materialize import load_viz_overview, load_viz_positions
 
 router = APIRouter()
 
-# Simple in-memory cache
-_cache = {
-    "key": None,
-    "data": None,
-    "mtime": 0
-}
+# In-memory LRU of encoded payloads, keyed on query params and dropped when the DB fingerprint changes
+_cache = GraphCache(maxsize=GRAPH_CACHE_SIZE)
+# Loaded + filtered graph state, so lazy endpoints don't re-read the DB per community
+_contexts = GraphCache(maxsize=GRAPH_CONTEXT_CACHE_SIZE)
+_community_cache = GraphCache(maxsize=GRAPH_COMMUNITY_CACHE_SIZE)
+# Content hashes of recent versions per parameter set, so /delta can diff against what a client holds
+_history = SnapshotHistory(versions=GRAPH_DELTA_HISTORY)
+# Rebuilds run in worker threads; concurrent misses for the same key share one build
+_flights = SingleFlight()
+# How often each /data and /overview parameter set is requested, so the warmer rebuilds the popular ones
+_request_counts: Counter = Counter()
+MAX_TRACKED_KEYS = 1024
+DEFAULT_WARM_KEYS = [(0, False, 2, 0), ("overview", 0, False, 2)]
+# Largest batch /chunks serves in one request
+MAX_CHUNK_IDS = 200
+
+
+def _payload_response(request: Request, payload: EncodedPayload) -> Response:
+    """Serve pre-encoded bytes, answering conditional requests with 304."""
+    headers = {"ETag": payload.etag, "Vary": "Accept, Accept-Encoding", "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), payload.etag):
+        return Response(status_code=304, headers=headers)
+    encoding = choose_encoding(request.headers.get("accept-encoding", ""), payload)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=payload.variant(encoding), media_type=payload.media_type, headers=headers)
+
+
+def _media_key(cache_key, media_type: str):
+    """Cache key of one wire format of a payload; JSON keeps the bare key the warmer tracks."""
+    return cache_key if media_type == JSON_MEDIA_TYPE else (media_type,) + cache_key
+
+
+def _build_payload(cache: Optional[GraphCache], cache_key, fingerprint, build, *args,
+                   media_type: str = JSON_MEDIA_TYPE) -> Optional[EncodedPayload]:
+    """Worker-thread half of a cache miss: build the data, encode it once and store it."""
+    data = build(*args)
+    if data is None:
+        return None
+    key = _media_key(cache_key, media_type)
+    payload = encode_payload(data, fingerprint, key, media_type)
+    if cache is not None:
+        cache.put(key, payload, fingerprint)
+    return payload
+
+
+def _materialized_overview(fingerprint, include_orphans: bool, min_community_size: int) -> Optional[dict]:
+    """Whole-graph overview from the pipeline's viz tables, or None to build it from a loaded context."""
+    overview = load_viz_overview(DB_PATH, include_orphans, min_community_size, layout_hints=GRAPH_LAYOUT_HINTS)
+    if overview is None:
+        return None
+    overview.fingerprint = fingerprint
+    return build_graph_overview(overview)
+
+
+def _build_context(fingerprint, key, cache: Optional[GraphCache] = _contexts) -> VizContext:
+    """Graph for a parameter set, laid out from the pipeline's viz tables where they are fresh."""
+    top_communities, include_orphans, min_community_size = key
+    ctx = get_viz_context(DB_PATH, top_communities=top_communities, include_orphans=include_orphans, min_community_size=min_community_size,
+                          layout_hints=GRAPH_LAYOUT_HINTS)
+    if top_communities == 0:
+        load_viz_positions(ctx, DB_PATH, include_orphans)
+    ctx.fingerprint = fingerprint
+    if _history.get(key, fingerprint_version(fingerprint)) is None:
+        _history.record(key, snapshot_context(ctx))
+    if cache is not None:
+        cache.put(key, ctx, fingerprint)
+    return ctx
+
+
+async def _get_context(fingerprint, top_communities: int, include_orphans: bool, min_community_size: int) -> VizContext:
+    """Loaded graph for a parameter set. While the warmer refreshes this may be the previous version,
+    so payloads derived from it are tagged with ctx.fingerprint rather than the current one."""
+    key = (top_communities, include_orphans, min_community_size)
+    ctx = _contexts.get(key, fingerprint)
+    if ctx is None:
+        ctx = await _flights.run(("context", fingerprint, key), _build_context, fingerprint, key)
+    return ctx
+
+
+def _note_request(cache_key) -> None:
+    _request_counts[cache_key] += 1
+    if len(_request_counts) > MAX_TRACKED_KEYS:
+        keep = _request_counts.most_common(MAX_TRACKED_KEYS // 2)
+        _request_counts.clear()
+        _request_counts.update(dict(keep))
+
+
+def hold_stale_caches() -> None:
+    """Called by the warmer when the database starts changing: keep serving the current version."""
+    for cache in (_cache, _contexts, _community_cache):
+        cache.hold_stale()
+
+
+async def refresh_caches(fingerprint) -> bool:
+    """Rebuild the most-requested payloads for a new database version, then swap them in together.
+
+    Returns False (leaving the previous version in place) if the database changed again mid-build.
+    """
+    if DB_MIGRATE and await asyncio.to_thread(migrate_graph_db, DB_PATH):
+        return False  # migrating changed the file; the warmer refreshes once it settles again
+    keys = [key for key, _ in _request_counts.most_common(GRAPH_WARM_KEYS)] or list(DEFAULT_WARM_KEYS)
+    contexts, payloads = {}, {}
+    for key in keys:
+        # /overview keys are ("overview",) + params, /data keys are params + (max_entities,)
+        params = key[1:] if key[0] == "overview" else key[:3]
+        if params not in contexts:
+            contexts[params] = await asyncio.to_thread(_build_context, fingerprint, params, None)
+        if key[0] == "overview":
+            build, args = build_graph_overview, (contexts[params],)
+        else:
+            build, args = build_context_payload, (contexts[params], key[3])
+        payloads[key] = await asyncio.to_thread(_build_payload, None, key, fingerprint, build, *args)
+    if db_fingerprint(DB_PATH) != fingerprint:
+        return False
+    _contexts.swap(contexts, fingerprint)
+    _cache.swap(payloads, fingerprint)
+    _community_cache.swap({}, fingerprint)
+    return True
+
+
+def release_stale_caches() -> None:
+    for cache in (_cache, _contexts, _community_cache):
+        cache.release()
+
+
+def _check_page(max_entities: int, offset: int = 0) -> None:
+    if max_entities < 0 or offset < 0:
+        raise HTTPException(status_code=400, detail="max_entities and offset must not be negative")
+
 
 @router.get("/data")
-async def get_graph_data_api(top_communities: int = 0, include_orphans: bool = False, min_community_size: int = 2):
+async def get_graph_data_api(request: Request, top_communities: int = 0, include_orphans: bool = False, min_community_size: int = 2,
+                             max_entities: int = 0):
     """
     Returns the knowledge graph nodes and edges.
-    Automatically caches the payload based on the SQLite database's last modification time and query parameters.
+    With max_entities each community holds only its top-ranked entities, its strongest edges and an
+    "N more" placeholder; the rest is paged in through /community/{comm_id}?max_entities=&offset=.
+    Payloads for several parameter combinations are cached at once as serialized JSON plus
+    gzip/brotli variants, and invalidated together when the SQLite database's fingerprint
+    (mtime/size/inode) changes. Clients revalidate with If-None-Match and get 304 when unchanged.
+    Rebuilds run off the event loop, and concurrent misses for the same key await a single build.
+    Clients that accept application/vnd.graphrag.columnar get element lists as typed column arrays.
     """
+    _check_page(max_entities)
+    fingerprint = db_fingerprint(DB_PATH)
+    cache_key = (top_communities, include_orphans, min_community_size, max_entities)
+    media_type = choose_media_type(request.headers.get("accept", ""))
+
+    _note_request(cache_key)
+    payload = _cache.get(_media_key(cache_key, media_type), fingerprint)
+    if payload is None:
+        # Cache miss: the context is shared with the lazy endpoints and its snapshot recorded for /delta
+        try:
+            ctx = await _get_context(fingerprint, top_communities, include_orphans, min_community_size)
+        except GraphDataError as e:
+            return {"error": str(e)}
+        payload = await _flights.run(("data", media_type, ctx.fingerprint, cache_key), partial(_build_payload, media_type=media_type),
+                                     _cache, cache_key, ctx.fingerprint, build_context_payload, ctx, max_entities)
+
+    return _payload_response(request, payload)
+
+@router.get("/stream")
+async def get_graph_stream_api(request: Request, top_communities: int = 0, include_orphans: bool = False, min_community_size: int = 2):
+    """
+    The /data payload as newline-delimited JSON records, serialized while they are built: meta nodes,
+    inter-community edges, one record per community, then chunk refs. Server memory stays at the
+    shared graph context plus one record, and clients can render before the last community arrives.
+    """
+    fingerprint = db_fingerprint(DB_PATH)
     try:
-        current_mtime = os.path.getmtime(DB_PATH)
-    except OSError:
-        current_mtime = 0
-
-    cache_key = f"{top_communities}_{include_orphans}_{min_community_size}"
-
-    # Cache hit logic
-    if _cache.get("key") == cache_key and _cache.get("data") is not None and current_mtime == _cache.get("mtime") and current_mtime != 0:
-        return _cache["data"]
-
-    # Cache miss
-    data = get_graph_data(DB_PATH, top_communities=top_communities, include_orphans=include_orphans, min_community_size=min_community_size)
-    
-    # Store in cache if successful
-    if "error" not in data:
-        _cache["key"] = cache_key
-        _cache["data"] = data
-        _cache["mtime"] = current_mtime
-
-    return data
+        ctx = await _get_context(fingerprint, top_communities, include_orphans, min_community_size)
+    except GraphDataError as e:
+        return {"error": str(e)}
+    etag = make_etag(ctx.fingerprint, ("stream", top_communities, include_orphans, min_community_size))
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    # A sync iterator, so Starlette builds and serializes each batch in a worker thread
+    return StreamingResponse(ndjson_chunks(iter_viz_records(ctx)), media_type="application/x-ndjson", headers=headers)
+
+@router.get("/overview")
+async def get_graph_overview_api(request: Request, top_communities: int = 0, include_orphans: bool = False, min_community_size: int = 2):
+    """
+    Level 0 payload: community meta-nodes, inter-community edges and community summaries only.
+    Entities are fetched per community via /community/{comm_id}. The whole-graph overview is read
+    from the tables viz_materialize wrote at ingest time, and built from a loaded context only when
+    those are missing or stale.
+    """
+    fingerprint = db_fingerprint(DB_PATH)
+    cache_key = ("overview", top_communities, include_orphans, min_community_size)
+    media_type = choose_media_type(request.headers.get("accept", ""))
+    build = partial(_build_payload, media_type=media_type)
+
+    _note_request(cache_key)
+    payload = _cache.get(_media_key(cache_key, media_type), fingerprint)
+    if payload is None and top_communities == 0:
+        payload = await _flights.run(("materialized", media_type, fingerprint, cache_key), build,
+                                     _cache, cache_key, fingerprint, _materialized_overview,
+                                     fingerprint, include_orphans, min_community_size)
+    if payload is None:
+        try:
+            ctx = await _get_context(fingerprint, top_communities, include_orphans, min_community_size)
+        except GraphDataError as e:
+            return {"error": str(e)}
+        payload = await _flights.run(("payload", media_type, ctx.fingerprint, cache_key), build,
+                                     _cache, cache_key, ctx.fingerprint, build_graph_overview, ctx)
+
+    return _payload_response(request, payload)
+
+@router.get("/community/{comm_id}")
+async def get_community_api(request: Request, comm_id: int, top_communities: int = 0, include_orphans: bool = False, min_community_size: int = 2,
+                            max_entities: int = 0, offset: int = 0):
+    """
+    Entities, intra-community edges and semantic groups of one community, built on demand.
+    max_entities pages through the community by rank instead: the entities from offset on, pruned
+    edges, and an "N more" placeholder whose next_offset is the following page's offset.
+    """
+    _check_page(max_entities, offset)
+    fingerprint = db_fingerprint(DB_PATH)
+    cache_key = (top_communities, include_orphans, min_community_size, comm_id, max_entities, offset)
+    media_type = choose_media_type(request.headers.get("accept", ""))
+
+    payload = _community_cache.get(_media_key(cache_key, media_type), fingerprint)
+    if payload is None:
+        try:
+            ctx = await _get_context(fingerprint, top_communities, include_orphans, min_community_size)
+        except GraphDataError as e:
+            return {"error": str(e)}
+        payload = await _flights.run(("community", media_type, ctx.fingerprint, cache_key), partial(_build_payload, media_type=media_type),
+                                     _community_cache, cache_key, ctx.fingerprint, get_community_data, ctx, comm_id,
+                                     max_entities, offset)
+        if payload is None:
+            raise HTTPException(status_code=404, detail=f"Community {comm_id} not found")
+
+    return _payload_response(request, payload)
+
+@router.get("/delta")
+async def get_graph_delta_api(request: Request, since: str, top_communities: int = 0, include_orphans: bool = False, min_community_size: int = 2):
+    """
+    Changes to the overview since the version a client loaded: added, changed and removed meta elements
+    and summaries, plus the ids of communities whose payload changed. Falls back to the full overview
+    (full=true) when that version is no longer in the retained history.
+    """
+    fingerprint = db_fingerprint(DB_PATH)
+    params = (top_communities, include_orphans, min_community_size)
+    try:
+        ctx = await _get_context(fingerprint, *params)
+    except GraphDataError as e:
+        return {"error": str(e)}
+    base = _history.get(params, since)
+    current = _history.get(params, fingerprint_version(ctx.fingerprint))
+    cache_key = ("delta", since) + params
+    payload = await _flights.run(("payload", ctx.fingerprint, cache_key), _build_payload,
+                                 None, cache_key, ctx.fingerprint, build_graph_delta, ctx, base, current)
+    return _payload_response(request, payload)
+
+@router.get("/entity/{entity_id:path}/chunks")
+async def get_entity_chunks_api(entity_id: str, top_communities: int = 0, include_orphans: bool = False, min_community_size: int = 2):
+    """Source text chunks for one entity, addressed by its sanitized node id."""
+    fingerprint = db_fingerprint(DB_PATH)
+    try:
+        ctx = await _get_context(fingerprint, top_communities, include_orphans, min_community_size)
+    except GraphDataError as e:
+        return {"error": str(e)}
+    chunks = get_entity_chunks(ctx, entity_id)
+    if chunks is None:
+        raise HTTPException(status_code=404, detail=f"Entity {entity_id} not found")
+    return {"entity": entity_id, "chunks": chunks}
+
+@router.get("/chunks")
+async def get_chunk_texts_api(ids: str):
+    """Chunk bodies for a comma-separated batch of chunk ids, each distinct text sent once keyed by its content hash."""
+    try:
+        chunk_ids = [int(i) for i in ids.split(",") if i.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+    if len(chunk_ids) > MAX_CHUNK_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_CHUNK_IDS} chunk ids per request")
+    try:
+        return await asyncio.to_thread(load_chunk_texts, DB_PATH, chunk_ids)
+    except GraphDataError as e:
+        return {"error": str(e)}
+
+@router.get("/cache")
+async def get_graph_cache_stats():
+    """Hit/miss/eviction counters for the graph payload caches and the SQLite connection pool."""
+    return {
+        "payloads": _cache.stats(),
+        "contexts": _contexts.stats(),
+        "communities": _community_cache.stats(),
+        "connections": get_pool(DB_PATH).stats(),
+        "builds": _flights.stats(),
+        "history": _history.stats(),
+    }
@@ -0,0 +1,89 @@
+import asyncio
+from dataclasses import asdict
+from typing import List, Optional
+
+import httpx
+from fastapi import APIRouter, HTTPException
+
+from src.config import DB_PATH, EMBED_MODEL, SEARCH_MAX_TOP_K
+from src.services.embedding import EmbeddingClient
+from src.services.graph_cache import GraphCache, SingleFlight, db_fingerprint
+from src.services.retrieval import RETRIEVAL_AVAILABLE, RetrievalIndex, load_retrieval_index, search
+
+router = APIRouter()
+
+# The loaded embedding matrix of the current database version; replaced when the fingerprint changes
+_indexes = GraphCache(maxsize=1)
+_flights = SingleFlight()
+# Query embeddings go through one pooled client, opened on first use and closed on shutdown
+_embedder: Optional[EmbeddingClient] = None
+
+
+def _build_index(fingerprint) -> RetrievalIndex:
+    index = load_retrieval_index(DB_PATH)
+    index.fingerprint = fingerprint
+    _indexes.put("index", index, fingerprint)
+    return index
+
+
+async def _get_index(fingerprint) -> RetrievalIndex:
+    index = _indexes.get("index", fingerprint)
+    if index is None:
+        index = await _flights.run(("index", fingerprint), _build_index, fingerprint)
+    return index
+
+
+async def _embed_query(text: str) -> List[float]:
+    global _embedder
+    if _embedder is None:
+        _embedder = EmbeddingClient(model=EMBED_MODEL, max_retries=1)
+    return (await _embedder.post("/api/embed", {"model": _embedder.model, "input": text}))["embeddings"][0]
+
+
+async def close_embedder() -> None:
+    global _embedder
+    if _embedder is not None:
+        await _embedder.aclose()
+        _embedder = None
+
+
+@router.get("")
+async def search_entities(q: str, top_k: int = 10, semantic_weight: float = 0.6, temporal_weight: float = 0.2,
+                          graph_weight: float = 0.2, content_age_days: float = 0.0, exact: bool = False):
+    """
+    Triple-factor entity search: cosine similarity to the embedded query, temporal decay by each
+    entity's source half-life, and normalized pagerank, weighted and summed. Every embedded entity
+    is scored with one NumPy pass over the embedding matrix, which is loaded once per database version;
+    when an ANN index was built at ingest, only the candidates from its nearest lists are (exact=true
+    scores everything anyway).
+    """
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="q must not be empty")
+    if not 1 <= top_k <= SEARCH_MAX_TOP_K:
+        raise HTTPException(status_code=400, detail=f"top_k must be between 1 and {SEARCH_MAX_TOP_K}")
+    if not RETRIEVAL_AVAILABLE:
+        return {"error": "Search needs numpy installed"}
+    fingerprint = db_fingerprint(DB_PATH)
+    if fingerprint is None:
+        return {"error": f"Database not found at {DB_PATH}"}
+    try:
+        index = await _get_index(fingerprint)
+    except Exception as e:  # no entity_embeddings yet, or sqlite-vec missing to read them
+        return {"error": f"Could not load entity embeddings (run notebook 03): {e}"}
+    try:
+        query_vector = await _embed_query(q)
+    except (httpx.HTTPError, KeyError, IndexError) as e:
+        return {"error": f"Could not embed the query: {e}"}
+    try:
+        results = await asyncio.to_thread(search, index, DB_PATH, query_vector, top_k, semantic_weight,
+                                          temporal_weight, graph_weight, content_age_days, exact)
+    except ValueError as e:  # query and index embeddings differ in dimension
+        return {"error": str(e)}
+    return {"query": q, "entities": len(index), "ann": index.ann is not None and not exact and semantic_weight > 0,
+            "results": [asdict(result) for result in results]}
+
+
+@router.get("/cache")
+async def get_search_cache_stats():
+    """Hit/miss counters for the in-memory retrieval index."""
+    return {"index": _indexes.stats(), "builds": _flights.stats()}
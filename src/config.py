@@ -4,3 +4,60 @@ from pathlib import Path
 # Base directories
 BASE_DIR = Path(__file__).resolve().parent.parent
 DB_PATH = os.getenv("GRAPHRAG_DB_PATH", str(BASE_DIR / "notebooks" / "graphrag.db"))
+
+# Number of (top_communities, include_orphans, min_community_size) payloads kept in memory
+GRAPH_CACHE_SIZE = int(os.getenv("GRAPH_CACHE_SIZE", "8"))
+# Loaded graph contexts backing the lazy /overview, /community and /entity endpoints
+GRAPH_CONTEXT_CACHE_SIZE = int(os.getenv("GRAPH_CONTEXT_CACHE_SIZE", "2"))
+# Per-community payloads built on demand
+GRAPH_COMMUNITY_CACHE_SIZE = int(os.getenv("GRAPH_COMMUNITY_CACHE_SIZE", "256"))
+# Database versions per parameter set that /delta can diff against before falling back to a full payload
+GRAPH_DELTA_HISTORY = int(os.getenv("GRAPH_DELTA_HISTORY", "8"))
+
+# Unit-sphere fx/fy/fz layout hints on graph nodes (needs numpy), so the 3D client can skip warm-up; read from
+# the viz tables when viz_materialize has run, otherwise computed per community on first use
+GRAPH_LAYOUT_HINTS = os.getenv("GRAPH_LAYOUT_HINTS", "1") not in ("0", "false", "no")
+
+# Ollama chat endpoint used by the extraction pipeline (src/services/extraction.py)
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+LLM_MODEL = os.getenv("LLM_MODEL", "qwen2.5:3b")
+# Requests in flight at once; match the backend's parallel slots (OLLAMA_NUM_PARALLEL)
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "4"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "180"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+# Embedding stage (src/services/embedding.py): texts per /api/embed request and requests in flight
+EMBED_MODEL = os.getenv("EMBED_MODEL", "nomic-embed-text")
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+# Vectors by (model, content hash), kept outside graphrag.db so a rebuilt DB doesn't have to re-embed
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", str(BASE_DIR / ".cache" / "embeddings.db"))
+# Largest top_k /api/search returns
+SEARCH_MAX_TOP_K = int(os.getenv("SEARCH_MAX_TOP_K", "100"))
+# IVF indexes of the entity and chunk vectors, built next to graphrag.db (src/services/ann_index.py);
+# tables with fewer vectors than ANN_MIN_ROWS get none and are searched exactly
+ANN_MIN_ROWS = int(os.getenv("ANN_MIN_ROWS", "50000"))
+# Inverted lists scanned per query, and ANN candidates the triple-factor score reranks per requested hit
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "16"))
+ANN_CANDIDATES_PER_HIT = int(os.getenv("ANN_CANDIDATES_PER_HIT", "10"))
+# Persistent LLM response cache (src/services/llm_cache.py) and the stored response bytes it keeps
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", str(BASE_DIR / ".cache" / "llm_responses.db"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# Read-only SQLite connections kept open for graph loads, and their per-connection tuning
+DB_POOL_SIZE = int(os.getenv("GRAPHRAG_DB_POOL_SIZE", "4"))
+DB_MMAP_SIZE = int(os.getenv("GRAPHRAG_DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+DB_CACHE_SIZE_KB = int(os.getenv("GRAPHRAG_DB_CACHE_SIZE_KB", str(64 * 1024)))
+# Opt-in: let the web service add missing loader indexes and chunk content hashes to the DB on startup and
+# after each ingest. Off by default, since it writes to the pipeline's DB; the pipeline migrates it instead
+# (notebook 02's last step, or python -m src.services.viz_materialize)
+DB_MIGRATE = os.getenv("GRAPHRAG_DB_MIGRATE", "0") not in ("0", "false", "no")
+# Pickled graph loads the viz scripts reuse while the DB fingerprint is unchanged
+GRAPH_SNAPSHOT_DIR = os.getenv("GRAPH_SNAPSHOT_DIR", str(BASE_DIR / ".cache" / "graph_snapshots"))
+
+# Background warmer: polls the DB fingerprint and rebuilds popular payloads once the writer is done
+GRAPH_WARMER_ENABLED = os.getenv("GRAPH_WARMER_ENABLED", "1") not in ("0", "false", "no")
+GRAPH_WARMER_INTERVAL = float(os.getenv("GRAPH_WARMER_INTERVAL", "2.0"))
+# Consecutive unchanged polls required before a new fingerprint counts as finished writing
+GRAPH_WARMER_SETTLE_POLLS = int(os.getenv("GRAPH_WARMER_SETTLE_POLLS", "2"))
+# Number of most-requested /data and /overview parameter sets rebuilt per refresh
+GRAPH_WARM_KEYS = int(os.getenv("GRAPH_WARM_KEYS", "4"))
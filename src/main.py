@@ -1,13 +1,47 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse
 
+from src import config
+from src.api import graph
 from src.api.graph import router as graph_router
-
-app = FastAPI(title="DKIA - Daily Knowledge Ingestion Assistant")
+from src.api import search
+from src.api.search import router as search_router
+from src.services.cache_warmer import CacheWarmer
+from src.services.db import close_pools, migrate_graph_db
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if config.DB_MIGRATE:
+        await asyncio.to_thread(migrate_graph_db, graph.DB_PATH)
+    warmer = None
+    if config.GRAPH_WARMER_ENABLED:
+        warmer = CacheWarmer(
+            lambda: graph.DB_PATH,
+            on_change=graph.hold_stale_caches,
+            refresh=graph.refresh_caches,
+            on_failure=graph.release_stale_caches,
+            interval=config.GRAPH_WARMER_INTERVAL,
+            settle_polls=config.GRAPH_WARMER_SETTLE_POLLS,
+        )
+        warmer.start()
+    app.state.cache_warmer = warmer
+    yield
+    if warmer is not None:
+        await warmer.stop()
+    await search.close_embedder()
+    close_pools()
+
+
+app = FastAPI(title="DKIA - Daily Knowledge Ingestion Assistant", lifespan=lifespan)
 
 app.include_router(graph_router, prefix="/api/graph", tags=["graph"])
+app.include_router(search_router, prefix="/api/search", tags=["search"])
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="src/web/static"), name="static")
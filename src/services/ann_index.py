@@ -0,0 +1,374 @@
+"""IVF-flat approximate nearest-neighbour indexes over the embedding tables, persisted next to graphrag.db.
+
+Exact search scores every stored vector per query, so its cost grows with
+the corpus (O(N * dim)). An inverted-file index clusters the unit-length
+vectors with spherical k-means into `nlist` lists; a query is compared with
+the list centroids and only the vectors of the `nprobe` nearest lists are
+scored, exactly, against it. Recall is traded for speed through nprobe.
+
+Indexes are built at ingest time (notebook 03, after the embedding stage,
+or `python -m src.services.ann_index`) for the tables something searches,
+which is the entity table behind /api/search.
+Each lives in its own directory, <graphrag.db>.ann/<table>/:
+    meta.json      format version, row count, dimension, nlist, signature
+    centroids.npy  (nlist, dim) float32, unit length
+    offsets.npy    (nlist + 1,) int64; list l holds rows offsets[l]:offsets[l + 1]
+    ids.npy        (n,) int64 row ids, grouped by list
+    vectors.npy    (n, dim) float32 unit vectors, grouped by list
+and vectors.npy is memory-mapped when loaded, so the search service neither
+copies it into memory nor re-reads the vec0 table. The signature is a hash
+of the table's embedding_state rows (or its ids, without that table); an
+index whose signature no longer matches the database is ignored. Tables
+with fewer than ANN_MIN_ROWS vectors get no index and are searched exactly.
+
+Usage:
+    python -m src.services.ann_index                  # config DB_PATH
+    python -m src.services.ann_index --db path/to/graphrag.db --nlist 1024
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import math
+import os
+import shutil
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import quote
+
+from src.config import ANN_MIN_ROWS, ANN_NPROBE, DB_PATH
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; without it nothing is indexed and search is unavailable
+    np = None
+
+try:
+    import sqlite_vec
+except ImportError:  # only needed to read the vec0 tables notebook 03 writes
+    sqlite_vec = None
+
+logger = logging.getLogger(__name__)
+
+# Bump when the files' layout or meaning changes; older indexes then count as missing
+ANN_FORMAT_VERSION = 1
+# Vector tables that get an index, with their id columns. Chunk and claim vectors are never searched by
+# similarity, so an index of them would only cost build time and disk.
+ANN_TABLES = {
+    "entity_embeddings": "entity_id",
+}
+# k-means trains on at most this many vectors per list, for this many iterations
+TRAIN_SAMPLE_PER_LIST = 64
+KMEANS_ITERATIONS = 12
+# Rows per block when assigning vectors to lists, bounding the (block, nlist) score matrix
+ASSIGN_BLOCK = 16384
+
+
+def connect_readonly(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(f"file:{quote(os.path.abspath(db_path))}?mode=ro", uri=True)
+    if sqlite_vec is not None:
+        conn.enable_load_extension(True)
+        sqlite_vec.load(conn)
+        conn.enable_load_extension(False)
+    return conn
+
+
+def read_embeddings(conn: sqlite3.Connection, table: str, id_column: str,
+                    keep=None) -> Tuple[List[int], "np.ndarray"]:
+    """(ids, float32 matrix) of a vector table in id order, optionally only ids in `keep`.
+
+    Rows are copied one by one into a preallocated matrix, so reading peaks
+    near the matrix's own size; empty blobs and ones of another dimension
+    than the first are skipped.
+    """
+    capacity = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    ids: List[int] = []
+    embeddings = None
+    for row_id, blob in conn.execute(f"SELECT {id_column}, embedding FROM {table} ORDER BY {id_column}"):
+        if (keep is not None and row_id not in keep) or not blob or len(ids) >= capacity:
+            continue
+        if embeddings is None:
+            embeddings = np.empty((capacity, len(blob) // 4), dtype=np.float32)
+        if len(blob) != embeddings.shape[1] * 4:
+            logger.warning("Skipping embedding of %s %s: %d bytes, expected %d",
+                           table, row_id, len(blob), embeddings.shape[1] * 4)
+            continue
+        embeddings[len(ids)] = np.frombuffer(blob, dtype=np.float32)
+        ids.append(row_id)
+    if embeddings is None:
+        embeddings = np.empty((0, 0), dtype=np.float32)
+    elif len(ids) < capacity:
+        embeddings = embeddings[:len(ids)].copy()
+    return ids, embeddings
+
+
+def normalize_rows(matrix: "np.ndarray", block: int = ASSIGN_BLOCK) -> "np.ndarray":
+    """Scale a float32 matrix's rows to unit length in place (zero rows stay zero), block by block."""
+    for start in range(0, len(matrix), block):
+        rows = matrix[start:start + block]
+        norms = np.sqrt(np.einsum("ij,ij->i", rows, rows))
+        norms[norms == 0] = 1.0
+        rows /= norms[:, None]
+    return matrix
+
+
+def embedding_signature(conn: sqlite3.Connection, table: str, id_column: str) -> str:
+    """Hash of what a vector table currently holds: its embedding_state rows, or its ids without them.
+
+    embedding_state changes whenever a row's vector is written or removed
+    (text hash and model per row), so the hash identifies the vectors without
+    reading them.
+    """
+    digest = hashlib.sha256(table.encode())
+    try:
+        rows = conn.execute("SELECT row_id, content_hash, model FROM embedding_state "
+                            "WHERE table_name = ? ORDER BY row_id", (table,)).fetchall()
+    except sqlite3.OperationalError:  # written before the embedding stage kept state
+        rows = []
+    if not rows:
+        rows = conn.execute(f"SELECT {id_column} FROM {table} ORDER BY {id_column}").fetchall()
+    for row in rows:
+        digest.update("\t".join(map(str, row)).encode())
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def default_nlist(n: int) -> int:
+    """Lists for n vectors: about 4 * sqrt(n), so each of the nprobe scanned lists holds ~sqrt(n) / 4."""
+    return max(1, min(n, int(4 * math.sqrt(n))))
+
+
+def _assign(vectors: "np.ndarray", centroids: "np.ndarray") -> "np.ndarray":
+    labels = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), ASSIGN_BLOCK):
+        labels[start:start + ASSIGN_BLOCK] = np.argmax(vectors[start:start + ASSIGN_BLOCK] @ centroids.T, axis=1)
+    return labels
+
+
+def train_centroids(vectors: "np.ndarray", nlist: int, iterations: int = KMEANS_ITERATIONS,
+                    seed: int = 0) -> "np.ndarray":
+    """Spherical k-means on a sample of unit vectors: (nlist, dim) unit centroids."""
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    sample_size = min(n, nlist * TRAIN_SAMPLE_PER_LIST)
+    sample = vectors[np.sort(rng.choice(n, sample_size, replace=False))] if sample_size < n else vectors
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        sums = np.zeros_like(centroids)
+        counts = np.zeros(nlist, dtype=np.int64)
+        for start in range(0, len(sample), ASSIGN_BLOCK):
+            block = sample[start:start + ASSIGN_BLOCK]
+            labels = np.argmax(block @ centroids.T, axis=1)
+            # Members of each list summed after sorting the block by list, one block-sized copy at a time
+            order = np.argsort(labels, kind="stable")
+            present, starts, block_counts = np.unique(labels[order], return_index=True, return_counts=True)
+            sums[present] += np.add.reduceat(block[order], starts, axis=0)
+            counts[present] += block_counts
+        filled = counts > 0
+        centroids[filled] = sums[filled]
+        empty = np.flatnonzero(~filled)
+        if len(empty):  # restart lists that lost every member at random sample points
+            centroids[empty] = sample[rng.choice(len(sample), len(empty), replace=False)]
+        normalize_rows(centroids)
+    return centroids
+
+
+@dataclass
+class IVFIndex:
+    """Inverted lists over unit vectors; row r of ids and vectors belongs to the list whose offsets span it."""
+    centroids: "np.ndarray"
+    offsets: "np.ndarray"
+    ids: "np.ndarray"
+    vectors: "np.ndarray"
+    signature: str = ""
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @property
+    def dim(self) -> int:
+        return self.vectors.shape[1]
+
+    def search(self, query_vector: Sequence[float], k: int = 10,
+               nprobe: int = ANN_NPROBE) -> Tuple["np.ndarray", "np.ndarray"]:
+        """(rows, cosine similarities) of the k best rows among the nprobe nearest lists, best first."""
+        query = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+        if query.shape[0] != self.dim:
+            raise ValueError(f"query has {query.shape[0]} dimensions, the index {self.dim}")
+        norm = float(np.sqrt(query.dot(query)))
+        if norm > 0:
+            query = query / norm
+        nprobe = min(max(nprobe, 1), self.nlist)
+        probed = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        # Lists in file order, so a memory-mapped matrix is read front to back
+        probed.sort()
+        spans = [(int(self.offsets[l]), int(self.offsets[l + 1])) for l in probed]
+        spans = [(start, stop) for start, stop in spans if stop > start]
+        if not spans or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        rows = np.concatenate([np.arange(start, stop) for start, stop in spans])
+        scores = np.concatenate([self.vectors[start:stop] @ query for start, stop in spans])
+        if k < len(rows):
+            best = np.argpartition(-scores, k - 1)[:k]
+            rows, scores = rows[best], scores[best]
+        order = np.argsort(-scores, kind="stable")
+        return rows[order], scores[order]
+
+
+def write_ivf_index(directory: str, ids: Sequence[int], vectors: "np.ndarray", nlist: Optional[int] = None,
+                    signature: str = "", iterations: int = KMEANS_ITERATIONS, seed: int = 0) -> IVFIndex:
+    """Cluster vectors (normalized in place) into an IVF index at directory and return it, memory-mapped.
+
+    The files are written to a temporary sibling directory that then replaces
+    the old one, so a reader never sees a half-written index, and a search
+    service still mapping the old files keeps reading them until it reloads.
+    """
+    vectors = normalize_rows(np.asarray(vectors, dtype=np.float32))
+    n = len(vectors)
+    if n == 0:
+        raise ValueError("cannot index an empty table")
+    nlist = min(nlist or default_nlist(n), n)
+    centroids = train_centroids(vectors, nlist, iterations, seed)
+    labels = _assign(vectors, centroids)
+    order = np.argsort(labels, kind="stable")
+    offsets = np.zeros(nlist + 1, dtype=np.int64)
+    np.cumsum(np.bincount(labels, minlength=nlist), out=offsets[1:])
+
+    tmp = f"{directory}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    np.save(os.path.join(tmp, "centroids.npy"), centroids)
+    np.save(os.path.join(tmp, "offsets.npy"), offsets)
+    np.save(os.path.join(tmp, "ids.npy"), np.asarray(ids, dtype=np.int64)[order])
+    # Reordered block by block straight into the file, so only one copy of the matrix is in memory
+    out = np.lib.format.open_memmap(os.path.join(tmp, "vectors.npy"), mode="w+", dtype=np.float32,
+                                    shape=vectors.shape)
+    for start in range(0, n, ASSIGN_BLOCK):
+        out[start:start + ASSIGN_BLOCK] = vectors[order[start:start + ASSIGN_BLOCK]]
+    out.flush()
+    del out
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump({"version": ANN_FORMAT_VERSION, "count": n, "dim": int(vectors.shape[1]), "nlist": nlist,
+                   "signature": signature, "built_at": time.time()}, f)
+
+    old = f"{directory}.old-{os.getpid()}"
+    if os.path.exists(directory):
+        os.rename(directory, old)
+    os.rename(tmp, directory)
+    shutil.rmtree(old, ignore_errors=True)
+    return read_ivf_index(directory)
+
+
+def read_ivf_index(directory: str, signature: Optional[str] = None, mmap: bool = True) -> Optional[IVFIndex]:
+    """The index at directory with vectors memory-mapped, or None when missing, outdated or not matching signature."""
+    if np is None:
+        return None
+    try:
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("version") != ANN_FORMAT_VERSION:
+            return None
+        if signature is not None and meta.get("signature") != signature:
+            return None
+        index = IVFIndex(
+            centroids=np.load(os.path.join(directory, "centroids.npy")),
+            offsets=np.load(os.path.join(directory, "offsets.npy")),
+            ids=np.load(os.path.join(directory, "ids.npy")),
+            vectors=np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r" if mmap else None),
+            signature=meta.get("signature", ""),
+        )
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring ANN index at %s: %s", directory, e)
+        return None
+    if len(index) != meta.get("count") or index.offsets[-1] != len(index) or index.vectors.shape != (len(index), meta.get("dim")):
+        logger.warning("Ignoring ANN index at %s: files don't match meta.json", directory)
+        return None
+    return index
+
+
+def ann_index_dir(db_path: str, table: str) -> str:
+    return os.path.join(f"{os.path.abspath(db_path)}.ann", table)
+
+
+def load_ann_index(db_path: str, table: str = "entity_embeddings",
+                   conn: Optional[sqlite3.Connection] = None) -> Optional[IVFIndex]:
+    """A table's index if one was built for its current vectors, else None (search it exactly)."""
+    directory = ann_index_dir(db_path, table)
+    if np is None or not os.path.exists(os.path.join(directory, "meta.json")):
+        return None
+    own = conn is None
+    conn = conn or connect_readonly(db_path)
+    try:
+        signature = embedding_signature(conn, table, ANN_TABLES[table])
+    except sqlite3.OperationalError:  # the table is gone
+        return None
+    finally:
+        if own:
+            conn.close()
+    index = read_ivf_index(directory, signature)
+    if index is None:
+        logger.info("ANN index for %s is out of date; searching it exactly", table)
+    return index
+
+
+def build_ann_indexes(db_path: str = DB_PATH, tables: Sequence[str] = tuple(ANN_TABLES),
+                      min_rows: int = ANN_MIN_ROWS, nlist: Optional[int] = None) -> Dict[str, Dict]:
+    """(Re)build the index of every table with at least min_rows vectors; smaller ones lose theirs,
+    as do tables no longer in ANN_TABLES.
+
+    Returns per table {"rows", "nlist", "seconds"}, or {"rows", "skipped"}
+    when left to exact search. Needs numpy, and sqlite-vec to read vec0 tables.
+    """
+    if np is None:
+        raise RuntimeError("ANN indexes need numpy")
+    results: Dict[str, Dict] = {}
+    root = os.path.dirname(ann_index_dir(db_path, ""))
+    for name in os.listdir(root) if os.path.isdir(root) else []:
+        if name.split(".")[0] not in ANN_TABLES:  # also a retired table's leftover .tmp-/.old directories
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+    conn = connect_readonly(db_path)
+    try:
+        for table in tables:
+            id_column = ANN_TABLES[table]
+            directory = ann_index_dir(db_path, table)
+            try:
+                rows = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            except sqlite3.OperationalError:
+                rows = 0
+            if rows < max(min_rows, 1):
+                shutil.rmtree(directory, ignore_errors=True)
+                results[table] = {"rows": rows, "skipped": f"fewer than {min_rows} vectors, searched exactly"}
+                continue
+            start = time.perf_counter()
+            signature = embedding_signature(conn, table, id_column)
+            ids, vectors = read_embeddings(conn, table, id_column)
+            index = write_ivf_index(directory, ids, vectors, nlist, signature)
+            del vectors
+            results[table] = {"rows": len(index), "nlist": index.nlist, "seconds": round(time.perf_counter() - start, 2)}
+            logger.info("%s: %s", table, results[table])
+    finally:
+        conn.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the ANN indexes of graphrag.db's embedding tables")
+    parser.add_argument("--db", default=DB_PATH, help="path to graphrag.db")
+    parser.add_argument("--nlist", type=int, default=None, help="inverted lists per index (default ~4*sqrt(rows))")
+    parser.add_argument("--min-rows", type=int, default=ANN_MIN_ROWS, help="smaller tables are searched exactly")
+    args = parser.parse_args()
+    if not os.path.exists(args.db):
+        parser.error(f"{args.db} not found")
+    for table, result in build_ann_indexes(args.db, min_rows=args.min_rows, nlist=args.nlist).items():
+        print(f"{table}: {result}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import os
+import sqlite3
+from typing import Awaitable, Callable, Optional
+
+from src.services.graph_cache import Fingerprint, db_fingerprint
+
+logger = logging.getLogger(__name__)
+
+
+def writer_active(db_path: str) -> bool:
+    """Whether a write transaction may still be open on the DB.
+
+    In rollback-journal mode a -journal file exists for exactly as long as a
+    write transaction. In WAL mode the -wal file outlives transactions, so a
+    non-empty one is probed with BEGIN IMMEDIATE, which fails while another
+    connection holds the write lock. If the probe can't run (e.g. a read-only
+    file), a writer is assumed.
+    """
+    if os.path.exists(db_path + "-journal"):
+        return True
+    try:
+        if os.path.getsize(db_path + "-wal") == 0:
+            return False
+    except OSError:
+        return False
+    try:
+        conn = sqlite3.connect(db_path, timeout=0, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("ROLLBACK")
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.debug("Write lock probe on %s failed: %s", db_path, e)
+        return True
+    return False
+
+
+class CacheWarmer:
+    """Watch the SQLite file and refresh graph caches after the nightly pipeline rewrites it.
+
+    Polls the database fingerprint. On the first change it calls on_change,
+    so readers keep getting the previous version. Once the new fingerprint
+    has stayed the same for settle_polls consecutive polls and no write
+    transaction is open, it awaits refresh(fingerprint), which builds and
+    swaps in the new payloads. A refresh returning False, or raising, is
+    retried on the next change.
+    """
+
+    def __init__(
+        self,
+        db_path: Callable[[], str],
+        on_change: Callable[[], None],
+        refresh: Callable[[Fingerprint], Awaitable[bool]],
+        on_failure: Optional[Callable[[], None]] = None,
+        interval: float = 2.0,
+        settle_polls: int = 2,
+    ):
+        self._db_path = db_path
+        self._on_change = on_change
+        self._refresh = refresh
+        self._on_failure = on_failure
+        self.interval = interval
+        self.settle_polls = max(0, settle_polls)
+        self.current: Optional[Fingerprint] = None
+        self.refreshes = 0
+        self.failures = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _try_refresh(self, fingerprint: Fingerprint) -> bool:
+        try:
+            done = await self._refresh(fingerprint)
+        except Exception:
+            logger.exception("Graph cache refresh failed")
+            done = False
+            self.failures += 1
+            if self._on_failure is not None:
+                self._on_failure()
+            # Don't rebuild the same broken version on every poll
+            self.current = fingerprint
+            return False
+        if done:
+            self.current = fingerprint
+            self.refreshes += 1
+        return done
+
+    async def run(self) -> None:
+        path = self._db_path()
+        self.current = db_fingerprint(path)
+        if self.current is not None:
+            await self._try_refresh(self.current)  # warm on startup
+
+        candidate: Optional[Fingerprint] = None
+        stable = 0
+        holding = False
+        while True:
+            await asyncio.sleep(self.interval)
+            path = self._db_path()
+            fingerprint = db_fingerprint(path)
+            if fingerprint == self.current:
+                candidate, stable = None, 0
+                continue
+            if not holding:
+                self._on_change()
+                holding = True
+            if fingerprint != candidate:
+                candidate, stable = fingerprint, 0
+                continue
+            stable += 1
+            if fingerprint is None or stable < self.settle_polls or writer_active(path):
+                continue
+            if await self._try_refresh(fingerprint) or self.current == fingerprint:
+                holding = False
+            candidate, stable = None, 0
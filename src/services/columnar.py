@@ -0,0 +1,142 @@
+import json
+import math
+import struct
+import sys
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+# Accept / Content-Type of the binary column layout; decodeColumnar in graph.js reads it
+COLUMNAR_MEDIA_TYPE = "application/vnd.graphrag.columnar"
+COLUMNAR_MAGIC = b"GRC1"
+# Typed arrays are read in place by the browser, so every buffer starts on this boundary
+_ALIGN = 4
+_INT32_RANGE = (-2**31, 2**31)
+
+
+def _element_runs(value: Any) -> Optional[List[Tuple[int, int]]]:
+    """(start, end) runs of same-keyed elements if value is a non-empty list of Cytoscape-style
+    {"data": {...}} elements, e.g. meta nodes followed by meta edges; None for any other value."""
+    if not isinstance(value, list) or not value:
+        return None
+    runs: List[Tuple[int, int]] = []
+    keys = None
+    for i, item in enumerate(value):
+        if not isinstance(item, dict) or len(item) != 1 or not isinstance(item.get("data"), dict):
+            return None
+        item_keys = tuple(item["data"])
+        if item_keys != keys:
+            runs.append((i, i + 1))
+            keys = item_keys
+        else:
+            runs[-1] = (runs[-1][0], i + 1)
+    return runs
+
+
+class _Buffers:
+    """Typed column buffers plus one string table shared by every string column in the payload."""
+
+    def __init__(self):
+        self.data = bytearray()
+        self.strings: Dict[str, int] = {}
+
+    def add(self, typecode: str, values) -> int:
+        arr = array(typecode, values)
+        if sys.byteorder == "big":
+            arr.byteswap()  # the wire format is little-endian
+        self.data.extend(b"\0" * (-len(self.data) % _ALIGN))
+        offset = len(self.data)
+        self.data.extend(arr.tobytes())
+        return offset
+
+
+def _column(values: List[Any], buffers: _Buffers) -> Dict[str, Any]:
+    """Pick the most compact encoding that round-trips values: float32, int32, string table index or plain JSON."""
+    if all(v is None or type(v) is float for v in values) and any(v is not None for v in values):
+        return {"type": "f32", "offset": buffers.add("f", [math.nan if v is None else v for v in values])}
+    if all(type(v) is int and _INT32_RANGE[0] <= v < _INT32_RANGE[1] for v in values):
+        return {"type": "i32", "offset": buffers.add("i", values)}
+    if all(type(v) is str for v in values):
+        strings = buffers.strings
+        return {"type": "str", "offset": buffers.add("I", [strings.setdefault(v, len(strings)) for v in values])}
+    return {"type": "json", "values": values}
+
+
+def _to_columns(value: Any, buffers: _Buffers) -> Any:
+    if isinstance(value, dict):
+        return {k: _to_columns(v, buffers) for k, v in value.items()}
+    runs = _element_runs(value)
+    if runs is not None:
+        tables = []
+        for start, end in runs:
+            run = value[start:end]
+            tables.append({"n": len(run), "columns": [[k, _column([el["data"][k] for el in run], buffers)]
+                                                      for k in run[0]["data"]]})
+        return {"$elements": tables}
+    if isinstance(value, list):
+        return [_to_columns(v, buffers) for v in value]
+    return value
+
+
+def encode_columnar(data: Any) -> bytes:
+    """Serialize a graph payload with each element list turned into per-key column arrays.
+
+    Layout: magic, uint32 header length, the JSON header {"strings", "data"}
+    (the payload with each element list replaced by {"$elements": [...]},
+    one {n, columns} table per run of same-keyed elements), then the typed
+    column buffers, aligned to 4 bytes from the start of the body. Numbers
+    are little-endian; floats are float32 with NaN standing for null; string
+    columns are uint32 indexes into "strings", so an entity name is sent
+    once however many ids, labels and edge endpoints repeat it.
+    """
+    buffers = _Buffers()
+    columns = _to_columns(data, buffers)
+    header = json.dumps({"strings": list(buffers.strings), "data": columns}, ensure_ascii=False, allow_nan=False,
+                        separators=(",", ":")).encode("utf-8")
+    prefix = COLUMNAR_MAGIC + struct.pack("<I", len(header)) + header
+    return prefix + b"\0" * (-len(prefix) % _ALIGN) + bytes(buffers.data)
+
+
+_TYPECODES = {"f32": "f", "i32": "i", "str": "I"}
+
+
+def _read_column(spec: Dict[str, Any], n: int, body: memoryview, base: int, strings: List[str]) -> List[Any]:
+    kind = spec["type"]
+    if kind == "json":
+        return spec["values"]
+    arr = array(_TYPECODES[kind])
+    start = base + spec["offset"]
+    arr.frombytes(body[start:start + n * arr.itemsize])
+    if sys.byteorder == "big":
+        arr.byteswap()
+    if kind == "f32":
+        return [None if math.isnan(v) else v for v in arr]
+    if kind == "str":
+        return [strings[i] for i in arr]
+    return arr.tolist()
+
+
+def _from_columns(value: Any, body: memoryview, base: int, strings: List[str]) -> Any:
+    if isinstance(value, dict):
+        tables = value.get("$elements")
+        if tables is not None and len(value) == 1:
+            elements = []
+            for table in tables:
+                n = table["n"]
+                columns: List[Tuple[str, List[Any]]] = [(k, _read_column(spec, n, body, base, strings))
+                                                        for k, spec in table["columns"]]
+                elements.extend({"data": {k: col[i] for k, col in columns}} for i in range(n))
+            return elements
+        return {k: _from_columns(v, body, base, strings) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_from_columns(v, body, base, strings) for v in value]
+    return value
+
+
+def decode_columnar(body: bytes) -> Any:
+    """Inverse of encode_columnar (floats come back at float32 precision)."""
+    if body[:4] != COLUMNAR_MAGIC:
+        raise ValueError("not a columnar graph payload")
+    (header_len,) = struct.unpack_from("<I", body, 4)
+    header_end = 8 + header_len
+    header = json.loads(body[8:header_end].decode("utf-8"))
+    return _from_columns(header["data"], memoryview(body), header_end + (-header_end % _ALIGN), header["strings"])
@@ -0,0 +1,205 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+from urllib.parse import quote
+
+from src.config import DB_CACHE_SIZE_KB, DB_MMAP_SIZE, DB_POOL_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Enough for every loader query plus the lazy-endpoint queries, so each keeps its prepared statement
+STATEMENT_CACHE_SIZE = 128
+
+
+class ConnectionPool:
+    """Reusable read-only connections to one SQLite database.
+
+    Connections open with mode=ro and query_only, so they never take write
+    locks and cannot hold up the nightly pipeline. Each one keeps its page
+    cache, mmap and prepared statements between requests. The pipeline
+    deletes and recreates graphrag.db, and a connection opened on the old
+    file would keep reading it, so all idle connections are dropped once the
+    file's inode changes.
+    """
+
+    def __init__(self, db_path: str, maxsize: int = DB_POOL_SIZE):
+        self.db_path = os.path.abspath(db_path)
+        self.maxsize = max(1, maxsize)
+        self._idle: List[sqlite3.Connection] = []
+        self._file_id: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.reused = 0
+        self.resets = 0
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            f"file:{quote(self.db_path)}?mode=ro",
+            uri=True,
+            check_same_thread=False,  # handed between worker threads, but only one at a time
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        conn.execute("PRAGMA query_only = ON")
+        conn.execute(f"PRAGMA mmap_size = {DB_MMAP_SIZE}")
+        conn.execute(f"PRAGMA cache_size = -{DB_CACHE_SIZE_KB}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        st = os.stat(self.db_path)
+        file_id = (st.st_dev, st.st_ino)
+        stale: List[sqlite3.Connection] = []
+        with self._lock:
+            if file_id != self._file_id:
+                if self._file_id is not None:
+                    self.resets += 1
+                stale, self._idle = self._idle, []
+                self._file_id = file_id
+            conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                self.opened += 1
+            else:
+                self.reused += 1
+        for old in stale:
+            old.close()
+        if conn is None:
+            conn = self._open()
+
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            with self._lock:
+                keep = file_id == self._file_id and len(self._idle) < self.maxsize
+                if keep:
+                    self._idle.append(conn)
+            if not keep:
+                conn.close()
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._file_id = None
+        for conn in idle:
+            conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "idle": len(self._idle),
+                "maxsize": self.maxsize,
+                "opened": self.opened,
+                "reused": self.reused,
+                "resets": self.resets,
+            }
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path: str) -> ConnectionPool:
+    """Process-wide pool for a database path, shared by the service layer and the API."""
+    key = os.path.abspath(db_path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(key)
+        return pool
+
+
+def close_pools() -> None:
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+# (index, table, column) the scoped graph loaders look rows up by. Databases written before
+# these existed, or by older notebook versions, get them from migrate_graph_db.
+GRAPH_INDEXES = [
+    ("idx_entities_community", "entities", "community_id"),
+    ("idx_relationships_source", "relationships", "source_id"),
+    ("idx_relationships_target", "relationships", "target_id"),
+    ("idx_entity_chunk_map_entity", "entity_chunk_map", "entity_name"),
+    ("idx_chunks_chunk_index", "chunks", "chunk_index"),
+]
+
+
+def _has_index(conn: sqlite3.Connection, table: str, column: str) -> bool:
+    """Whether any index on table leads with column (under whatever name it was created)."""
+    pk = [row for row in conn.execute(f"PRAGMA table_info({table})") if row[5]]
+    if len(pk) == 1 and pk[0][1] == column and pk[0][2].upper() == "INTEGER":
+        return True  # rowid alias
+    for row in conn.execute(f"PRAGMA index_list({table})"):
+        first = conn.execute(f"PRAGMA index_info({row[1]})").fetchone()
+        if first is not None and first[2] == column:
+            return True
+    return False
+
+
+def content_hash(text: str) -> str:
+    """Dedup key for chunk text: hex SHA-256 of its UTF-8 bytes."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _add_graph_indexes(conn: sqlite3.Connection, tables: Set[str]) -> List[str]:
+    created = []
+    for name, table, column in GRAPH_INDEXES:
+        if table in tables and not _has_index(conn, table, column):
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table}({column})")
+            created.append(name)
+    return created
+
+
+def _add_chunk_hashes(conn: sqlite3.Connection, tables: Set[str]) -> List[str]:
+    """chunks.content_hash, backfilled for every row the pipeline wrote without one."""
+    if "chunks" not in tables:
+        return []
+    applied = []
+    if "content_hash" not in {row[1] for row in conn.execute("PRAGMA table_info(chunks)")}:
+        conn.execute("ALTER TABLE chunks ADD COLUMN content_hash TEXT")
+        applied.append("chunks.content_hash")
+    conn.create_function("sha256_hex", 1, content_hash, deterministic=True)
+    backfilled = conn.execute(
+        "UPDATE chunks SET content_hash = sha256_hex(content) WHERE content_hash IS NULL AND content IS NOT NULL"
+    ).rowcount
+    if backfilled:
+        applied.append(f"content_hash for {backfilled} chunks")
+    return applied
+
+
+def migrate_graph_db(db_path: str, timeout: float = 1.0) -> List[str]:
+    """Idempotent migration: add missing GRAPH_INDEXES and chunk content hashes.
+
+    Returns what was applied, empty when the database was already up to date
+    (in which case nothing is written). The pipeline runs it after each ingest
+    (see viz_materialize); the web service only does so with DB_MIGRATE, on its
+    own short-lived connection that gives up on the write lock after timeout
+    seconds. Tables that don't exist are skipped, and a locked or read-only
+    database is logged and left alone; the loaders still work unmigrated, only
+    slower.
+    """
+    if not os.path.exists(db_path):
+        return []
+    try:
+        conn = sqlite3.connect(f"file:{quote(os.path.abspath(db_path))}?mode=rw", uri=True, timeout=timeout)
+        try:
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            with conn:
+                applied = _add_graph_indexes(conn, tables) + _add_chunk_hashes(conn, tables)
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.warning("Could not migrate %s: %s", db_path, e)
+        return []
+    if applied:
+        logger.info("Migrated %s: added %s", db_path, ", ".join(applied))
+    return applied
@@ -0,0 +1,265 @@
+"""Embedding stage: entities, chunks and claims into their sqlite-vec tables, in batches.
+
+Notebook 03 used to send one text per /api/embed call and INSERT each
+vector on its own, packed float by float with struct, after deleting all
+vectors of the previous run. Here texts go to /api/embed `batch_size` at a
+time with up to `concurrency` requests in flight (OllamaClient), each
+response becomes float32 blobs in one NumPy conversion, and every batch is
+written with executemany as it arrives. The whole stage runs in a single
+transaction, so a failed run leaves the previous embeddings in place.
+
+The stage is incremental: embedding_state records, per embedded row, the
+hash of its text and the model, and only rows whose hash or model differ
+are embedded again; vectors of deleted rows are removed. An EmbeddingCache
+keeps vectors across rebuilds of graphrag.db, so a nightly run costs in
+proportion to the day's new text rather than to the corpus.
+
+The connection must already have sqlite-vec loaded, since the tables are
+vec0 virtual tables; writing only needs (id, float32 blob) rows.
+
+Usage (in a notebook cell, where the event loop is already running):
+    with EmbeddingCache() as cache:
+        async with EmbeddingClient() as client:
+            counts = await embed_graph(client, conn, cache=cache)
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+from array import array
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+import httpx
+
+from src.config import (EMBED_BATCH_SIZE, EMBED_CACHE_PATH, EMBED_CONCURRENCY, EMBED_MODEL, LLM_MAX_RETRIES,
+                        OLLAMA_BASE_URL)
+from src.services.db import content_hash
+from src.services.ollama import OllamaClient
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; array packs the same float32 bytes row by row
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# Longer chunks are cut before embedding (the model's context is limited)
+MAX_CHUNK_CHARS = 8000
+# Per embedded row: the hash of the text its vector was computed from and the model that did it
+EMBEDDING_STATE_TABLE = "embedding_state"
+# Hashes per SELECT ... IN (...) against the embedding cache, under SQLite's parameter limit
+CACHE_LOOKUP_BATCH = 500
+
+
+def entity_text(name: str, entity_type: str, description: Optional[str]) -> str:
+    return f"{name} ({entity_type}): {description or 'No description'}"
+
+
+def chunk_text(content: str) -> str:
+    return content[:MAX_CHUNK_CHARS]
+
+
+def claim_text(claim_type: str, description: str) -> str:
+    return f"[{claim_type}] {description}"
+
+
+@dataclass(frozen=True)
+class EmbeddingTarget:
+    """A vec0 table, the query listing what goes in it as (id, *columns) and the text to embed for a row."""
+    table: str
+    id_column: str
+    query: str
+    text: Callable[..., str]
+
+
+EMBEDDING_TARGETS = (
+    EmbeddingTarget("entity_embeddings", "entity_id", "SELECT id, name, type, description FROM entities", entity_text),
+    EmbeddingTarget("chunk_embeddings", "chunk_id", "SELECT id, content FROM chunks", chunk_text),
+    EmbeddingTarget("claim_embeddings", "claim_id", "SELECT id, claim_type, description FROM claims", claim_text),
+)
+
+
+def float32_blobs(embeddings: Sequence[Sequence[float]]) -> List[bytes]:
+    """Each vector as the float32 buffer sqlite-vec stores, all converted in one NumPy call."""
+    if np is None:
+        return [array("f", vector).tobytes() for vector in embeddings]
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    if matrix.size == 0:
+        return [b""] * len(embeddings)
+    width = matrix.shape[1] * 4
+    buffer = matrix.tobytes()
+    return [buffer[start:start + width] for start in range(0, len(buffer), width)]
+
+
+class EmbeddingClient(OllamaClient):
+    """Async /api/embed client; see OllamaClient for pooling and retries."""
+
+    def __init__(self, base_url: str = OLLAMA_BASE_URL, model: str = EMBED_MODEL,
+                 concurrency: int = EMBED_CONCURRENCY, timeout: float = 120.0, max_retries: int = LLM_MAX_RETRIES,
+                 retry_backoff: float = 2.0, transport: Optional[httpx.AsyncBaseTransport] = None):
+        super().__init__(model, base_url, concurrency, timeout, max_retries, retry_backoff, transport)
+
+    async def embed(self, texts: Sequence[str]) -> List[bytes]:
+        """float32 blobs for texts, in order, from one /api/embed request."""
+        embeddings = (await self.post("/api/embed", {"model": self.model, "input": list(texts)})).get("embeddings", [])
+        if len(embeddings) != len(texts):
+            raise ValueError(f"/api/embed returned {len(embeddings)} embeddings for {len(texts)} texts")
+        return float32_blobs(embeddings)
+
+
+class EmbeddingCache:
+    """Vectors by (model, content hash) in their own SQLite file.
+
+    Notebook 02 recreates graphrag.db on every run, taking the sqlite-vec
+    tables with it; this file outlives it, so texts embedded by an earlier
+    run only cost a lookup.
+    """
+
+    def __init__(self, path: str = EMBED_CACHE_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30.0)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                PRIMARY KEY (model, content_hash)
+            ) WITHOUT ROWID
+        """)
+        self.hits = 0
+        self.misses = 0
+
+    def __enter__(self) -> "EmbeddingCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def get_many(self, model: str, hashes: Sequence[str]) -> Dict[str, bytes]:
+        found: Dict[str, bytes] = {}
+        for start in range(0, len(hashes), CACHE_LOOKUP_BATCH):
+            chunk = hashes[start:start + CACHE_LOOKUP_BATCH]
+            found.update(self._conn.execute(
+                f"SELECT content_hash, embedding FROM embeddings WHERE model = ? "
+                f"AND content_hash IN ({','.join('?' * len(chunk))})", (model, *chunk)))
+        self.hits += len(found)
+        self.misses += len(set(hashes)) - len(found)
+        return found
+
+    def put_many(self, model: str, vectors: Iterable[Tuple[str, bytes]]) -> None:
+        with self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings (model, content_hash, embedding) VALUES (?, ?, ?)",
+                                   ((model, content_hash, blob) for content_hash, blob in vectors))
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+async def embed_batches(client: EmbeddingClient, items: Sequence[Tuple[Hashable, str]],
+                        batch_size: int = EMBED_BATCH_SIZE) -> AsyncIterator[List[Tuple[Hashable, bytes]]]:
+    """Embed (key, text) items batch_size at a time, yielding (key, blob) batches as they complete.
+
+    Batches are requested concurrently, as many at a time as the client
+    allows; the rest are cancelled if the consumer stops early or one fails.
+    """
+    async def embed_batch(batch: Sequence[Tuple[Hashable, str]]) -> List[Tuple[Hashable, bytes]]:
+        blobs = await client.embed([text for _, text in batch])
+        return [(key, blob) for (key, _), blob in zip(batch, blobs)]
+
+    tasks = [asyncio.ensure_future(embed_batch(items[start:start + batch_size]))
+             for start in range(0, len(items), max(1, batch_size))]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def ensure_embedding_state(conn: sqlite3.Connection) -> None:
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {EMBEDDING_STATE_TABLE} (
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            content_hash TEXT NOT NULL,
+            model TEXT NOT NULL,
+            PRIMARY KEY (table_name, row_id)
+        ) WITHOUT ROWID
+    """)
+
+
+async def embed_target(client: EmbeddingClient, conn: sqlite3.Connection, target: EmbeddingTarget,
+                       batch_size: int = EMBED_BATCH_SIZE, cache: Optional[EmbeddingCache] = None,
+                       full: bool = False) -> Dict[str, int]:
+    """Bring one vec0 table up to date with its source rows; see embed_graph. Doesn't commit."""
+    model = client.model
+    rows = [(row[0], target.text(*row[1:])) for row in conn.execute(target.query)]
+    state = {row_id: (content_hash, row_model) for row_id, content_hash, row_model in conn.execute(
+        f"SELECT row_id, content_hash, model FROM {EMBEDDING_STATE_TABLE} WHERE table_name = ?", (target.table,))}
+    live = {row_id for row_id, _ in rows}
+    removed = [(row_id,) for row_id in state if row_id not in live]
+
+    ids_by_hash: Dict[str, List[int]] = defaultdict(list)
+    texts: Dict[str, str] = {}
+    for row_id, text in rows:
+        digest = content_hash(text)
+        if full or state.get(row_id) != (digest, model):
+            ids_by_hash[digest].append(row_id)
+            texts[digest] = text
+    stale = [(row_id,) for ids in ids_by_hash.values() for row_id in ids]
+
+    # Stale rows may still have an old vector (rows without state do, after a full run by older code)
+    delete = f"DELETE FROM {target.table} WHERE {target.id_column} = ?"
+    conn.executemany(delete, removed + stale)
+    conn.executemany(f"DELETE FROM {EMBEDDING_STATE_TABLE} WHERE table_name = ? AND row_id = ?",
+                     [(target.table, row_id) for row_id, in removed])
+
+    insert = f"INSERT INTO {target.table} ({target.id_column}, embedding) VALUES (?, ?)"
+    record = f"INSERT OR REPLACE INTO {EMBEDDING_STATE_TABLE} (table_name, row_id, content_hash, model) VALUES (?, ?, ?, ?)"
+
+    def write(vectors: Sequence[Tuple[str, bytes]]) -> None:
+        conn.executemany(insert, [(row_id, blob) for digest, blob in vectors for row_id in ids_by_hash[digest]])
+        conn.executemany(record, [(target.table, row_id, digest, model)
+                                  for digest, _ in vectors for row_id in ids_by_hash[digest]])
+
+    cached = cache.get_many(model, list(texts)) if cache is not None else {}
+    write(list(cached.items()))
+    pending = [(digest, text) for digest, text in texts.items() if digest not in cached]
+    async for batch in embed_batches(client, pending, batch_size):
+        if cache is not None:
+            cache.put_many(model, batch)
+        write(batch)
+    return {
+        "written": len(stale),
+        "embedded": len(pending),
+        "removed": len(removed),
+        "unchanged": len(rows) - len(stale),
+    }
+
+
+async def embed_graph(client: EmbeddingClient, conn: sqlite3.Connection,
+                      targets: Sequence[EmbeddingTarget] = EMBEDDING_TARGETS, batch_size: int = EMBED_BATCH_SIZE,
+                      cache: Optional[EmbeddingCache] = None, full: bool = False) -> Dict[str, Dict[str, int]]:
+    """Update every target's embeddings in one transaction; returns per table the counts of embed_target.
+
+    Only rows whose text hash or embedding model differ from what
+    embedding_state recorded are (re)written, and vectors of rows that are
+    gone are deleted; so switching EMBED_MODEL re-embeds everything, and
+    full=True forces that too (a model of another dimension also needs
+    the vec0 tables recreated at its size). Per table: rows written, texts sent to the
+    server (fewer with a cache or duplicate texts), rows removed, rows
+    left as they were.
+    """
+    counts: Dict[str, Dict[str, int]] = {}
+    with conn:
+        ensure_embedding_state(conn)
+        for target in targets:
+            counts[target.table] = await embed_target(client, conn, target, batch_size, cache, full)
+            logger.info("%s: %s", target.table, counts[target.table])
+    return counts
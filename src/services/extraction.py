@@ -0,0 +1,330 @@
+"""Entity, relationship and claim extraction over document chunks, with LLM calls in parallel.
+
+Notebook 01 used to call Ollama once per prompt, one chunk after another,
+so an ingest took (chunks x 3 x LLM latency). Here a fixed pool of workers
+takes chunks off a queue, and every request goes through one
+httpx.AsyncClient whose connection pool and semaphore hold in-flight calls
+to `concurrency`; set it to the number of requests the backend serves at
+once (OLLAMA_NUM_PARALLEL). Results are reassembled per document in chunk
+order, so they come out as the serial loop produced them whatever order the
+chunks finish in.
+
+Given an LLMResponseCache, the client answers repeated requests from it,
+so a re-run over unchanged chunks makes no LLM calls.
+
+Usage (in a notebook cell, where the event loop is already running):
+    async with LLMClient(cache=LLMResponseCache()) as llm:
+        source_results, skipped = await extract_documents(llm, source_chunks, mode="llm")
+"""
+
+import asyncio
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from src.config import LLM_CONCURRENCY, LLM_MAX_RETRIES, LLM_MODEL, LLM_TIMEOUT, OLLAMA_BASE_URL
+from src.services.llm_cache import LLMResponseCache, llm_cache_key
+from src.services.ollama import OllamaClient
+
+logger = logging.getLogger(__name__)
+
+EXTRACTION_MODES = ("llm", "nlp", "hybrid")
+
+
+@dataclass
+class Entity:
+    name: str
+    type: str
+    description: str
+    source_chunk: int = 0
+
+@dataclass
+class Relationship:
+    source: str
+    target: str
+    description: str
+    strength: float = 1.0
+    source_chunk: int = 0
+
+@dataclass
+class Claim:
+    subject: str
+    claim_type: str
+    description: str
+    date: str = ""
+    source_chunk: int = 0
+
+
+ENTITY_EXTRACTION_PROMPT = """
+You are an expert at extracting named entities from text.
+
+Extract all named entities from the following text. For each entity provide:
+1. name: The entity name (use UPPERCASE for consistency)
+2. type: One of [PERSON, ORGANIZATION, LOCATION, EVENT, PRODUCT, DATE, MONEY, CONCEPT]
+3. description: A brief description of the entity based on the text
+
+Return ONLY valid JSON array. Example format:
+[
+  {{"name": "JOHN SMITH", "type": "PERSON", "description": "CEO of Example Corp who announced the merger"}},
+  {{"name": "EXAMPLE CORP", "type": "ORGANIZATION", "description": "Technology company acquiring StartupXYZ"}}
+]
+
+TEXT:
+{text}
+
+JSON OUTPUT:
+"""
+
+RELATIONSHIP_EXTRACTION_PROMPT = """
+You are an expert at extracting relationships between entities.
+
+Given the following text and list of entities, extract all relationships between them.
+For each relationship provide:
+1. source: The source entity name (UPPERCASE)
+2. target: The target entity name (UPPERCASE)
+3. description: A description of how these entities are related
+4. strength: A score from 1-10 indicating relationship strength (10 = very strong)
+
+Return ONLY valid JSON array. Example format:
+[
+  {{"source": "JOHN SMITH", "target": "EXAMPLE CORP", "description": "John Smith is the CEO of Example Corp", "strength": 9}},
+  {{"source": "EXAMPLE CORP", "target": "STARTUPXYZ", "description": "Example Corp is acquiring StartupXYZ", "strength": 8}}
+]
+
+ENTITIES:
+{entities}
+
+TEXT:
+{text}
+
+JSON OUTPUT:
+"""
+
+CLAIMS_EXTRACTION_PROMPT = """
+You are an expert at extracting factual claims from text.
+
+Extract all specific factual claims from the following text. For each claim provide:
+1. subject: The entity the claim is about (UPPERCASE)
+2. claim_type: One of [FACT, EVENT, STATEMENT, METRIC, PREDICTION]
+3. description: The specific claim or fact
+4. date: Associated date/timeframe if mentioned (otherwise empty string)
+
+Focus on:
+- Numerical facts (prices, percentages, amounts)
+- Events (announcements, launches, decisions)
+- Quotes and statements by people
+- Predictions and forecasts
+
+Return ONLY valid JSON array. Example format:
+[
+  {{"subject": "EXAMPLE CORP", "claim_type": "METRIC", "description": "Stock rose 15% in after-hours trading", "date": "2026-02-10"}},
+  {{"subject": "JOHN SMITH", "claim_type": "STATEMENT", "description": "Stated that the merger will create 1000 new jobs", "date": ""}}
+]
+
+TEXT:
+{text}
+
+JSON OUTPUT:
+"""
+
+# Cache key names of the prompts above; bump a version when its prompt or parsing changes meaning
+ENTITY_PROMPT_VERSION = "entities/1"
+RELATIONSHIP_PROMPT_VERSION = "relationships/1"
+CLAIMS_PROMPT_VERSION = "claims/1"
+
+
+class LLMClient(OllamaClient):
+    """Async Ollama chat client; see OllamaClient for pooling and retries.
+
+    With a cache, responses are looked up before and stored after each call.
+    """
+
+    def __init__(self, base_url: str = OLLAMA_BASE_URL, model: str = LLM_MODEL, concurrency: int = LLM_CONCURRENCY,
+                 timeout: float = LLM_TIMEOUT, max_retries: int = LLM_MAX_RETRIES, retry_backoff: float = 2.0,
+                 cache: Optional[LLMResponseCache] = None, transport: Optional[httpx.AsyncBaseTransport] = None):
+        super().__init__(model, base_url, concurrency, timeout, max_retries, retry_backoff, transport)
+        self.cache = cache
+
+    async def chat(self, prompt: str, system: str = "", temperature: float = 0.0, template: str = "") -> str:
+        """The model's reply to prompt; template names the prompt and its version for the cache key."""
+        options = {"temperature": temperature}
+        key = None
+        if self.cache is not None:
+            key = llm_cache_key(self.model, template, prompt, system, options)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        messages = []
+        if system:
+            messages.append({"role": "system", "content": system})
+        messages.append({"role": "user", "content": prompt})
+        body = {"model": self.model, "messages": messages, "stream": False, "options": options}
+        content = (await self.post("/api/chat", body))["message"]["content"]
+        if key is not None:
+            self.cache.put(key, content)
+        return content
+
+
+def parse_llm_json(response: str) -> list:
+    """Parse JSON from LLM response, handling markdown code blocks."""
+    json_str = response.strip()
+    if json_str.startswith("```"):
+        json_str = json_str.split("```")[1]
+        if json_str.startswith("json"):
+            json_str = json_str[4:]
+    json_str = json_str.strip()
+    return json.loads(json_str)
+
+
+async def extract_entities(llm: LLMClient, text: str, chunk_id: int = 0) -> List[Entity]:
+    """Extract entities from a text chunk using the LLM."""
+    response = await llm.chat(ENTITY_EXTRACTION_PROMPT.format(text=text), template=ENTITY_PROMPT_VERSION)
+    try:
+        return [
+            Entity(name=e.get("name", "").upper(), type=e.get("type", "UNKNOWN"),
+                   description=e.get("description", ""), source_chunk=chunk_id)
+            for e in parse_llm_json(response)
+        ]
+    except json.JSONDecodeError as ex:
+        logger.warning("Chunk %d: entity JSON parse error: %s", chunk_id, ex)
+        return []
+
+
+async def extract_relationships(llm: LLMClient, text: str, entities: List[Entity], chunk_id: int = 0) -> List[Relationship]:
+    """Extract relationships between entities from a text chunk."""
+    entity_list = ", ".join([e.name for e in entities])
+    response = await llm.chat(RELATIONSHIP_EXTRACTION_PROMPT.format(text=text, entities=entity_list),
+                              template=RELATIONSHIP_PROMPT_VERSION)
+    try:
+        return [
+            Relationship(source=r.get("source", "").upper(), target=r.get("target", "").upper(),
+                         description=r.get("description", ""), strength=float(r.get("strength", 5)) / 10.0,
+                         source_chunk=chunk_id)
+            for r in parse_llm_json(response)
+        ]
+    except json.JSONDecodeError as ex:
+        logger.warning("Chunk %d: relationship JSON parse error: %s", chunk_id, ex)
+        return []
+
+
+async def extract_claims(llm: LLMClient, text: str, chunk_id: int = 0) -> List[Claim]:
+    """Extract factual claims from a text chunk."""
+    response = await llm.chat(CLAIMS_EXTRACTION_PROMPT.format(text=text), template=CLAIMS_PROMPT_VERSION)
+    try:
+        return [
+            Claim(subject=c.get("subject", "").upper(), claim_type=c.get("claim_type", "FACT"),
+                  description=c.get("description", ""), date=c.get("date", ""), source_chunk=chunk_id)
+            for c in parse_llm_json(response)
+        ]
+    except json.JSONDecodeError as ex:
+        logger.warning("Chunk %d: claims JSON parse error: %s", chunk_id, ex)
+        return []
+
+
+@dataclass
+class ChunkExtraction:
+    entities: List[Entity] = field(default_factory=list)
+    relationships: List[Relationship] = field(default_factory=list)
+    claims: List[Claim] = field(default_factory=list)
+
+
+# Local NER and co-occurrence extractors for the "nlp" / "hybrid" modes (GLiNER lives in notebook 01)
+NerExtractor = Callable[[str, int], List[Entity]]
+CooccurrenceExtractor = Callable[[str, List[Entity], int], List[Relationship]]
+
+
+async def extract_chunk(llm: LLMClient, text: str, chunk_id: int, mode: str = "llm",
+                        ner: Optional[NerExtractor] = None,
+                        cooccurrence: Optional[CooccurrenceExtractor] = None) -> ChunkExtraction:
+    """Entities, then relationships between them, and claims for one chunk.
+
+    The claims request doesn't depend on the entities, so it runs alongside
+    entity and relationship extraction.
+    """
+    claims_task = None
+    if mode != "nlp":
+        claims_task = asyncio.ensure_future(extract_claims(llm, text, chunk_id=chunk_id))
+    try:
+        if mode == "llm":
+            entities = await extract_entities(llm, text, chunk_id=chunk_id)
+        else:
+            entities = ner(text, chunk_id)
+        relationships: List[Relationship] = []
+        if len(entities) >= 2:
+            if mode == "nlp":
+                relationships = cooccurrence(text, entities, chunk_id)
+            else:
+                relationships = await extract_relationships(llm, text, entities, chunk_id=chunk_id)
+        claims = await claims_task if claims_task is not None else []
+    except BaseException:
+        if claims_task is not None:
+            claims_task.cancel()
+        raise
+    return ChunkExtraction(entities, relationships, claims)
+
+
+async def extract_documents(llm: LLMClient, source_chunks: Dict[str, List[str]], mode: str = "llm",
+                            ner: Optional[NerExtractor] = None,
+                            cooccurrence: Optional[CooccurrenceExtractor] = None,
+                            workers: Optional[int] = None) -> Tuple[Dict[str, dict], List[dict]]:
+    """Run extract_chunk over every chunk of every document with a bounded pool of workers.
+
+    source_chunks maps source id to the document's chunks, in document
+    order; chunk ids number all chunks consecutively across documents in
+    that order. Returns (source_results, skipped_chunks) as the serial
+    notebook loop built them: per source, its entities, relationships and
+    claims in chunk order plus its chunks; and one entry per chunk whose
+    extraction raised. workers defaults to the client's concurrency.
+    """
+    if mode not in EXTRACTION_MODES:
+        raise ValueError(f"mode must be one of {EXTRACTION_MODES}, not {mode!r}")
+    if mode != "llm" and ner is None:
+        raise ValueError(f"mode {mode!r} needs a ner extractor")
+    if mode == "nlp" and cooccurrence is None:
+        raise ValueError("mode 'nlp' needs a cooccurrence extractor")
+
+    queue: asyncio.Queue = asyncio.Queue()
+    slots: Dict[str, List[Optional[ChunkExtraction]]] = {}
+    next_chunk_id = 0
+    for source_id, chunks in source_chunks.items():
+        slots[source_id] = [None] * len(chunks)
+        for index, text in enumerate(chunks):
+            queue.put_nowait((source_id, index, next_chunk_id, text))
+            next_chunk_id += 1
+    skipped: List[dict] = []
+
+    async def worker():
+        while True:
+            try:
+                source_id, index, chunk_id, text = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                slots[source_id][index] = await extract_chunk(llm, text, chunk_id, mode, ner, cooccurrence)
+            except Exception as e:
+                err_type = type(e).__name__
+                logger.warning("Skipped chunk %d of %s (%s: %s)", index, source_id, err_type, e)
+                skipped.append({
+                    "chunk_id": chunk_id,
+                    "source_id": source_id,
+                    "chunk_index": index,
+                    "error": f"{err_type}: {e}",
+                    "chunk_len": len(text),
+                })
+
+    await asyncio.gather(*(worker() for _ in range(min(workers or llm.concurrency, max(1, queue.qsize())))))
+
+    source_results: Dict[str, dict] = {}
+    for source_id, chunks in source_chunks.items():
+        done = [extraction for extraction in slots[source_id] if extraction is not None]
+        source_results[source_id] = {
+            "entities": [e for extraction in done for e in extraction.entities],
+            "relationships": [r for extraction in done for r in extraction.relationships],
+            "claims": [c for extraction in done for c in extraction.claims],
+            "chunks": chunks,
+        }
+    skipped.sort(key=lambda entry: entry["chunk_id"])
+    return source_results, skipped
@@ -0,0 +1,193 @@
+import asyncio
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+Fingerprint = Tuple[int, ...]
+
+# Past database versions a GraphCache remembers, so late puts for them are recognised as stale
+RETIRED_VERSIONS = 16
+
+
+def db_fingerprint(db_path: str) -> Optional[Fingerprint]:
+    """Identify the current on-disk version of the SQLite database.
+
+    Combines mtime, size and inode of the main file (the pipeline deletes and
+    recreates the DB, which changes the inode even when mtime granularity is
+    coarse) with the WAL sidecar, whose writes don't touch the main file until
+    a checkpoint. Returns None when the database does not exist.
+    """
+    try:
+        st = os.stat(db_path)
+    except OSError:
+        return None
+    try:
+        wal = os.stat(db_path + "-wal")
+        wal_part = (wal.st_mtime_ns, wal.st_size)
+    except OSError:
+        wal_part = (0, 0)
+    return (st.st_mtime_ns, st.st_size, st.st_ino) + wal_part
+
+
+def fingerprint_version(fingerprint: Optional[Fingerprint]) -> Optional[str]:
+    """Short opaque id for a database version, which clients send back as /delta?since=."""
+    if fingerprint is None:
+        return None
+    return hashlib.sha256(repr(fingerprint).encode()).hexdigest()[:16]
+
+
+class GraphCache:
+    """Bounded LRU cache for graph payloads.
+
+    Every entry records the database fingerprint it was built from. When a
+    lookup or insert arrives with a different fingerprint, all entries are
+    dropped at once, so parameter combinations built against an old DB can
+    never leak. The exception is hold_stale(): while the cache warmer
+    rebuilds, entries of the previous version keep being served and are
+    replaced in one step by swap(). A put for a version the cache has already
+    moved past (a build that finished after readers saw a newer DB) is dropped
+    instead of invalidating the newer entries.
+    """
+
+    def __init__(self, maxsize: int = 8):
+        self.maxsize = max(1, maxsize)
+        self._entries: "OrderedDict[Hashable, Tuple[Optional[Fingerprint], Any]]" = OrderedDict()
+        self._fingerprint: Optional[Fingerprint] = None
+        # Fingerprints the cache moved away from, most recent last
+        self._retired: "OrderedDict[Fingerprint, None]" = OrderedDict()
+        self._held = False
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _retire(self, fingerprint: Optional[Fingerprint]) -> None:
+        if fingerprint is not None:
+            self._retired[fingerprint] = None
+            while len(self._retired) > RETIRED_VERSIONS:
+                self._retired.popitem(last=False)
+
+    def _sync(self, fingerprint: Optional[Fingerprint]) -> None:
+        if fingerprint != self._fingerprint and not self._held:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._retire(self._fingerprint)
+            self._retired.pop(fingerprint, None)
+            self._fingerprint = fingerprint
+
+    def _trim(self) -> None:
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key: Hashable, fingerprint: Optional[Fingerprint]) -> Any:
+        with self._lock:
+            self._sync(fingerprint)
+            entry = self._entries.get(key)
+            if entry is None or (entry[0] != fingerprint and not self._held):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if entry[0] == fingerprint:
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any, fingerprint: Optional[Fingerprint]) -> None:
+        if fingerprint is None:
+            return
+        with self._lock:
+            if fingerprint in self._retired:
+                return
+            self._sync(fingerprint)
+            self._entries[key] = (fingerprint, value)
+            self._entries.move_to_end(key)
+            self._trim()
+
+    def hold_stale(self) -> None:
+        """Keep serving current entries, whatever fingerprint readers pass, until swap() or release()."""
+        with self._lock:
+            self._held = True
+
+    def swap(self, items: Dict[Hashable, Any], fingerprint: Fingerprint) -> None:
+        """Atomically replace every entry with freshly built ones for a new fingerprint."""
+        with self._lock:
+            if self._entries:
+                self.invalidations += 1
+            self._entries = OrderedDict((key, (fingerprint, value)) for key, value in items.items())
+            if fingerprint != self._fingerprint:
+                self._retire(self._fingerprint)
+                self._retired.pop(fingerprint, None)
+            self._fingerprint = fingerprint
+            self._held = False
+            self._trim()
+
+    def release(self) -> None:
+        """Stop serving stale entries; the next access with a new fingerprint invalidates them."""
+        with self._lock:
+            self._held = False
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._fingerprint = None
+            self._retired.clear()
+            self._held = False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "stale": self._held,
+                "hit_rate": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+            }
+
+
+class SingleFlight:
+    """Run blocking builds in a worker thread, at most one per key at a time.
+
+    Concurrent callers asking for a key that is already being built await the
+    same future instead of starting their own build, so a burst of cache
+    misses after the database changes costs one rebuild. Keys should include
+    the database fingerprint so a build for a new version never joins one
+    still running against the old file.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, "asyncio.Future[Any]"] = {}
+        self.started = 0
+        self.joined = 0
+
+    async def run(self, key: Hashable, fn: Callable[..., Any], *args: Any) -> Any:
+        future = self._inflight.get(key)
+        if future is None:
+            self.started += 1
+            future = asyncio.ensure_future(asyncio.to_thread(fn, *args))
+            self._inflight[key] = future
+            future.add_done_callback(lambda f: self._finish(key, f))
+        else:
+            self.joined += 1
+        # Shielded: a client that disconnects must not cancel the build others are waiting on
+        return await asyncio.shield(future)
+
+    def _finish(self, key: Hashable, future: "asyncio.Future[Any]") -> None:
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        if not future.cancelled():
+            future.exception()  # mark retrieved even if every waiter went away
+
+    def stats(self) -> Dict[str, Any]:
+        return {"inflight": len(self._inflight), "started": self.started, "joined": self.joined}
@@ -0,0 +1,140 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from src.services.graph_cache import fingerprint_version
+from src.services.graph_service import (
+    VizContext,
+    build_graph_overview,
+    build_meta_elements,
+    format_comm_summaries,
+)
+
+
+def _digest(value: Any) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, separators=(",", ":")).encode()).hexdigest()[:16]
+
+
+@dataclass(frozen=True)
+class GraphSnapshot:
+    """Content hashes of one graph version: per meta element, per community summary and per community payload."""
+    version: Optional[str]
+    meta: Dict[str, str]
+    summaries: Dict[int, str]
+    communities: Dict[int, str]
+
+
+def _community_inputs(ctx: VizContext, comm_id: int) -> list:
+    """Everything a community's payload is rendered from, less its layout: its members' and edges'
+    columns, its semantic groups (whole, as semanticGroups sends them) and the pagerank bounds
+    node sizes scale in."""
+    store = ctx.store
+    names = store.names
+    members = [(names[i], store.type_ids[i], store.descriptions[i], store.pagerank[i], store.degree_centrality[i],
+                store.betweenness[i], store.source_refs[i], store.num_sources_of(i),
+                len(ctx.entity_chunk_map.get(names[i], ())))
+               for i in ctx.community_members.get(comm_id, [])]
+    edges = [(store.edge_src[e], store.edge_tgt[e], store.edge_descriptions[e], store.weight_of(e))
+             for e in ctx.community_edges.get(comm_id, [])]
+    groups = [(group["group_id"], valid_members, ctx.cyto_semantic_groups.get(group["group_id"]))
+              for group, valid_members in ctx.community_semantic_groups.get(comm_id, [])]
+    return [members, edges, groups, ctx.pr_bounds]
+
+
+def snapshot_context(ctx: VizContext) -> GraphSnapshot:
+    """Hash everything the lazy endpoints would serve for ctx, without keeping the payloads.
+
+    Nothing is rendered or laid out: communities are hashed by their inputs, and layout hints
+    by what the seeded layouts are computed from (the communities and the links between them,
+    plus each community's members and edges, already in its inputs), so a snapshot costs a
+    fraction of a context build. The type table goes into every hash since members refer to
+    it by index.
+    """
+    unplaced = replace(ctx, layout_hints=False) if ctx.layout_hints else ctx
+    shared = [list(ctx.store.types), ctx.layout_hints]
+    if ctx.layout_hints:
+        shared.append([list(ctx.viz_community_counts), [list(pair) for pair in ctx.community_links]])
+    shared = _digest(shared)
+    return GraphSnapshot(
+        version=fingerprint_version(ctx.fingerprint),
+        meta={el["data"]["id"]: _digest([shared, el]) for el in build_meta_elements(unplaced)},
+        summaries={comm_id: _digest(s) for comm_id, s in format_comm_summaries(ctx).items()},
+        communities={comm_id: _digest([shared] + _community_inputs(ctx, comm_id))
+                     for comm_id in ctx.cyto_community_summaries},
+    )
+
+
+def _diff(old: Dict[Any, str], new: Dict[Any, str]) -> Tuple[List[Any], List[Any], List[Any]]:
+    added = [k for k in new if k not in old]
+    changed = [k for k in new if k in old and old[k] != new[k]]
+    removed = [k for k in old if k not in new]
+    return added, changed, removed
+
+
+def build_graph_delta(ctx: VizContext, base: Optional[GraphSnapshot], current: Optional[GraphSnapshot]) -> Dict[str, Any]:
+    """Patch from base to the version ctx was loaded at.
+
+    Meta elements and summaries that were added or changed are sent in full;
+    communities only by id, since clients refetch the ones they have expanded.
+    Without a base (evicted from the history) this is the full overview, flagged with full=True.
+    """
+    if base is None or current is None:
+        return dict(build_graph_overview(ctx), full=True)
+
+    meta_added, meta_changed, meta_removed = _diff(base.meta, current.meta)
+    elements = {}
+    if meta_added or meta_changed:
+        elements = {el["data"]["id"]: el for el in build_meta_elements(ctx)}
+    summary_added, summary_changed, summary_removed = _diff(base.summaries, current.summaries)
+    summaries = format_comm_summaries(ctx) if summary_added or summary_changed else {}
+    comm_added, comm_changed, comm_removed = _diff(base.communities, current.communities)
+
+    return {
+        "version": current.version,
+        "since": base.version,
+        "full": False,
+        "metaElements": {
+            "added": [elements[i] for i in meta_added],
+            "changed": [elements[i] for i in meta_changed],
+            "removed": meta_removed,
+        },
+        "commSummaries": {
+            "changed": {comm_id: summaries[comm_id] for comm_id in summary_added + summary_changed},
+            "removed": summary_removed,
+        },
+        "communities": {"added": comm_added, "changed": comm_changed, "removed": comm_removed},
+    }
+
+
+class SnapshotHistory:
+    """The last few GraphSnapshots per parameter set, for diffing against versions clients still hold."""
+
+    def __init__(self, versions: int = 8, max_keys: int = 16):
+        self.versions = max(1, versions)
+        self.max_keys = max(1, max_keys)
+        self._snapshots: "OrderedDict[Hashable, OrderedDict[Optional[str], GraphSnapshot]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, key: Hashable, snapshot: GraphSnapshot) -> None:
+        if snapshot.version is None:
+            return
+        with self._lock:
+            versions = self._snapshots.setdefault(key, OrderedDict())
+            self._snapshots.move_to_end(key)
+            versions[snapshot.version] = snapshot
+            versions.move_to_end(snapshot.version)
+            while len(versions) > self.versions:
+                versions.popitem(last=False)
+            while len(self._snapshots) > self.max_keys:
+                self._snapshots.popitem(last=False)
+
+    def get(self, key: Hashable, version: Optional[str]) -> Optional[GraphSnapshot]:
+        with self._lock:
+            return self._snapshots.get(key, {}).get(version)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"keys": len(self._snapshots), "versions": sum(len(v) for v in self._snapshots.values())}
@@ -0,0 +1,193 @@
+"""Fruchterman-Reingold force layout in NumPy, for graphs too large for networkx.spring_layout.
+
+Spring attraction is summed over the edge arrays with np.bincount. Repulsion
+between all pairs is exact for small graphs and otherwise approximated on a
+grid (particle-mesh, the FFT counterpart of a Barnes-Hut tree): node counts
+are binned into a histogram, convolved with the r / |r|² kernel by FFT and
+read back at each node's cell. An iteration then costs O(n + edges + g log g)
+for g grid cells instead of O(n²). Works in 2 or 3 dimensions, and a
+previous layout can seed the start so small graph changes move little.
+
+sphere_layout and cap_layout wrap layouts onto the unit sphere, for the 3D
+graph client whose nodes live on a globe.
+"""
+
+from functools import lru_cache
+from typing import Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; callers check LAYOUT_AVAILABLE
+    np = None
+
+LAYOUT_AVAILABLE = np is not None
+
+# Up to this many nodes (by dimension) repulsion is summed over all pairs, in blocks of EXACT_BLOCK rows.
+# A 2D mesh is cheap enough to win early; the 3D one costs about as much as 1000 nodes' exact sum.
+EXACT_REPULSION_LIMIT = {2: 250, 3: 1000}
+EXACT_BLOCK = 128
+# Grid cells per axis for the particle-mesh repulsion, by dimension
+MAX_MESH_GRID = {2: 512, 3: 64}
+# Caps with at most this many nodes are a circle rather than a force layout, which wouldn't look better
+CIRCLE_LAYOUT_LIMIT = 8
+# Share of nodes per axis left out of the mesh bounding box, so a few far outliers don't coarsen it
+MESH_BOX_QUANTILE = 0.005
+
+
+@lru_cache(maxsize=8)
+def _mesh_kernel(grid: int, dim: int):
+    """FFT of the r / |r|² repulsion kernel on a zero-padded (2 * grid)^dim mesh, one array per axis."""
+    size = 2 * grid
+    offsets = np.meshgrid(*[np.fft.fftfreq(size, 1.0 / size)] * dim, indexing="ij")
+    r2 = sum(o * o for o in offsets)
+    r2[(0,) * dim] = np.inf  # no self force
+    return [np.fft.rfftn(o / r2, axes=range(dim)) for o in offsets]
+
+
+def _exact_repulsion(pos, k: float, min_dist: float):
+    disp = np.zeros_like(pos)
+    cols = pos.T
+    for start in range(0, len(pos), EXACT_BLOCK):
+        block = pos[start:start + EXACT_BLOCK]
+        deltas = [block[:, axis, None] - cols[axis] for axis in range(pos.shape[1])]
+        inv = 1.0 / np.maximum(sum(d * d for d in deltas), min_dist * min_dist)
+        for axis, d in enumerate(deltas):
+            disp[start:start + EXACT_BLOCK, axis] = (d * inv).sum(axis=1)
+    return disp * (k * k)
+
+
+def _mesh_repulsion(pos, k: float, grid: int):
+    n, dim = pos.shape
+    lo = np.quantile(pos, MESH_BOX_QUANTILE, axis=0)
+    hi = np.quantile(pos, 1.0 - MESH_BOX_QUANTILE, axis=0)
+    h = max(float((hi - lo).max()), 1e-9) / (grid - 1)
+    cells = np.clip(np.rint((pos - lo) / h).astype(np.int64), 0, grid - 1)
+    flat = np.ravel_multi_index(tuple(cells.T), (grid,) * dim)
+    density = np.bincount(flat, minlength=grid ** dim).reshape((grid,) * dim).astype(float)
+    size = (2 * grid,) * dim
+    axes = range(dim)
+    density_hat = np.fft.rfftn(density, s=size, axes=axes)
+    window = (slice(0, grid),) * dim
+    disp = np.empty_like(pos)
+    for axis, kernel_hat in enumerate(_mesh_kernel(grid, dim)):
+        field = np.fft.irfftn(density_hat * kernel_hat, s=size, axes=axes)[window]
+        disp[:, axis] = field.reshape(-1)[flat]
+    # The mesh works in cell units; r / |r|² scales as 1 / h
+    return disp * (k * k / h)
+
+
+def _place_missing(pos, missing, src, tgt, rng):
+    """Put unplaced nodes at the mean of their placed neighbours, or anywhere in the placed box."""
+    placed = ~missing
+    lo, hi = pos[placed].min(axis=0), pos[placed].max(axis=0)
+    sums = np.zeros_like(pos)
+    counts = np.zeros(len(pos))
+    for a, b in ((src, tgt), (tgt, src)):
+        use = missing[a] & placed[b]
+        np.add.at(sums, a[use], pos[b[use]])
+        counts += np.bincount(a[use], minlength=len(pos))
+    near = missing & (counts > 0)
+    spread = max(float((hi - lo).max()), 1e-3) * 0.02
+    pos[near] = sums[near] / counts[near, None] + rng.normal(0.0, spread, (int(near.sum()), pos.shape[1]))
+    far = missing & (counts == 0)
+    pos[far] = lo + rng.random((int(far.sum()), pos.shape[1])) * (hi - lo)
+
+
+def rescale_layout(pos, scale: float = 1.0):
+    """Center on the origin and scale so the largest coordinate is `scale`, as networkx does."""
+    pos = pos - pos.mean(axis=0)
+    lim = np.abs(pos).max()
+    return pos * (scale / lim) if lim > 0 else pos
+
+
+def force_layout(n: int, edge_src: Sequence[int], edge_tgt: Sequence[int], dim: int = 2, pos=None,
+                 iterations: int = 50, seed: int = 42, temperature: Optional[float] = None,
+                 scale: float = 1.0):
+    """(n, dim) float array of node positions, rescaled into [-scale, scale].
+
+    pos optionally seeds the start: an (n, dim) array whose NaN rows are nodes
+    still to place. temperature caps how far a node moves in the first iteration and cools
+    linearly to zero; it defaults to a tenth of the layout's extent, and a
+    seeded run that should stay close to its start passes less.
+    """
+    if not LAYOUT_AVAILABLE:
+        raise RuntimeError("force_layout needs numpy")
+    rng = np.random.default_rng(seed)
+    src = np.asarray(edge_src, dtype=np.int64)
+    tgt = np.asarray(edge_tgt, dtype=np.int64)
+    keep = src != tgt
+    src, tgt = src[keep], tgt[keep]
+
+    if pos is None:
+        pos = rng.random((n, dim))
+    else:
+        pos = np.array(pos, dtype=float).reshape(n, dim)
+        missing = np.isnan(pos).any(axis=1)
+        if missing.all():
+            pos = rng.random((n, dim))
+        elif missing.any():
+            _place_missing(pos, missing, src, tgt, rng)
+    if n <= 1:
+        return np.zeros((n, dim))
+
+    k = (1.0 / n) ** (1.0 / dim)
+    extent = max(float((pos.max(axis=0) - pos.min(axis=0)).max()), k)
+    pos = pos / extent  # the force constants above assume a unit box
+    min_dist = 0.01 * k
+    t = 0.1 if temperature is None else temperature / extent
+    dt = t / (iterations + 1)
+    grid = min(MAX_MESH_GRID.get(dim, 64), 1 << max(4, int(np.ceil(np.log2(2 * n ** (1.0 / dim))))))
+    exact = n <= EXACT_REPULSION_LIMIT.get(dim, 1000)
+
+    for _ in range(iterations):
+        if exact:
+            disp = _exact_repulsion(pos, k, min_dist)
+        else:
+            disp = _mesh_repulsion(pos, k, grid)
+        if len(src):
+            delta = pos[src] - pos[tgt]
+            dist = np.maximum(np.sqrt((delta * delta).sum(axis=1)), min_dist)
+            pull = delta * (dist / k)[:, None]
+            for axis in range(dim):
+                disp[:, axis] -= np.bincount(src, pull[:, axis], minlength=n)
+                disp[:, axis] += np.bincount(tgt, pull[:, axis], minlength=n)
+        length = np.maximum(np.sqrt((disp * disp).sum(axis=1)), 1e-9)
+        pos += disp * (np.minimum(length, t) / length)[:, None]
+        t -= dt
+    return rescale_layout(pos, scale)
+
+
+def _unit_rows(pos):
+    norms = np.sqrt((pos * pos).sum(axis=1))
+    out = np.empty_like(pos)
+    ok = norms > 1e-9
+    out[ok] = pos[ok] / norms[ok, None]
+    out[~ok] = (0.0, 0.0, 1.0)
+    return out
+
+
+def sphere_layout(n: int, edge_src: Sequence[int], edge_tgt: Sequence[int], iterations: int = 50, seed: int = 42):
+    """(n, 3) unit vectors: a 3D force layout projected onto the unit sphere, linked nodes near each other."""
+    return _unit_rows(force_layout(n, edge_src, edge_tgt, dim=3, iterations=iterations, seed=seed))
+
+
+def cap_layout(center: Sequence[float], n: int, edge_src: Sequence[int], edge_tgt: Sequence[int],
+               angle: float, iterations: int = 50, seed: int = 42):
+    """(n, 3) unit vectors spread over the spherical cap of the given angular radius around center.
+
+    The nodes get a 2D force layout, or for up to CIRCLE_LAYOUT_LIMIT nodes a
+    circle, in the plane tangent to the sphere at center, which is then
+    wrapped onto the sphere.
+    """
+    c = _unit_rows(np.asarray(center, dtype=float).reshape(1, 3))[0]
+    axis = np.array([0.0, 1.0, 0.0]) if abs(c[0]) > 0.9 else np.array([1.0, 0.0, 0.0])
+    u = axis - axis.dot(c) * c
+    u /= np.sqrt(u.dot(u))
+    v = np.cross(c, u)
+    if n <= CIRCLE_LAYOUT_LIMIT:
+        theta = np.arange(n) * (2 * np.pi / max(n, 1))
+        flat = angle * np.column_stack([np.cos(theta), np.sin(theta)])
+    else:
+        flat = force_layout(n, edge_src, edge_tgt, dim=2, iterations=iterations, seed=seed)
+        flat *= angle / max(float(np.sqrt((flat * flat).sum(axis=1)).max()), 1e-9)
+    return _unit_rows(c + flat[:, :1] * u + flat[:, 1:] * v)
@@ -1,9 +1,20 @@
+import gc
+import heapq
 import json
+import math
 import sqlite3
 import os
 import re
 from pathlib import Path
-from typing import Dict, List, Tuple, Set, Any
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple, Set, Any, Union
+
+from src.services.db import content_hash, get_pool
+from src.services.graph_cache import fingerprint_version
+from src.services.graph_layout import LAYOUT_AVAILABLE, cap_layout, sphere_layout
+from src.services.graph_store import GraphScope, GraphStore, load_graph_store
 
 _CYTO_UNSAFE = re.compile(r'[.#\[\]():"\',\\]')
 COMMUNITY_COLORS = [
@@ -14,28 +25,52 @@ COMMUNITY_COLORS = [
 MAX_COMPOUND_SIZE = 15
 SEMANTIC_GROUP_COLOR = "#bfef45"
 MIN_COMMUNITY_SIZE_FOR_VIZ = 2
+# Highest-pagerank members listed on a community meta-node
+TOP_MEMBERS = 5
+# Example relationships kept per inter-community edge
+MAX_LINK_DETAILS = 5
+# Angular radius (radians) of the cap an expanded community's entities spread over, per sqrt(member) and at most
+CAP_ANGLE_PER_NODE = 0.03
+MAX_CAP_ANGLE = 0.6
+# Decimals kept of the fx/fy/fz unit-sphere layout hints
+LAYOUT_HINT_DECIMALS = 4
+# Intra-community edges a paged community block keeps per entity on the page (see prune_page_edges)
+MAX_EDGES_PER_ENTITY = 3
+MORE_NODE_COLOR = "#888888"
 
 def sanitize_cyto_id(name: str) -> str:
     """Replace characters that break Cytoscape.js CSS selectors."""
     return _CYTO_UNSAFE.sub('_', name)
 
-def scale_pagerank_to_size(pr: float, all_pr: List[float], min_size: int = 25, max_size: int = 90) -> int:
-    if not all_pr:
+def layout_hint(position: Tuple[float, float, float]) -> Dict[str, float]:
+    """fx/fy/fz element data for a unit-sphere position; the client scales it to its globe radius."""
+    x, y, z = position
+    return {"fx": x, "fy": y, "fz": z}
+
+def _unit_position(vector) -> Tuple[float, float, float]:
+    norm = math.sqrt(sum(c * c for c in vector))
+    if norm < 1e-9:
+        return (0.0, 0.0, 1.0)
+    return tuple(round(c / norm, LAYOUT_HINT_DECIMALS) for c in vector)
+
+def value_bounds(values) -> Optional[Tuple[float, float]]:
+    return (min(values), max(values)) if values else None
+
+def scale_in_bounds(value: float, bounds: Optional[Tuple[float, float]], min_size: int, max_size: int) -> int:
+    """Linear size scale against precomputed (min, max) so callers don't rescan the population per node."""
+    if bounds is None:
         return (min_size + max_size) // 2
-    pr_min, pr_max = min(all_pr), max(all_pr)
-    if pr_max == pr_min:
+    lo, hi = bounds
+    if hi == lo:
         return (min_size + max_size) // 2
-    normalized = (pr - pr_min) / (pr_max - pr_min)
+    normalized = (value - lo) / (hi - lo)
     return int(min_size + normalized * (max_size - min_size))
 
+def scale_pagerank_to_size(pr: float, all_pr: List[float], min_size: int = 25, max_size: int = 90) -> int:
+    return scale_in_bounds(pr, value_bounds(all_pr), min_size, max_size)
+
 def scale_community_size(member_count: int, all_counts: List[int], min_size: int = 40, max_size: int = 120) -> int:
-    if not all_counts:
-        return (min_size + max_size) // 2
-    c_min, c_max = min(all_counts), max(all_counts)
-    if c_max == c_min:
-        return (min_size + max_size) // 2
-    normalized = (member_count - c_min) / (c_max - c_min)
-    return int(min_size + normalized * (max_size - min_size))
+    return scale_in_bounds(member_count, value_bounds(all_counts), min_size, max_size)
 
 def load_entities(cursor) -> Dict[str, dict]:
     cursor.execute("""
@@ -66,12 +101,31 @@ def load_community_summaries(cursor) -> Dict[int, dict]:
     except sqlite3.OperationalError:
         return {}  # If table doesn't exist
 
-def load_chunk_lookup(cursor) -> Dict[int, dict]:
-    try:
-        cursor.execute("SELECT chunk_index, content, source_ref FROM chunks")
-        return {row[0]: {"text": row[1], "source_id": row[2]} for row in cursor.fetchall()}
-    except sqlite3.OperationalError:
-        return {}
+# Names of the scope's entities, for the entity_chunk_map and chunks lookups
+_SCOPED_CHUNK_ENTITIES = "SELECT name FROM entities WHERE id IN kept"
+
+def load_chunk_lookup(cursor, scope: Optional[GraphScope] = None) -> Dict[int, dict]:
+    """Content hash and source of each chunk. The text stays in the DB until load_chunk_texts asks for it.
+
+    Chunks without a stored hash (databases not yet migrated, or rows written
+    since without one) are hashed here instead; only their text is read.
+    """
+    where = ""
+    if scope is not None:
+        where = f"""WHERE chunk_index IN (SELECT chunk_index FROM entity_chunk_map WHERE entity_name IN ({_SCOPED_CHUNK_ENTITIES}))
+                ORDER BY rowid"""
+    for stored, unhashed in (("content_hash", "CASE WHEN content_hash IS NULL THEN content END"), ("NULL", "content")):
+        sql = f"SELECT chunk_index, {stored}, {unhashed}, source_ref FROM chunks {where}"
+        try:
+            if scope is None:
+                cursor.execute(sql)
+            else:
+                cursor.execute(*scope.query(sql))
+        except sqlite3.OperationalError:
+            continue  # no content_hash column yet, or no chunks table at all
+        return {row[0]: {"hash": row[1] if row[2] is None else content_hash(row[2]), "source_id": row[3]}
+                for row in cursor.fetchall()}
+    return {}
 
 def load_semantic_groups(cursor) -> List[dict]:
     try:
@@ -82,9 +136,13 @@ def load_semantic_groups(cursor) -> List[dict]:
     except sqlite3.OperationalError:
         return []
 
-def load_entity_chunk_map(cursor) -> Dict[str, list]:
+def load_entity_chunk_map(cursor, scope: Optional[GraphScope] = None) -> Dict[str, list]:
     try:
-        cursor.execute("SELECT entity_name, chunk_index, source_id FROM entity_chunk_map")
+        if scope is None:
+            cursor.execute("SELECT entity_name, chunk_index, source_id FROM entity_chunk_map")
+        else:
+            cursor.execute(*scope.query(f"""SELECT entity_name, chunk_index, source_id FROM entity_chunk_map
+                WHERE entity_name IN ({_SCOPED_CHUNK_ENTITIES}) ORDER BY rowid"""))
         result: Dict[str, list] = {}
         for row in cursor.fetchall():
             result.setdefault(row[0], []).append({"chunk_index": row[1], "source_id": row[2]})
@@ -92,27 +150,129 @@ def load_entity_chunk_map(cursor) -> Dict[str, list]:
     except sqlite3.OperationalError:
         return {}
 
-def prepare_viz_data(entities, edges, community_summaries, chunk_lookup, semantic_groups, entity_chunk_map, include_orphans=False, min_community_size=MIN_COMMUNITY_SIZE_FOR_VIZ) -> Dict[str, Any]:
-    node_degree: Dict[str, int] = {}
-    for src, tgt, _ in edges:
-        node_degree[src] = node_degree.get(src, 0) + 1
-        node_degree[tgt] = node_degree.get(tgt, 0) + 1
-
-    if include_orphans:
-        viz_nodes = {n for n in entities if n.strip()}
-    else:
-        viz_nodes = {n for n in entities if node_degree.get(n, 0) > 0 and n.strip()}
-    entity_node_ids = set(viz_nodes)
-
-    viz_community_counts: Dict[int, int] = {}
-    for node in viz_nodes:
-        comm_id = entities[node].get("community", -1)
-        viz_community_counts[comm_id] = viz_community_counts.get(comm_id, 0) + 1
-
+def load_top_communities(cursor, limit: int) -> List[int]:
+    """Ids of the largest communities, ties broken by which community's first entity comes first."""
+    cursor.execute("""
+        SELECT community_id FROM entities
+        WHERE community_id >= 0
+        GROUP BY community_id
+        ORDER BY COUNT(*) DESC, MIN(id)
+        LIMIT ?
+    """, (limit,))
+    return [row[0] for row in cursor.fetchall()]
+
+class GraphDataError(Exception):
+    """Raised when the graph database is missing or cannot be read."""
+
+
+@dataclass
+class VizContext:
+    """Filtered graph state shared by the full payload and the lazy per-community endpoints."""
+    store: GraphStore
+    chunk_lookup: Dict[int, dict]
+    semantic_groups: List[dict]
+    entity_chunk_map: Dict[str, list]
+    min_community_size: int
+    # visible[i] is set for entity ids that are drawn
+    visible: bytearray
+    viz_community_counts: Dict[int, int]
+    cyto_community_summaries: Dict[int, dict]
+    other_community_count: int
+    other_node_count: int
+    cyto_semantic_groups: Dict[int, dict]
+    pr_bounds: Optional[Tuple[float, float]]
+    comm_count_bounds: Optional[Tuple[int, int]]
+    # Indexes built once per context, so per-community work never rescans the whole graph.
+    # Keyed on the store's community column value; members are entity ids, edges are edge indexes.
+    community_members: Dict[int, List[int]]
+    community_edges: Dict[int, List[int]]
+    community_links: Dict[Tuple[int, int], dict]
+    inter_comm_edges: Dict[Tuple[str, str], dict]
+    community_semantic_groups: Dict[int, List[Tuple[dict, List[str]]]]
+    safe_id_to_name: Dict[str, str] = field(default_factory=dict)
+    # Per entity id, computed once for the visible ones: Cytoscape-safe id and pagerank node size
+    cyto_ids: List[str] = field(default_factory=list, repr=False)
+    sizes: List[int] = field(default_factory=list, repr=False)
+    # Database fingerprint the inputs were read at, set by the API layer's context cache
+    fingerprint: Any = None
+    # Whether elements carry fx/fy/fz layout hints; the layouts are computed on first use and kept here
+    layout_hints: bool = False
+    meta_positions: Optional[Dict[int, Tuple[float, float, float]]] = field(default=None, repr=False)
+    entity_positions: Dict[int, List[Tuple[float, float, float]]] = field(default_factory=dict, repr=False)
+
+    def community_top_members(self, comm_id: int) -> Tuple[List[str], float]:
+        """Names of a community's TOP_MEMBERS highest-pagerank visible entities, and their pagerank sum."""
+        pagerank = self.store.pagerank
+        top = heapq.nsmallest(TOP_MEMBERS, self.community_members.get(comm_id, []), key=lambda i: -pagerank[i])
+        return [self.store.names[i] for i in top], sum(pagerank[i] for i in top)
+
+    def community_positions(self) -> Optional[Dict[int, Tuple[float, float, float]]]:
+        """Unit-sphere position of every community with visible members, or None without layout hints.
+
+        Laid out over the inter-community links, small communities included,
+        so the positions don't depend on min_community_size.
+        """
+        if not self.layout_hints:
+            return None
+        if self.meta_positions is None:
+            comm_ids = list(self.viz_community_counts)
+            index = {comm_id: k for k, comm_id in enumerate(comm_ids)}
+            pairs = list(self.community_links)
+            pos = sphere_layout(len(comm_ids), [index[s] for s, _ in pairs], [index[t] for _, t in pairs])
+            self.meta_positions = {comm_id: _unit_position(pos[k]) for k, comm_id in enumerate(comm_ids)}
+        return self.meta_positions
+
+    def member_positions(self, comm_id: int) -> Optional[List[Tuple[float, float, float]]]:
+        """Unit-sphere positions of community_members[comm_id], in a cap around the community's position."""
+        if not self.layout_hints:
+            return None
+        positions = self.entity_positions.get(comm_id)
+        if positions is None:
+            members = self.community_members.get(comm_id, [])
+            if not members:
+                return []
+            local = {i: k for k, i in enumerate(members)}
+            edges = self.community_edges.get(comm_id, [])
+            edge_src, edge_tgt = self.store.edge_src, self.store.edge_tgt
+            angle = min(MAX_CAP_ANGLE, CAP_ANGLE_PER_NODE * math.sqrt(len(members)))
+            pos = cap_layout(self.community_positions()[comm_id], len(members),
+                             [local[edge_src[e]] for e in edges], [local[edge_tgt[e]] for e in edges], angle)
+            positions = self.entity_positions[comm_id] = [_unit_position(p) for p in pos]
+        return positions
+
+
+@dataclass
+class VizOverview:
+    """What the overview needs, read from the materialized viz tables instead of derived from a loaded graph.
+
+    Has the fields and the community_top_members and community_positions methods that iter_meta_elements,
+    format_comm_summaries and build_graph_overview use on a VizContext.
+    """
+    cyto_community_summaries: Dict[int, dict]
+    viz_community_counts: Dict[int, int]
+    other_community_count: int
+    other_node_count: int
+    comm_count_bounds: Optional[Tuple[int, int]]
+    inter_comm_edges: Dict[Tuple[str, str], dict]
+    top_members: Dict[int, Tuple[List[str], float]]
+    fingerprint: Any = None
+    positions: Optional[Dict[int, Tuple[float, float, float]]] = None
+
+    def community_top_members(self, comm_id: int) -> Tuple[List[str], float]:
+        return self.top_members.get(comm_id, ([], 0.0))
+
+    def community_positions(self) -> Optional[Dict[int, Tuple[float, float, float]]]:
+        return self.positions
+
+
+def summarize_communities(community_summaries: Dict[int, dict], viz_community_counts: Dict[int, int], min_community_size: int):
+    """Split summarized communities into drawn ones and the "Other" bucket by visible member count.
+
+    Returns (cyto_community_summaries, other_community_count, other_node_count, comm_count_bounds).
+    """
     cyto_community_summaries = {}
     other_community_count = 0
     other_node_count = 0
-
     for comm_id, summary_data in community_summaries.items():
         member_count = viz_community_counts.get(comm_id, 0)
         if member_count >= min_community_size:
@@ -120,40 +280,104 @@ def prepare_viz_data(entities, edges, community_summaries, chunk_lookup, semanti
         elif member_count > 0:
             other_community_count += 1
             other_node_count += member_count
+    all_comm_counts = [viz_community_counts[c] for c in viz_community_counts if viz_community_counts[c] >= min_community_size]
+    return cyto_community_summaries, other_community_count, other_node_count, value_bounds(all_comm_counts)
 
-    chunk_texts: List[str] = []
-    chunk_text_to_idx: Dict[str, int] = {}
-    cyto_chunk_refs: Dict[str, list] = {}
 
-    for entity_name in entity_node_ids:
-        refs = entity_chunk_map.get(entity_name, [])
-        if not refs:
+def bucket_community_links(community_links: Dict[Tuple[int, int], dict], cyto_community_summaries: Dict[int, dict]) -> Dict[Tuple[str, str], dict]:
+    """Inter-community edges between drawn communities, with undrawn ones merged into "comm-other".
+
+    community_links holds per (source community, target community) pair the
+    edge count, the position of its first edge and up to MAX_LINK_DETAILS
+    (position, text) descriptions. Buckets come out in first-edge order and
+    keep the earliest descriptions, exactly as one pass over the edges would.
+    """
+    buckets: Dict[Tuple[str, str], List[dict]] = {}
+    first_edge: Dict[Tuple[str, str], int] = {}
+    for (src_comm, tgt_comm), link in community_links.items():
+        src_in = src_comm in cyto_community_summaries
+        tgt_in = tgt_comm in cyto_community_summaries
+        if not src_in and not tgt_in:
             continue
-        refs_for_entity = []
-        for ref in refs:
-            chunk_idx = ref["chunk_index"]
-            chunk_data = chunk_lookup.get(chunk_idx)
-            if not chunk_data:
-                continue
-            text = chunk_data["text"]
-            if text not in chunk_text_to_idx:
-                chunk_text_to_idx[text] = len(chunk_texts)
-                chunk_texts.append(text)
-            refs_for_entity.append({
-                "index": chunk_idx,
-                "source_id": ref["source_id"],
-                "text_idx": chunk_text_to_idx[text],
-            })
-        if refs_for_entity:
-            cyto_chunk_refs[sanitize_cyto_id(entity_name)] = refs_for_entity
+        key = (f"comm-{src_comm}" if src_in else "comm-other", f"comm-{tgt_comm}" if tgt_in else "comm-other")
+        if key in buckets:
+            buckets[key].append(link)
+            first_edge[key] = min(first_edge[key], link["first_edge"])
+        else:
+            buckets[key] = [link]
+            first_edge[key] = link["first_edge"]
+    inter_comm_edges: Dict[Tuple[str, str], dict] = {}
+    for key in sorted(buckets, key=first_edge.__getitem__):
+        links = buckets[key]
+        details = heapq.merge(*(link["descriptions"] for link in links)) if len(links) > 1 else links[0]["descriptions"]
+        inter_comm_edges[key] = {
+            "count": sum(link["count"] for link in links),
+            "descriptions": [text for _, text in islice(details, MAX_LINK_DETAILS)],
+        }
+    return inter_comm_edges
 
+
+
+def build_viz_context(store: GraphStore, community_summaries, chunk_lookup, semantic_groups, entity_chunk_map, include_orphans=False, min_community_size=MIN_COMMUNITY_SIZE_FOR_VIZ, layout_hints=False) -> VizContext:
+    names = store.names
+    community = store.community
+    degree = store.degrees()
+
+    visible = bytearray(len(names))
+    viz_community_counts: Dict[int, int] = {}
+    community_members: Dict[int, List[int]] = {}
+    for i in range(store.n_entities):
+        if (include_orphans or degree[i] > 0) and names[i].strip():
+            visible[i] = 1
+            comm_id = community[i]
+            viz_community_counts[comm_id] = viz_community_counts.get(comm_id, 0) + 1
+            community_members.setdefault(comm_id, []).append(i)
+
+    cyto_community_summaries, other_community_count, other_node_count, comm_count_bounds = summarize_communities(
+        community_summaries, viz_community_counts, min_community_size)
+
+    # Partition edges once: intra-community edge indexes and per community pair link aggregates.
+    # The pairs don't depend on min_community_size, so viz_materialize stores them as they are.
+    community_edges: Dict[int, List[int]] = {}
+    community_links: Dict[Tuple[int, int], dict] = {}
+    edge_src, edge_tgt, edge_desc = store.edge_src, store.edge_tgt, store.edge_descriptions
+    for e in range(store.n_edges):
+        src, tgt = edge_src[e], edge_tgt[e]
+        if not visible[src] or not visible[tgt]:
+            continue
+        src_comm = community[src]
+        tgt_comm = community[tgt]
+        if src_comm == tgt_comm:
+            community_edges.setdefault(src_comm, []).append(e)
+            continue
+        link = community_links.get((src_comm, tgt_comm))
+        if link is None:
+            link = community_links[(src_comm, tgt_comm)] = {"count": 0, "first_edge": e, "descriptions": []}
+        link["count"] += 1
+        desc = edge_desc[e]
+        if desc and len(link["descriptions"]) < MAX_LINK_DETAILS:
+            link["descriptions"].append((e, f"{names[src]} \u2192 {names[tgt]}: {desc[:80]}"))
+
+    # Map semantic groups onto the communities their visualized members fall in
+    name_to_id = store.name_to_id
     cyto_semantic_groups = {}
+    community_semantic_groups: Dict[int, List[Tuple[dict, List[str]]]] = {}
     for group in semantic_groups:
         gid = group["group_id"]
         members = group["members"]
         if len(members) > MAX_COMPOUND_SIZE:
             continue
-        valid_members = [m for m in members if m in entity_node_ids]
+        valid_members = []
+        by_community: Dict[int, List[str]] = {}
+        for m in members:
+            idx = name_to_id.get(m)
+            if idx is None or idx >= store.n_entities or not visible[idx]:
+                continue
+            valid_members.append(m)
+            by_community.setdefault(community[idx], []).append(m)
+        for comm_id, comm_valid in by_community.items():
+            if len(comm_valid) >= 2:
+                community_semantic_groups.setdefault(comm_id, []).append((group, comm_valid))
         if len(valid_members) < 2:
             continue
         cyto_semantic_groups[gid] = {
@@ -162,73 +386,133 @@ def prepare_viz_data(entities, edges, community_summaries, chunk_lookup, semanti
             "member_similarities": group.get("member_similarities", {}),
         }
 
-    all_pr = [entities[n].get("pagerank", 0) for n in viz_nodes]
-    all_comm_counts = [viz_community_counts[c] for c in viz_community_counts if viz_community_counts[c] >= min_community_size]
+    pagerank = store.pagerank
+    visible_ids = [i for i in range(store.n_entities) if visible[i]]
+    pr_bounds = value_bounds([pagerank[i] for i in visible_ids])
+    cyto_ids = [""] * store.n_entities
+    sizes = [0] * store.n_entities
+    for i in visible_ids:
+        cyto_ids[i] = sanitize_cyto_id(names[i])
+        sizes[i] = scale_in_bounds(pagerank[i], pr_bounds, 25, 90)
+
+    return VizContext(
+        store=store,
+        chunk_lookup=chunk_lookup,
+        semantic_groups=semantic_groups,
+        entity_chunk_map=entity_chunk_map,
+        min_community_size=min_community_size,
+        visible=visible,
+        viz_community_counts=viz_community_counts,
+        cyto_community_summaries=cyto_community_summaries,
+        other_community_count=other_community_count,
+        other_node_count=other_node_count,
+        cyto_semantic_groups=cyto_semantic_groups,
+        pr_bounds=pr_bounds,
+        comm_count_bounds=comm_count_bounds,
+        community_members=community_members,
+        community_edges=community_edges,
+        community_links=community_links,
+        inter_comm_edges=bucket_community_links(community_links, cyto_community_summaries),
+        community_semantic_groups=community_semantic_groups,
+        safe_id_to_name={cyto_ids[i]: names[i] for i in visible_ids},
+        cyto_ids=cyto_ids,
+        sizes=sizes,
+        layout_hints=layout_hints and LAYOUT_AVAILABLE,
+    )
+
+def iter_chunk_refs(ctx: VizContext, entity_ids: Optional[Set[str]] = None) -> Iterator[Tuple[str, List[dict]]]:
+    """(sanitized entity id, chunk refs with content hash) for every visible entity citing a known chunk.
+
+    entity_ids limits this to the entities with those sanitized ids.
+    """
+    names, visible, cyto_ids = ctx.store.names, ctx.visible, ctx.cyto_ids
+    for i in range(ctx.store.n_entities):
+        if not visible[i]:
+            continue
+        entity_name = names[i]
+        if entity_ids is not None and cyto_ids[i] not in entity_ids:
+            continue
+        refs = ctx.entity_chunk_map.get(entity_name, [])
+        if not refs:
+            continue
+        refs_for_entity = []
+        for ref in refs:
+            chunk_idx = ref["chunk_index"]
+            chunk_data = ctx.chunk_lookup.get(chunk_idx)
+            if not chunk_data:
+                continue
+            refs_for_entity.append({"index": chunk_idx, "source_id": ref["source_id"], "hash": chunk_data["hash"]})
+        if refs_for_entity:
+            yield cyto_ids[i], refs_for_entity
 
-    community_meta_elements = []
+def build_chunk_index(ctx: VizContext, entity_ids: Optional[Set[str]] = None) -> Tuple[List[str], Dict[str, list]]:
+    """Distinct chunk content hashes plus per-entity references into them."""
+    chunk_hashes: List[str] = []
+    hash_to_idx: Dict[str, int] = {}
+    cyto_chunk_refs: Dict[str, list] = {}
 
-    for comm_id, summary_data in cyto_community_summaries.items():
-        member_count = viz_community_counts[comm_id]
+    for entity_id, refs in iter_chunk_refs(ctx, entity_ids):
+        for ref in refs:
+            digest = ref.pop("hash")
+            if digest not in hash_to_idx:
+                hash_to_idx[digest] = len(chunk_hashes)
+                chunk_hashes.append(digest)
+            ref["hash_idx"] = hash_to_idx[digest]
+        cyto_chunk_refs[entity_id] = refs
+
+    return chunk_hashes, cyto_chunk_refs
+
+def iter_meta_elements(ctx: Union[VizContext, VizOverview]) -> Iterator[dict]:
+    """Community meta-nodes, the "Other" bucket and then aggregated inter-community edges."""
+    positions = ctx.community_positions()
+    for comm_id, summary_data in ctx.cyto_community_summaries.items():
+        member_count = ctx.viz_community_counts[comm_id]
         color = COMMUNITY_COLORS[comm_id % len(COMMUNITY_COLORS)]
-        top_members = sorted(
-            [n for n in viz_nodes if entities[n].get("community") == comm_id],
-            key=lambda x: -entities[x].get("pagerank", 0)
-        )[:5]
-        pr_sum = sum(entities[m].get("pagerank", 0) for m in top_members)
+        top_members, pr_sum = ctx.community_top_members(comm_id)
 
-        community_meta_elements.append({
+        element = {
             "data": {
                 "id": f"comm-{comm_id}",
                 "label": summary_data["title"][:35],
                 "type": "COMMUNITY",
                 "community": comm_id,
                 "member_count": member_count,
-                "top_members": [m[:25] for m in top_members],
+                "top_members": [name[:25] for name in top_members],
                 "color": color,
-                "size": scale_community_size(member_count, all_comm_counts),
+                "size": scale_in_bounds(member_count, ctx.comm_count_bounds, 40, 120),
                 "pagerank_sum": round(pr_sum, 4),
             }
-        })
+        }
+        if positions is not None:
+            element["data"].update(layout_hint(positions[comm_id]))
+        yield element
 
-    if other_node_count > 0:
-        community_meta_elements.append({
+    if ctx.other_node_count > 0:
+        element = {
             "data": {
                 "id": "comm-other",
-                "label": f"Other ({other_community_count} small)",
+                "label": f"Other ({ctx.other_community_count} small)",
                 "type": "COMMUNITY",
                 "community": -1,
-                "member_count": other_node_count,
+                "member_count": ctx.other_node_count,
                 "top_members": [],
                 "color": "#555555",
                 "size": 40,
                 "pagerank_sum": 0,
             }
-        })
-
-    inter_comm_edges: Dict[Tuple, dict] = {}
-    for src, tgt, attrs in edges:
-        if src not in viz_nodes or tgt not in viz_nodes:
-            continue
-        src_comm = entities[src].get("community", -1)
-        tgt_comm = entities[tgt].get("community", -1)
-        if src_comm == tgt_comm:
-            continue
-        src_in = src_comm in cyto_community_summaries
-        tgt_in = tgt_comm in cyto_community_summaries
-        if not src_in and not tgt_in:
-            continue
-        src_id = f"comm-{src_comm}" if src_in else "comm-other"
-        tgt_id = f"comm-{tgt_comm}" if tgt_in else "comm-other"
-        key = (src_id, tgt_id)
-        if key not in inter_comm_edges:
-            inter_comm_edges[key] = {"count": 0, "descriptions": []}
-        inter_comm_edges[key]["count"] += 1
-        desc = attrs.get("description", "")
-        if desc and len(inter_comm_edges[key]["descriptions"]) < 5:
-            inter_comm_edges[key]["descriptions"].append(f"{src} \u2192 {tgt}: {desc[:80]}")
-
-    for (src_id, tgt_id), data in inter_comm_edges.items():
-        community_meta_elements.append({
+        }
+        if positions is not None:
+            # The bucket sits at the member-weighted mean direction of the communities it stands for
+            totals = [0.0, 0.0, 0.0]
+            for comm_id, count in ctx.viz_community_counts.items():
+                if comm_id not in ctx.cyto_community_summaries and comm_id in positions:
+                    for axis, c in enumerate(positions[comm_id]):
+                        totals[axis] += count * c
+            element["data"].update(layout_hint(_unit_position(totals)))
+        yield element
+
+    for (src_id, tgt_id), data in ctx.inter_comm_edges.items():
+        yield {
             "data": {
                 "id": f"{src_id}-->{tgt_id}",
                 "source": src_id,
@@ -237,61 +521,127 @@ def prepare_viz_data(entities, edges, community_summaries, chunk_lookup, semanti
                 "description": f"{data['count']} cross-community relationships",
                 "details": data["descriptions"],
             }
-        })
-
-    community_entity_data: Dict[int, dict] = {}
-
-    for comm_id in cyto_community_summaries:
-        comm_members = [n for n in viz_nodes if entities[n].get("community") == comm_id]
-        member_set = set(comm_members)
+        }
 
-        ent_elements = []
-        for node in comm_members:
-            attrs = entities[node]
-            pr = attrs.get("pagerank", 0)
-            chunk_refs = entity_chunk_map.get(node, [])
-            safe_id = sanitize_cyto_id(node)
-            ent_elements.append({
-                "data": {
-                    "id": safe_id,
-                    "label": node,
-                    "parent": f"comm-{comm_id}",
-                    "type": attrs.get("type", "UNKNOWN"),
-                    "description": attrs.get("description", ""),
-                    "community": comm_id,
-                    "pagerank": round(pr or 0, 6),
-                    "degree_centrality": round(attrs.get("degree_centrality") or 0, 4),
-                    "betweenness": round(attrs.get("betweenness") or 0, 4),
-                    "num_sources": attrs.get("num_sources", 1),
-                    "source_refs": attrs.get("source_refs", "[]"),
-                    "color": COMMUNITY_COLORS[comm_id % len(COMMUNITY_COLORS)],
-                    "size": scale_pagerank_to_size(pr, all_pr),
-                    "chunk_count": len(chunk_refs),
-                }
-            })
+def build_meta_elements(ctx: Union[VizContext, VizOverview]) -> List[dict]:
+    return list(iter_meta_elements(ctx))
+
+def rank_community_members(ctx: VizContext, comm_id: int) -> List[int]:
+    """Indexes into community_members[comm_id] by descending pagerank, ties by betweenness, then member order."""
+    members = ctx.community_members.get(comm_id, [])
+    pagerank, betweenness = ctx.store.pagerank, ctx.store.betweenness
+    return sorted(range(len(members)), key=lambda k: (-pagerank[members[k]], -betweenness[members[k]]))
+
+def prune_page_edges(store: GraphStore, edges: List[int], page: Set[int], shown: Set[int], budget: int) -> List[int]:
+    """The edges between shown entities that touch the page, cut to at most `budget` (or one per page entity).
+
+    Every page entity first keeps its heaviest edge, so pruning leaves none
+    unattached that had a neighbour on screen; the heaviest remaining edges
+    fill the rest. The kept edges stay in their input order.
+    """
+    edge_src, edge_tgt = store.edge_src, store.edge_tgt
+    candidates = [e for e in edges
+                  if edge_src[e] in shown and edge_tgt[e] in shown and (edge_src[e] in page or edge_tgt[e] in page)]
+    if len(candidates) <= budget:
+        return candidates
+    by_weight = sorted(candidates, key=lambda e: -store.weight_of(e))
+    keep: Set[int] = set()
+    attached: Set[int] = set()
+    for e in by_weight:
+        for end in (edge_src[e], edge_tgt[e]):
+            if end in page and end not in attached:
+                attached.add(end)
+                keep.add(e)
+    for e in by_weight:
+        if len(keep) >= budget:
+            break
+        keep.add(e)
+    return [e for e in candidates if e in keep]
+
+def build_community_block(ctx: VizContext, comm_id: int, max_entities: int = 0, offset: int = 0) -> Dict[str, list]:
+    """Entities, intra-community edges and semantic-group compounds for one community.
+
+    With max_entities the block is one page of the community instead: its
+    members ranked by rank_community_members from offset on, at most
+    MAX_EDGES_PER_ENTITY edges per entity among everything paged in so far,
+    and under "more" an "N more" placeholder standing for the members and
+    edges of later pages, whose next_offset requests the following page.
+    """
+    store = ctx.store
+    names, types, cyto_ids = store.names, store.types, ctx.cyto_ids
+    color = COMMUNITY_COLORS[comm_id % len(COMMUNITY_COLORS)]
+    members = ctx.community_members.get(comm_id, [])
+    positions = ctx.member_positions(comm_id)
+
+    paged = max_entities > 0
+    if paged:
+        ranked = rank_community_members(ctx, comm_id)
+        order = ranked[offset:offset + max_entities]
+        page = {members[k] for k in order}
+        shown = {members[k] for k in ranked[:offset + max_entities]}
+    else:
+        order = range(len(members))
+
+    ent_elements = []
+    ent_by_id: Dict[str, List[dict]] = {}
+    for k in order:
+        i = members[k]
+        node = names[i]
+        pr = store.pagerank[i]
+        chunk_refs = ctx.entity_chunk_map.get(node, [])
+        safe_id = cyto_ids[i]
+        ent_elements.append({
+            "data": {
+                "id": safe_id,
+                "label": node,
+                "parent": f"comm-{comm_id}",
+                "type": types[store.type_ids[i]],
+                "description": store.descriptions[i],
+                "community": comm_id,
+                "pagerank": round(pr, 6),
+                "degree_centrality": round(store.degree_centrality[i], 4),
+                "betweenness": round(store.betweenness[i], 4),
+                "num_sources": store.num_sources_of(i),
+                "source_refs": store.source_refs[i],
+                "color": color,
+                "size": ctx.sizes[i],
+                "chunk_count": len(chunk_refs),
+            }
+        })
+        if positions is not None:
+            ent_elements[-1]["data"].update(layout_hint(positions[k]))
+        ent_by_id.setdefault(safe_id, []).append(ent_elements[-1])
+
+    edges = ctx.community_edges.get(comm_id, [])
+    if paged:
+        edges = prune_page_edges(store, edges, page, shown, MAX_EDGES_PER_ENTITY * len(page))
+    edge_elements = []
+    for e in edges:
+        safe_src = cyto_ids[store.edge_src[e]]
+        safe_tgt = cyto_ids[store.edge_tgt[e]]
+        edge_elements.append({
+            "data": {
+                "id": f"{safe_src}-->{safe_tgt}",
+                "source": safe_src,
+                "target": safe_tgt,
+                "description": store.edge_descriptions[e],
+                "weight": store.weight_of(e),
+            }
+        })
 
-        edge_elements = []
-        for src, tgt, attrs in edges:
-            if src in member_set and tgt in member_set:
-                safe_src = sanitize_cyto_id(src)
-                safe_tgt = sanitize_cyto_id(tgt)
-                edge_elements.append({
-                    "data": {
-                        "id": f"{safe_src}-->{safe_tgt}",
-                        "source": safe_src,
-                        "target": safe_tgt,
-                        "description": attrs.get("description", ""),
-                        "weight": attrs.get("weight", 1.0),
-                    }
-                })
-
-        sg_elements = []
-        for group in semantic_groups:
-            gid = group["group_id"]
-            valid_members = [m for m in group["members"] if m in member_set and m in entity_node_ids]
-            if len(valid_members) < 2 or len(group["members"]) > MAX_COMPOUND_SIZE:
+    sg_elements = []
+    for group, valid_members in ctx.community_semantic_groups.get(comm_id, []):
+        gid = group["group_id"]
+        parent_id = f"sg-{gid}"
+        if paged:
+            member_ids = {store.name_to_id[m] for m in valid_members}
+            if member_ids.isdisjoint(page):
                 continue
-            parent_id = f"sg-{gid}"
+            # A group already sent with an earlier page only needs its new members' parent set
+            first_page = member_ids.isdisjoint(shown - page)
+        else:
+            first_page = True
+        if first_page:
             sg_elements.append({
                 "data": {
                     "id": parent_id,
@@ -304,76 +654,246 @@ def prepare_viz_data(entities, edges, community_summaries, chunk_lookup, semanti
                     "color": SEMANTIC_GROUP_COLOR,
                 }
             })
-            safe_valid = {sanitize_cyto_id(m) for m in valid_members}
-            for ent in ent_elements:
-                if ent["data"]["id"] in safe_valid:
-                    ent["data"]["parent"] = parent_id
-
-        community_entity_data[comm_id] = {
-            "entities": ent_elements,
-            "edges": edge_elements,
-            "semantic_groups": sg_elements,
-        }
+        totals = [0.0, 0.0, 0.0]
+        for safe_id in {cyto_ids[store.name_to_id[m]] for m in valid_members}:
+            for ent in ent_by_id.get(safe_id, []):
+                ent["data"]["parent"] = parent_id
+                if positions is not None:
+                    totals[0] += ent["data"]["fx"]
+                    totals[1] += ent["data"]["fy"]
+                    totals[2] += ent["data"]["fz"]
+        if first_page and positions is not None:
+            sg_elements[-1]["data"].update(layout_hint(_unit_position(totals)))
+
+    block = {
+        "entities": ent_elements,
+        "edges": edge_elements,
+        "semantic_groups": sg_elements,
+    }
+    if paged:
+        block["total_entities"] = len(members)
+        block["offset"] = offset
+        block["more"] = []
+        hidden = ranked[offset + max_entities:]
+        if hidden:
+            hidden_ids = {members[k] for k in hidden}
+            next_offset = offset + max_entities
+            placeholder = {
+                "data": {
+                    "id": f"more-{comm_id}-{next_offset}",
+                    "label": f"{len(hidden)} more",
+                    "parent": f"comm-{comm_id}",
+                    "type": "MORE",
+                    "community": comm_id,
+                    "member_count": len(hidden),
+                    "edge_count": sum(1 for e in ctx.community_edges.get(comm_id, [])
+                                      if store.edge_src[e] in hidden_ids or store.edge_tgt[e] in hidden_ids),
+                    "next_offset": next_offset,
+                    "color": MORE_NODE_COLOR,
+                    "size": 40,
+                }
+            }
+            if positions is not None:
+                totals = [sum(positions[k][axis] for k in hidden) for axis in range(3)]
+                placeholder["data"].update(layout_hint(_unit_position(totals)))
+            block["more"].append(placeholder)
+    return block
 
-    # Format summaries uniformly
+def format_comm_summaries(ctx: Union[VizContext, VizOverview]) -> Dict[int, dict]:
     formatted_summaries = {}
-    for comm_id, summary_data in cyto_community_summaries.items():
+    for comm_id, summary_data in ctx.cyto_community_summaries.items():
         formatted_summaries[comm_id] = {
             "title": summary_data.get("title", f"Community {comm_id}"),
             "summary": summary_data.get("summary", ""),
             "key_insights": summary_data.get("key_insights", []),
         }
+    return formatted_summaries
+
+@contextmanager
+def gc_paused():
+    """Suspend the cyclic GC while building millions of acyclic dicts/lists.
+
+    Each generation-2 collection walks the whole heap, which makes large builds
+    superlinear; the payload holds no reference cycles, so nothing is leaked.
+    The switch is process-wide and not reentrant across threads, so it is for
+    single-threaded offline scripts and benchmarks only, never the API's
+    concurrent worker-thread builds.
+    """
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+def prepare_viz_data(entities, edges, community_summaries, chunk_lookup, semantic_groups, entity_chunk_map, include_orphans=False, min_community_size=MIN_COMMUNITY_SIZE_FOR_VIZ) -> Dict[str, Any]:
+    """Full payload from the dict model (load_entities / load_relationships)."""
+    store = GraphStore.from_dicts(entities, edges)
+    return build_viz_payload(store, community_summaries, chunk_lookup, semantic_groups, entity_chunk_map, include_orphans, min_community_size)
+
+def build_viz_payload(store: GraphStore, community_summaries, chunk_lookup, semantic_groups, entity_chunk_map, include_orphans=False, min_community_size=MIN_COMMUNITY_SIZE_FOR_VIZ, layout_hints=False, max_entities=0) -> Dict[str, Any]:
+    """The whole graph in one payload; with max_entities each community holds only its first page (see build_community_block)."""
+    ctx = build_viz_context(store, community_summaries, chunk_lookup, semantic_groups, entity_chunk_map, include_orphans, min_community_size, layout_hints)
+    return build_context_payload(ctx, max_entities)
+
+def build_context_payload(ctx: VizContext, max_entities: int = 0) -> Dict[str, Any]:
+    """build_viz_payload for an already loaded context, e.g. one whose layout came from the viz tables."""
+    community_data = {comm_id: build_community_block(ctx, comm_id, max_entities) for comm_id in ctx.cyto_community_summaries}
+    entity_ids = None
+    if max_entities > 0:
+        # Entities on later pages get their chunk refs from /entity/{id}/chunks, like lazily loaded ones
+        entity_ids = {ent["data"]["id"] for block in community_data.values() for ent in block["entities"]}
+    chunk_hashes, cyto_chunk_refs = build_chunk_index(ctx, entity_ids)
 
     return {
-        "metaElements": community_meta_elements,
-        "communityData": community_entity_data,
-        "chunkTexts": chunk_texts,
+        "metaElements": build_meta_elements(ctx),
+        "communityData": community_data,
+        "chunkHashes": chunk_hashes,
         "chunkRefs": cyto_chunk_refs,
-        "commSummaries": formatted_summaries,
-        "semanticGroups": cyto_semantic_groups,
+        "commSummaries": format_comm_summaries(ctx),
+        "semanticGroups": ctx.cyto_semantic_groups,
+    }
+
+def build_graph_overview(ctx: Union[VizContext, VizOverview]) -> Dict[str, Any]:
+    """First-paint payload: meta-nodes, inter-community edges and summaries, no entities.
+
+    version is the base a client passes to /delta to catch up later.
+    """
+    return {
+        "version": fingerprint_version(ctx.fingerprint),
+        "metaElements": build_meta_elements(ctx),
+        "commSummaries": format_comm_summaries(ctx),
+    }
+
+def get_community_data(ctx: VizContext, comm_id: int, max_entities: int = 0, offset: int = 0) -> Optional[Dict[str, Any]]:
+    """Lazy Level 1 payload for one community (one page of it with max_entities), or None if it is not a visualized community."""
+    if comm_id not in ctx.cyto_community_summaries:
+        return None
+    block = build_community_block(ctx, comm_id, max_entities, offset)
+    gids = {sg["data"]["group_id"] for sg in block["semantic_groups"]}
+    block["community"] = comm_id
+    block["semanticGroups"] = {gid: g for gid, g in ctx.cyto_semantic_groups.items() if gid in gids}
+    return block
+
+def iter_viz_records(ctx: VizContext) -> Iterator[Dict[str, Any]]:
+    """The full payload as a stream of self-contained records, built one at a time.
+
+    Order: a header, meta nodes, inter-community edges, one record per
+    community (its /community payload plus summary), chunk refs per entity
+    and an end marker. Only the record being built is held besides ctx.
+    """
+    yield {"type": "header", "version": fingerprint_version(ctx.fingerprint)}
+    for element in iter_meta_elements(ctx):
+        yield {"type": "metaEdge" if "source" in element["data"] else "meta", "element": element}
+    summaries = format_comm_summaries(ctx)
+    for comm_id in ctx.cyto_community_summaries:
+        yield {"type": "community", "id": comm_id, "summary": summaries[comm_id], **get_community_data(ctx, comm_id)}
+    for entity_id, refs in iter_chunk_refs(ctx):
+        yield {"type": "chunkRefs", "entity": entity_id, "refs": refs}
+    yield {"type": "end"}
+
+def get_entity_chunks(ctx: VizContext, entity_id: str) -> Optional[List[dict]]:
+    """Source chunk references (id, source, content hash) for an entity addressed by its sanitized id."""
+    name = ctx.safe_id_to_name.get(entity_id)
+    if name is None:
+        return None
+    chunks = []
+    for ref in ctx.entity_chunk_map.get(name, []):
+        chunk_data = ctx.chunk_lookup.get(ref["chunk_index"])
+        if not chunk_data:
+            continue
+        chunks.append({"index": ref["chunk_index"], "source_id": ref["source_id"], "hash": chunk_data["hash"]})
+    return chunks
+
+def load_chunk_texts(db_path: str, chunk_ids: List[int]) -> Dict[str, Any]:
+    """Chunk bodies for a batch of chunk ids: each id's content hash, and each distinct text once by hash."""
+    if not os.path.exists(db_path):
+        raise GraphDataError("Database not found")
+    chunks: Dict[int, str] = {}
+    texts: Dict[str, str] = {}
+    try:
+        with get_pool(db_path).connection() as conn:
+            rows = conn.execute(
+                "SELECT chunk_index, content FROM chunks WHERE chunk_index IN (SELECT value FROM json_each(?)) ORDER BY rowid",
+                (json.dumps(chunk_ids),),
+            ).fetchall()
+    except sqlite3.Error as e:
+        raise GraphDataError(str(e)) from e
+    for chunk_idx, text in rows:
+        if text is None:
+            continue
+        digest = content_hash(text)
+        chunks[chunk_idx] = digest  # later rows win, as in load_chunk_lookup
+        texts[digest] = text
+    used = set(chunks.values())
+    return {
+        "chunks": [{"index": idx, "hash": digest} for idx, digest in chunks.items()],
+        "texts": {digest: text for digest, text in texts.items() if digest in used},
     }
 
-def get_graph_data(db_path: str, top_communities: int = 0, include_orphans: bool = False, min_community_size: int = MIN_COMMUNITY_SIZE_FOR_VIZ) -> Dict[str, Any]:
+def load_graph_inputs(db_path: str, top_communities: int = 0, include_orphans: bool = True) -> Dict[str, Any]:
+    """Read every table the visualization needs.
+
+    top_communities keeps only the N largest communities, and include_orphans=False
+    drops entities without relationships in view. Both filters run in SQL, so rows
+    outside the view are never loaded.
+    """
+    if not os.path.exists(db_path):
+        raise GraphDataError("Database not found")
+
+    scope = None
+    try:
+        with get_pool(db_path).connection() as conn:
+            cursor = conn.cursor()
+            if top_communities > 0 or not include_orphans:
+                communities = tuple(load_top_communities(cursor, top_communities)) if top_communities > 0 else None
+                scope = GraphScope(communities, include_orphans)
+            store = load_graph_store(cursor, scope)
+            community_summaries = load_community_summaries(cursor)
+            chunk_lookup = load_chunk_lookup(cursor, scope)
+            semantic_groups = load_semantic_groups(cursor)
+            entity_chunk_map = load_entity_chunk_map(cursor, scope)
+    except Exception as e:
+        raise GraphDataError(str(e)) from e
+
+    if scope is not None:
+        if scope.communities is not None:
+            top_set = set(scope.communities)
+            community_summaries = {k: v for k, v in community_summaries.items() if k in top_set}
+        semantic_groups = [g for g in semantic_groups if any(m in store.name_to_id for m in g["members"])]
+
+    return {
+        "store": store,
+        "community_summaries": community_summaries,
+        "chunk_lookup": chunk_lookup,
+        "semantic_groups": semantic_groups,
+        "entity_chunk_map": entity_chunk_map,
+    }
+
+def get_viz_context(db_path: str, top_communities: int = 0, include_orphans: bool = False, min_community_size: int = MIN_COMMUNITY_SIZE_FOR_VIZ,
+                    layout_hints: bool = False) -> VizContext:
+    inputs = load_graph_inputs(db_path, top_communities, include_orphans)
+    return build_viz_context(include_orphans=include_orphans, min_community_size=min_community_size,
+                             layout_hints=layout_hints, **inputs)
+
+def get_graph_data(db_path: str, top_communities: int = 0, include_orphans: bool = False, min_community_size: int = MIN_COMMUNITY_SIZE_FOR_VIZ,
+                   layout_hints: bool = False, max_entities: int = 0) -> Dict[str, Any]:
     if not os.path.exists(db_path):
         return {
             "metaElements": [],
             "communityData": {},
-            "chunkTexts": [],
+            "chunkHashes": [],
             "chunkRefs": {},
             "commSummaries": {},
             "semanticGroups": {},
             "error": "Database not found"
         }
 
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
     try:
-        entities = load_entities(cursor)
-        edges = load_relationships(cursor)
-        community_summaries = load_community_summaries(cursor)
-        chunk_lookup = load_chunk_lookup(cursor)
-        semantic_groups = load_semantic_groups(cursor)
-        entity_chunk_map = load_entity_chunk_map(cursor)
-    except Exception as e:
-        conn.close()
+        inputs = load_graph_inputs(db_path, top_communities, include_orphans)
+    except GraphDataError as e:
         return {"error": str(e)}
 
-    conn.close()
-
-    if top_communities > 0:
-        comm_counts: Dict[int, int] = {}
-        for ent in entities.values():
-            cid = ent.get("community", -1)
-            if cid is not None and cid >= 0:
-                comm_counts[cid] = comm_counts.get(cid, 0) + 1
-        top_ids = sorted(comm_counts, key=lambda c: -comm_counts[c])[:top_communities]
-        top_set = set(top_ids)
-
-        entities = {n: e for n, e in entities.items() if e.get("community") in top_set}
-        edges = [(s, t, a) for s, t, a in edges if s in entities and t in entities]
-        community_summaries = {k: v for k, v in community_summaries.items() if k in top_set}
-        entity_chunk_map = {k: v for k, v in entity_chunk_map.items() if k in entities}
-        semantic_groups = [g for g in semantic_groups if any(m in entities for m in g["members"])]
-
-    return prepare_viz_data(entities, edges, community_summaries, chunk_lookup, semantic_groups, entity_chunk_map, include_orphans, min_community_size)
+    return build_viz_payload(include_orphans=include_orphans, min_community_size=min_community_size,
+                             layout_hints=layout_hints, max_entities=max_entities, **inputs)
@@ -0,0 +1,136 @@
+"""On-disk snapshots of values derived from graphrag.db, keyed by its fingerprint.
+
+The viz scripts spend most of a run reading the graph tables and building
+the store. A snapshot pickles such a result under the cache directory, named
+after the database path, its fingerprint and the caller's key, so a rerun
+against an unchanged DB only unpickles it. Snapshots of earlier versions of
+the same DB are deleted when a new one is written. The files are trusted
+local cache output; never point cache_dir at a location others can write.
+
+Values that are worth reusing across DB versions, like a layout that seeds
+the next one, go through read_latest / write_latest instead: one file per
+key, overwritten by each version and never pruned.
+
+Usage:
+    inputs = load_graph_snapshot(db_path, top_communities=10, include_orphans=False)
+    page = cached_build(db_path, ("my-page", 10), build_page)
+"""
+
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from src.config import GRAPH_SNAPSHOT_DIR
+from src.services.graph_cache import db_fingerprint, fingerprint_version
+from src.services.graph_service import gc_paused, load_graph_inputs
+
+logger = logging.getLogger(__name__)
+
+# Bump when GraphStore or the load_graph_inputs result changes shape; older snapshots are then ignored
+SNAPSHOT_FORMAT_VERSION = 1
+SNAPSHOT_SUFFIX = ".pickle"
+# Stands in for the DB version in the names of read_latest / write_latest files
+LATEST = "latest"
+
+
+def _db_tag(db_path: str) -> str:
+    return hashlib.sha256(os.path.abspath(db_path).encode()).hexdigest()[:12]
+
+
+def snapshot_path(cache_dir: str, db_path: str, version: str, key: Hashable) -> Path:
+    """<db path hash>-<db version>-<key hash>.pickle, so one DB's snapshots share a prefix."""
+    key_tag = hashlib.sha256(repr((SNAPSHOT_FORMAT_VERSION, key)).encode()).hexdigest()[:12]
+    return Path(cache_dir) / f"{_db_tag(db_path)}-{version}-{key_tag}{SNAPSHOT_SUFFIX}"
+
+
+def _read(path: Path) -> Optional[Any]:
+    try:
+        with open(path, "rb") as f, gc_paused():
+            return pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:  # truncated or written by an incompatible version
+        logger.warning("Ignoring unreadable graph snapshot %s: %s", path, e)
+        return None
+
+
+def _write(path: Path, value: Any) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def prune_snapshots(cache_dir: str, db_path: str, version: str) -> int:
+    """Delete snapshots of db_path taken at any version other than the given one; returns how many."""
+    removed = 0
+    prefix = f"{_db_tag(db_path)}-"
+    for path in Path(cache_dir).glob(f"{prefix}*{SNAPSHOT_SUFFIX}"):
+        if not path.name.startswith((f"{prefix}{version}-", f"{prefix}{LATEST}-")):
+            try:
+                path.unlink()
+                removed += 1
+            except OSError:
+                pass
+    return removed
+
+
+def cached_build(db_path: str, key: Hashable, build: Callable[[], Any], cache_dir: str = GRAPH_SNAPSHOT_DIR) -> Any:
+    """build(), or its snapshot from an earlier call with the same key while the DB is unchanged.
+
+    The result is only stored if the DB fingerprint is the same after the
+    build as before it, so a snapshot never mixes two versions of the DB.
+    """
+    fingerprint = db_fingerprint(db_path)
+    if fingerprint is None:
+        return build()
+    version = fingerprint_version(fingerprint)
+    path = snapshot_path(cache_dir, db_path, version, key)
+    value = _read(path)
+    if value is not None:
+        return value
+
+    value = build()
+    if db_fingerprint(db_path) == fingerprint:
+        try:
+            _write(path, value)
+            prune_snapshots(cache_dir, db_path, version)
+        except OSError as e:
+            logger.warning("Could not write graph snapshot %s: %s", path, e)
+    return value
+
+
+def read_latest(db_path: str, key: Hashable, cache_dir: str = GRAPH_SNAPSHOT_DIR) -> Optional[Tuple[str, Any]]:
+    """(DB version, value) last stored under key by write_latest, from this or any earlier DB version."""
+    stored = _read(snapshot_path(cache_dir, db_path, LATEST, key))
+    if not (isinstance(stored, tuple) and len(stored) == 2):
+        return None
+    return stored
+
+
+def write_latest(db_path: str, key: Hashable, version: str, value: Any, cache_dir: str = GRAPH_SNAPSHOT_DIR) -> None:
+    """Store value as built from DB version `version`, replacing whatever key held before."""
+    path = snapshot_path(cache_dir, db_path, LATEST, key)
+    try:
+        _write(path, (version, value))
+    except OSError as e:
+        logger.warning("Could not write graph snapshot %s: %s", path, e)
+
+
+def load_graph_snapshot(db_path: str, top_communities: int = 0, include_orphans: bool = True,
+                        cache_dir: Optional[str] = GRAPH_SNAPSHOT_DIR) -> Dict[str, Any]:
+    """load_graph_inputs through the snapshot cache; cache_dir=None reads the DB every time."""
+    load = partial(load_graph_inputs, db_path, top_communities, include_orphans)
+    if cache_dir is None:
+        return load()
+    return cached_build(db_path, ("graph_inputs", top_communities, include_orphans), load, cache_dir)
@@ -0,0 +1,194 @@
+import json
+import math
+from array import array
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Column sentinels for SQL NULLs; mapped back to None when values leave the store
+NO_COMMUNITY = -(2 ** 62)
+NO_COUNT = -1
+
+
+class StringTable:
+    """Interns repeated strings (entity types) so each row stores a small int."""
+
+    def __init__(self):
+        self.values: List[Optional[str]] = []
+        self._ids: Dict[Optional[str], int] = {}
+
+    def intern(self, value: Optional[str]) -> int:
+        idx = self._ids.get(value)
+        if idx is None:
+            idx = self._ids[value] = len(self.values)
+            self.values.append(value)
+        return idx
+
+    def __getitem__(self, idx: int) -> Optional[str]:
+        return self.values[idx]
+
+
+class GraphStore:
+    """Column-oriented entities and relationships with entity names interned to int ids.
+
+    Entity i has name names[i] and its numeric attributes at index i of the
+    typed arrays. Free text (descriptions, source_refs) sits in plain string
+    lists, and low-cardinality types in a StringTable. Edges are COO arrays
+    of entity ids plus weight and description columns, in load order. Ids at
+    or above n_entities are edge endpoints with no entity row; they only
+    count towards degree, as dangling names did in the dict model.
+    """
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.name_to_id: Dict[str, int] = {}
+        self.n_entities = 0
+        self.types = StringTable()
+        self.type_ids = array("i")
+        self.descriptions: List[Optional[str]] = []
+        self.source_refs: List[Optional[str]] = []
+        self.pagerank = array("d")
+        self.degree_centrality = array("d")
+        self.betweenness = array("d")
+        self.community = array("q")
+        self.num_sources = array("q")
+        self.edge_src = array("i")
+        self.edge_tgt = array("i")
+        self.edge_weight = array("d")
+        self.edge_descriptions: List[Optional[str]] = []
+
+    def __len__(self) -> int:
+        return self.n_entities
+
+    @property
+    def n_edges(self) -> int:
+        return len(self.edge_src)
+
+    def add_entity(self, name: str, type_: Optional[str], description: Optional[str], pagerank, degree_centrality,
+                   betweenness, community: Optional[int], source_refs: Optional[str], num_sources: Optional[int]) -> int:
+        idx = self.n_entities
+        self.names.append(name)
+        self.name_to_id[name] = idx
+        self.n_entities += 1
+        self.type_ids.append(self.types.intern(type_))
+        self.descriptions.append(description)
+        self.source_refs.append(source_refs)
+        self.pagerank.append(pagerank or 0.0)
+        self.degree_centrality.append(degree_centrality or 0.0)
+        self.betweenness.append(betweenness or 0.0)
+        self.community.append(NO_COMMUNITY if community is None else community)
+        self.num_sources.append(NO_COUNT if num_sources is None else num_sources)
+        return idx
+
+    def _endpoint(self, name: str) -> int:
+        idx = self.name_to_id.get(name)
+        if idx is None:
+            idx = self.name_to_id[name] = len(self.names)
+            self.names.append(name)
+        return idx
+
+    def add_edge(self, src: int, tgt: int, description: Optional[str], weight: Optional[float]) -> None:
+        self.edge_src.append(src)
+        self.edge_tgt.append(tgt)
+        self.edge_weight.append(math.nan if weight is None else weight)
+        self.edge_descriptions.append(description)
+
+    # Row accessors that restore NULLs
+
+    def community_of(self, idx: int) -> Optional[int]:
+        value = self.community[idx]
+        return None if value == NO_COMMUNITY else value
+
+    def num_sources_of(self, idx: int) -> Optional[int]:
+        value = self.num_sources[idx]
+        return None if value == NO_COUNT else value
+
+    def weight_of(self, edge: int) -> Optional[float]:
+        value = self.edge_weight[edge]
+        return None if math.isnan(value) else value
+
+    def degrees(self) -> array:
+        deg = array("i", bytes(4 * len(self.names)))
+        for s in self.edge_src:
+            deg[s] += 1
+        for t in self.edge_tgt:
+            deg[t] += 1
+        return deg
+
+    @classmethod
+    def from_dicts(cls, entities: Dict[str, dict], edges: Iterable[Tuple[str, str, dict]]) -> "GraphStore":
+        """Build from the load_entities / load_relationships dict model, with its defaults for missing keys."""
+        store = cls()
+        for name, e in entities.items():
+            store.add_entity(name, e.get("type", "UNKNOWN"), e.get("description", ""), e.get("pagerank"),
+                             e.get("degree_centrality"), e.get("betweenness"), e.get("community"),
+                             e.get("source_refs", "[]"), e.get("num_sources", 1))
+        for src, tgt, attrs in edges:
+            store.add_edge(store._endpoint(src), store._endpoint(tgt), attrs.get("description", ""), attrs.get("weight", 1.0))
+        return store
+
+
+@dataclass(frozen=True)
+class GraphScope:
+    """The entities a filtered view keeps, as a `kept(id)` CTE for scoped loader queries.
+
+    communities restricts the view to those community ids. Without orphans,
+    only entities with a relationship to another entity in the view remain;
+    that degree check runs in SQL, so orphan rows are never read.
+    """
+    communities: Optional[Tuple[int, ...]] = None
+    include_orphans: bool = True
+
+    def cte(self) -> Tuple[str, tuple]:
+        if self.communities is None:
+            scope, params = "SELECT id FROM entities", ()
+        else:
+            scope = "SELECT id FROM entities WHERE community_id IN (SELECT value FROM json_each(?))"
+            params = (json.dumps(list(self.communities)),)
+        if self.include_orphans:
+            return f"WITH kept(id) AS MATERIALIZED ({scope})", params
+        return f"""WITH scope(id) AS MATERIALIZED ({scope}),
+            kept(id) AS MATERIALIZED (
+                SELECT id FROM scope s
+                WHERE EXISTS (SELECT 1 FROM relationships r WHERE r.source_id = s.id AND r.target_id IN scope)
+                   OR EXISTS (SELECT 1 FROM relationships r WHERE r.target_id = s.id AND r.source_id IN scope)
+            )""", params
+
+    def query(self, select: str) -> Tuple[str, tuple]:
+        """Prefix a SELECT that refers to `kept` with the CTE, returning (sql, params)."""
+        cte, params = self.cte()
+        return f"{cte}\n{select}", params
+
+
+_ENTITY_COLUMNS = """id, name, type, description, pagerank, degree_centrality,
+               betweenness, community_id, source_refs, num_sources"""
+_RELATIONSHIP_COLUMNS = "source_id, target_id, description, weight"
+
+
+def load_graph_store(cursor, scope: Optional[GraphScope] = None) -> GraphStore:
+    """Read entities and relationships straight into columns, without per-row dicts.
+
+    With a scope only the kept entities and the relationships between them
+    are read, in the same (rowid) order as a full load.
+    """
+    store = GraphStore()
+    db_ids: Dict[int, int] = {}
+    if scope is None:
+        cursor.execute(f"SELECT {_ENTITY_COLUMNS} FROM entities")
+    else:
+        cursor.execute(*scope.query(f"SELECT {_ENTITY_COLUMNS} FROM entities WHERE id IN kept ORDER BY id"))
+    for row in cursor:
+        db_ids[row[0]] = store.add_entity(*row[1:])
+
+    if scope is None:
+        cursor.execute(f"SELECT {_RELATIONSHIP_COLUMNS} FROM relationships")
+    else:
+        cursor.execute(*scope.query(f"""SELECT {_RELATIONSHIP_COLUMNS} FROM relationships
+            WHERE source_id IN kept AND target_id IN kept ORDER BY rowid"""))
+    for src, tgt, description, weight in cursor:
+        s = db_ids.get(src)
+        t = db_ids.get(tgt)
+        if s is None or t is None:
+            continue  # same rows the entity JOIN in load_relationships drops
+        store.add_edge(s, t, description, weight)
+    return store
+
@@ -0,0 +1,145 @@
+"""Persistent cache of LLM responses, so re-running the pipeline skips calls it has already made.
+
+Every response is stored in a small SQLite file under a key hashing all that
+determines it: the model, the prompt template's name and version, the
+rendered prompt, the system message and the sampling options. Re-ingesting
+a corpus after a crash, or redoing only the steps after extraction, then
+costs cache lookups instead of LLM time. Bump a template's version when its
+parsing changes meaning but its text doesn't, so old answers are not reused.
+
+The file is bounded by max_bytes of stored responses; going over it evicts
+the least recently used entries. Hit and miss counts cover the lifetime of
+the LLMResponseCache object, so a notebook run can report its hit rate.
+
+Usage:
+    cache = LLMResponseCache()
+    key = llm_cache_key(model, "community-summary/1", prompt, options={"temperature": 0.0})
+    response = cache.get(key)
+    if response is None:
+        response = call_llm(prompt)
+        cache.put(key, response)
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from src.config import LLM_CACHE_MAX_BYTES, LLM_CACHE_PATH
+
+# Part of every key; bump to orphan all entries if the key layout changes
+LLM_CACHE_FORMAT_VERSION = 1
+# Eviction trims to this share of max_bytes, so a full cache doesn't evict on every put
+EVICT_TO = 0.9
+
+
+def llm_cache_key(model: str, template: str, prompt: str, system: str = "",
+                  options: Optional[Dict[str, Any]] = None) -> str:
+    """sha256 hex digest identifying one LLM request."""
+    payload = json.dumps([LLM_CACHE_FORMAT_VERSION, model, template, system, prompt, options or {}],
+                         sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class LLMResponseCache:
+    """SQLite-backed map from llm_cache_key() to the response text, with LRU eviction by size.
+
+    One connection is shared by every thread of the process behind a lock;
+    each put commits, so responses survive a crash mid-ingest.
+    """
+
+    def __init__(self, path: str = LLM_CACHE_PATH, max_bytes: int = LLM_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max(0, max_bytes)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30.0)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS llm_responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_llm_responses_last_used ON llm_responses(last_used);
+        """)
+        self._lock = threading.Lock()
+        self._bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_responses").fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+    def __enter__(self) -> "LLMResponseCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM llm_responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE llm_responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, response: str) -> None:
+        size = len(response.encode())
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM llm_responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_responses (key, response, size, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, response, size, now, now),
+            )
+            self._bytes += size - (old[0] if old else 0)
+            self.writes += 1
+            if self._bytes > self.max_bytes:
+                self._evict(int(self.max_bytes * EVICT_TO))
+            self._conn.commit()
+
+    def _evict(self, target: int) -> None:
+        doomed = []
+        for key, size in self._conn.execute("SELECT key, size FROM llm_responses ORDER BY last_used, created_at"):
+            if self._bytes <= target:
+                break
+            doomed.append((key,))
+            self._bytes -= size
+        self._conn.executemany("DELETE FROM llm_responses WHERE key = ?", doomed)
+        self.evictions += len(doomed)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_responses")
+            self._conn.commit()
+            self._bytes = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": self._conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0],
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,60 @@
+"""Pooled async client for the Ollama HTTP API, shared by the extraction and embedding stages."""
+
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
+import httpx
+
+from src.config import OLLAMA_BASE_URL
+
+logger = logging.getLogger(__name__)
+
+
+class OllamaClient:
+    """One pooled connection per parallel slot, at most `concurrency` requests in flight.
+
+    Timeouts and HTTP errors are retried max_retries times in all, waiting
+    retry_backoff * attempt seconds in between; the last failure is raised.
+    transport is for tests, which point the client at a stub server.
+    """
+
+    def __init__(self, model: str, base_url: str = OLLAMA_BASE_URL, concurrency: int = 4, timeout: float = 120.0,
+                 max_retries: int = 2, retry_backoff: float = 2.0,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.model = model
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max(1, max_retries)
+        self.retry_backoff = retry_backoff
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+            transport=transport,
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def post(self, path: str, body: Dict[str, Any]) -> Any:
+        """POST body as JSON and return the decoded JSON response."""
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                async with self._slots:
+                    response = await self._client.post(path, json=body)
+                    response.raise_for_status()
+                return response.json()
+            except (httpx.TimeoutException, httpx.HTTPStatusError) as e:
+                if attempt >= self.max_retries:
+                    raise
+                wait = self.retry_backoff * attempt
+                logger.warning("Ollama %s failed (%s), retry %d/%d in %.1fs",
+                               path, type(e).__name__, attempt, self.max_retries, wait)
+                await asyncio.sleep(wait)
@@ -0,0 +1,114 @@
+import gzip
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Any, Hashable, Iterable, Iterator, List, Optional
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+from src.services.columnar import COLUMNAR_MEDIA_TYPE, encode_columnar
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 9
+# Streamed NDJSON is written out in pieces of about this size rather than one write per record
+NDJSON_FLUSH_BYTES = 64 * 1024
+JSON_MEDIA_TYPE = "application/json"
+# Bump when the payload layout changes so clients holding an old ETag refetch
+PAYLOAD_FORMAT_VERSION = 1
+
+
+@dataclass(frozen=True)
+class EncodedPayload:
+    """A graph payload serialized once, with pre-compressed variants and a strong ETag."""
+    body: bytes
+    gzip: bytes
+    br: Optional[bytes]
+    etag: str
+    media_type: str = JSON_MEDIA_TYPE
+
+    def variant(self, encoding: str) -> bytes:
+        if encoding == "br" and self.br is not None:
+            return self.br
+        if encoding == "gzip":
+            return self.gzip
+        return self.body
+
+
+def make_etag(fingerprint: Any, key: Hashable) -> str:
+    digest = hashlib.sha256(repr((PAYLOAD_FORMAT_VERSION, fingerprint, key)).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def _dumps(data: Any) -> bytes:
+    # Same settings as Starlette's JSONResponse, so the bytes match what FastAPI would send
+    return json.dumps(data, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def encode_payload(data: Any, fingerprint: Any, key: Hashable, media_type: str = JSON_MEDIA_TYPE) -> EncodedPayload:
+    body = encode_columnar(data) if media_type == COLUMNAR_MEDIA_TYPE else _dumps(data)
+    return EncodedPayload(
+        body=body,
+        gzip=gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0),
+        br=brotli.compress(body, quality=BROTLI_QUALITY) if brotli is not None else None,
+        etag=make_etag(fingerprint, key if media_type == JSON_MEDIA_TYPE else (media_type, key)),
+        media_type=media_type,
+    )
+
+
+def ndjson_chunks(records: Iterable[Any], flush_bytes: int = NDJSON_FLUSH_BYTES) -> Iterator[bytes]:
+    """Serialize records one JSON document per line, yielding batches of lines as they fill up."""
+    lines: List[bytes] = []
+    size = 0
+    for record in records:
+        line = _dumps(record) + b"\n"
+        lines.append(line)
+        size += len(line)
+        if size >= flush_bytes:
+            yield b"".join(lines)
+            lines, size = [], 0
+    if lines:
+        yield b"".join(lines)
+
+
+def choose_media_type(accept: str) -> str:
+    """The binary column layout when a client lists it in Accept, JSON otherwise."""
+    for part in accept.split(","):
+        token, _, params = part.strip().partition(";")
+        if token.strip().lower() == COLUMNAR_MEDIA_TYPE and params.replace(" ", "") not in ("q=0", "q=0.0"):
+            return COLUMNAR_MEDIA_TYPE
+    return JSON_MEDIA_TYPE
+
+
+def choose_encoding(accept_encoding: str, payload: EncodedPayload) -> str:
+    """Pick the best stored variant for an Accept-Encoding header ("br", "gzip" or "identity")."""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token] = q
+    candidates: List[str] = ["br", "gzip"] if payload.br is not None else ["gzip"]
+    best, best_q = "identity", 0.0
+    for encoding in candidates:  # ordered by preference, so ties go to the smaller variant
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
@@ -0,0 +1,262 @@
+"""Triple-factor entity retrieval over an in-memory embedding matrix.
+
+Notebook 03 scored a query row by row: sqlite-vec distances for the top
+candidates, then per entity a SQL lookup of its sources' half-life and a
+Python loop combining the three factors. RetrievalIndex instead holds, for
+every embedded entity, its unit-length float32 embedding, its half-life and
+its max-normalized pagerank, loaded once per database version. A query is
+then one matrix-vector product for cosine similarity, vectorized temporal
+decay and weighting, and np.argpartition for the top k, so its cost is a
+single pass over the matrix.
+
+Scores match the notebook's formula:
+    final = semantic_weight * cosine + temporal_weight * 0.5 ** (age / half_life) + graph_weight * pagerank / max
+except that every entity is a candidate, not only the 2 * top_k nearest,
+and pagerank is normalized over all entities rather than those candidates.
+
+When an up-to-date ANN index of entity_embeddings exists (ann_index.py,
+built at ingest for tables of at least ANN_MIN_ROWS vectors), the index
+takes its memory-mapped vectors instead of reading the table, and a query
+scores only the ANN_CANDIDATES_PER_HIT * top_k nearest entities the IVF
+lists yield, as the notebook did with its 2 * top_k, plus the entities
+leading on temporal and graph score, which could outrank them without
+being near; exact=True, or a zero semantic weight, still scores every entity.
+
+Usage:
+    index = load_retrieval_index(db_path)
+    results = search(index, db_path, query_vector, top_k=10)
+"""
+
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; callers check RETRIEVAL_AVAILABLE
+    np = None
+
+from src.config import ANN_CANDIDATES_PER_HIT, ANN_NPROBE
+from src.services.ann_index import IVFIndex, connect_readonly, load_ann_index, read_embeddings
+from src.services.db import get_pool
+
+logger = logging.getLogger(__name__)
+
+RETRIEVAL_AVAILABLE = np is not None
+
+# Days until an entity's temporal relevance halves, by its sources' content_type; the longest wins
+HALF_LIVES = {
+    "news": 7,
+    "research_paper": 30,
+    "reference": 365,
+}
+DEFAULT_HALF_LIFE = HALF_LIVES["news"]
+# Ids per SELECT ... IN (...) when describing hits
+DESCRIBE_BATCH = 500
+
+
+@dataclass
+class RetrievalResult:
+    entity_id: int
+    name: str
+    entity_type: str
+    description: str
+    semantic_score: float
+    temporal_score: float
+    graph_score: float
+    final_score: float
+    community_id: Optional[int] = None
+    source_refs: List[str] = field(default_factory=list)
+
+
+@dataclass
+class RetrievalIndex:
+    """Per-entity arrays aligned by row: ids, unit embeddings (n, dim), half-lives and normalized pagerank.
+
+    With an ANN index, its rows are the index's rows and embeddings its memory-mapped vectors.
+    """
+    ids: "np.ndarray"
+    embeddings: "np.ndarray"
+    half_lives: "np.ndarray"
+    graph_scores: "np.ndarray"
+    fingerprint: Optional[tuple] = None
+    ann: Optional[IVFIndex] = None
+    # Per distinct half-life, its rows by descending graph score (built on the first ANN query)
+    _leaders: Optional[List["np.ndarray"]] = field(default=None, repr=False)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def dim(self) -> int:
+        return self.embeddings.shape[1]
+
+    @classmethod
+    def from_arrays(cls, ids, embeddings, half_lives, pageranks, normalized: bool = False) -> "RetrievalIndex":
+        """Normalize embeddings (in place when already float32, skipped if normalized) and pagerank into an index."""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if not normalized:
+            norms = np.sqrt(np.einsum("ij,ij->i", embeddings, embeddings))
+            norms[norms == 0] = 1.0
+            embeddings /= norms[:, None]
+        pageranks = np.asarray(pageranks, dtype=np.float32)
+        top = float(pageranks.max()) if len(pageranks) else 0.0
+        graph_scores = pageranks / top if top > 0 else np.zeros_like(pageranks)
+        return cls(np.asarray(ids, dtype=np.int64), embeddings, np.asarray(half_lives, dtype=np.float32), graph_scores)
+
+    def graph_leaders(self, top_k: int) -> "np.ndarray":
+        """Rows that include the top_k by temporal + graph score, whatever the age and weights.
+
+        Temporal decay only depends on the half-life, which takes a few
+        distinct values, so within each half-life the order is by graph score.
+        """
+        if self._leaders is None:
+            self._leaders = []
+            for half_life in np.unique(self.half_lives):
+                rows = np.flatnonzero(self.half_lives == half_life)
+                self._leaders.append(rows[np.argsort(-self.graph_scores[rows], kind="stable")])
+        return np.concatenate([rows[:top_k] for rows in self._leaders] or [np.empty(0, dtype=np.int64)])
+
+    def top_k(self, query_vector: Sequence[float], top_k: int = 10, semantic_weight: float = 0.6,
+              temporal_weight: float = 0.2, graph_weight: float = 0.2, content_age_days: float = 0.0,
+              exact: bool = False, nprobe: int = ANN_NPROBE):
+        """(rows, semantic, temporal, final) arrays of the top_k rows by final score, best first.
+
+        With an ANN index (and exact False, semantic_weight positive) only the
+        nearest candidates from its nprobe closest lists are scored, along with
+        the graph_leaders, which may outscore them on the other two factors.
+        """
+        query = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+        if len(self) == 0:
+            empty = np.empty(0, dtype=np.float32)
+            return np.empty(0, dtype=np.int64), empty, empty, empty
+        if query.shape[0] != self.dim:
+            raise ValueError(f"query has {query.shape[0]} dimensions, the index {self.dim}")
+        norm = float(np.sqrt(query.dot(query)))
+        query = query / norm if norm > 0 else query
+        if self.ann is not None and not exact and semantic_weight > 0:
+            nearest, _ = self.ann.search(query, max(top_k, 1) * ANN_CANDIDATES_PER_HIT, nprobe)
+            candidates = np.unique(np.concatenate([nearest, self.graph_leaders(top_k)]))
+            semantic = self.embeddings[candidates] @ query
+            half_lives, graph_scores = self.half_lives[candidates], self.graph_scores[candidates]
+        else:
+            candidates = None
+            semantic = self.embeddings @ query
+            half_lives, graph_scores = self.half_lives, self.graph_scores
+        if content_age_days:
+            temporal = np.power(np.float32(0.5), np.float32(content_age_days) / half_lives)
+        else:
+            temporal = np.ones(len(semantic), dtype=np.float32)
+        final = semantic * np.float32(semantic_weight)
+        final += temporal * np.float32(temporal_weight)
+        final += graph_scores * np.float32(graph_weight)
+
+        k = min(max(top_k, 0), len(final))
+        if k == 0:
+            picks = np.empty(0, dtype=np.int64)
+        elif k < len(final):
+            picks = np.argpartition(-final, k - 1)[:k]
+        else:
+            picks = np.arange(len(final))
+        picks = picks[np.argsort(-final[picks], kind="stable")]
+        rows = picks if candidates is None else candidates[picks]
+        return rows, semantic[picks], temporal[picks], final[picks]
+
+
+def entity_half_life(source_refs_json: Optional[str], content_types: Dict[str, str]) -> float:
+    """Longest half-life among an entity's sources (notebook 03's get_half_life_for_entity)."""
+    try:
+        source_ids = json.loads(source_refs_json) if source_refs_json else []
+    except (json.JSONDecodeError, TypeError):
+        return DEFAULT_HALF_LIFE
+    half_life = DEFAULT_HALF_LIFE
+    for source_id in source_ids or ():
+        half_life = max(half_life, HALF_LIVES.get(content_types.get(source_id), DEFAULT_HALF_LIFE))
+    return half_life
+
+
+def load_retrieval_index(db_path: str, use_ann: bool = True) -> RetrievalIndex:
+    """Read every embedded entity's vector, half-life and pagerank into a RetrievalIndex.
+
+    The embeddings come from the entity ANN index when one matches the
+    table's current vectors (memory-mapped), else from entity_embeddings as
+    float32 blobs; sqlite-vec is loaded when installed, which reading the
+    vec0 table needs. Raises RuntimeError without numpy and
+    sqlite3.OperationalError when the table is missing (notebook 03 hasn't run).
+    """
+    if not RETRIEVAL_AVAILABLE:
+        raise RuntimeError("retrieval needs numpy")
+    conn = connect_readonly(db_path)
+    try:
+        content_types = dict(conn.execute("SELECT source_id, content_type FROM sources"))
+        metrics = {entity_id: (pagerank or 0.0, source_refs)
+                   for entity_id, pagerank, source_refs in conn.execute("SELECT id, pagerank, source_refs FROM entities")}
+        ann = load_ann_index(db_path, "entity_embeddings", conn) if use_ann else None
+        if ann is not None and not all(entity_id in metrics for entity_id in ann.ids.tolist()):
+            logger.info("ANN index lists entities that are gone; searching entity_embeddings exactly")
+            ann = None
+        if ann is not None:
+            ids, embeddings = ann.ids.tolist(), ann.vectors
+        else:
+            ids, embeddings = read_embeddings(conn, "entity_embeddings", "entity_id", keep=metrics)
+    finally:
+        conn.close()
+
+    # Entities share a few distinct source lists, so each is parsed once
+    half_life_memo: Dict[Optional[str], float] = {}
+    half_lives = np.empty(len(ids), dtype=np.float32)
+    pageranks = np.empty(len(ids), dtype=np.float32)
+    for row, entity_id in enumerate(ids):
+        pagerank, source_refs = metrics[entity_id]
+        pageranks[row] = pagerank
+        if source_refs not in half_life_memo:
+            half_life_memo[source_refs] = entity_half_life(source_refs, content_types)
+        half_lives[row] = half_life_memo[source_refs]
+    index = RetrievalIndex.from_arrays(ids, embeddings, half_lives, pageranks, normalized=ann is not None)
+    index.ann = ann
+    if ann is not None:
+        index.graph_leaders(0)  # sorted now rather than on the first query
+    return index
+
+
+def describe(index: RetrievalIndex, db_path: str, hits) -> List[RetrievalResult]:
+    """RetrievalResults for top_k()'s output, with the entities' names and details read from the DB."""
+    rows, semantic, temporal, final = hits
+    entity_ids = [int(entity_id) for entity_id in index.ids[rows]]
+    details = {}
+    with get_pool(db_path).connection() as conn:
+        for start in range(0, len(entity_ids), DESCRIBE_BATCH):
+            batch = entity_ids[start:start + DESCRIBE_BATCH]
+            for row in conn.execute(
+                f"SELECT id, name, type, description, community_id, source_refs FROM entities "
+                f"WHERE id IN ({','.join('?' * len(batch))})", batch):
+                details[row[0]] = row[1:]
+    results = []
+    for i, entity_id in enumerate(entity_ids):
+        name, entity_type, description, community_id, source_refs = details.get(entity_id, ("", "", "", None, None))
+        try:
+            refs = json.loads(source_refs) if source_refs else []
+        except (json.JSONDecodeError, TypeError):
+            refs = []
+        results.append(RetrievalResult(
+            entity_id=entity_id,
+            name=name,
+            entity_type=entity_type,
+            description=description or "",
+            semantic_score=float(semantic[i]),
+            temporal_score=float(temporal[i]),
+            graph_score=float(index.graph_scores[rows[i]]),
+            final_score=float(final[i]),
+            community_id=community_id,
+            source_refs=refs,
+        ))
+    return results
+
+
+def search(index: RetrievalIndex, db_path: str, query_vector: Sequence[float], top_k: int = 10,
+           semantic_weight: float = 0.6, temporal_weight: float = 0.2, graph_weight: float = 0.2,
+           content_age_days: float = 0.0, exact: bool = False) -> List[RetrievalResult]:
+    """Top entities for an embedded query, best first (notebook 03's triple_factor_search)."""
+    hits = index.top_k(query_vector, top_k, semantic_weight, temporal_weight, graph_weight, content_age_days, exact)
+    return describe(index, db_path, hits)
@@ -0,0 +1,254 @@
+"""Precomputed visualization tables, written once per ingest instead of derived per cold request.
+
+For each include_orphans variant the pipeline stores the visible member count,
+top members and pagerank sum of every community (viz_community_stats) and the
+per community pair relationship aggregates (viz_inter_community_edges), and,
+when numpy is installed, the unit-sphere layout positions of every community
+and entity (viz_community_positions, viz_entity_positions) that the 3D
+client gets as fx/fy/fz hints. With
+those and community_summaries the /overview payload is built without loading
+the graph. Triggers on entities and relationships flag the tables stale when
+the graph is edited afterwards, and readers then fall back to live computation.
+
+The command line first migrates the database (migrate_graph_db: loader
+indexes, chunk content hashes), so the read-only web service never has to.
+
+Usage:
+    python -m src.services.viz_materialize                  # config DB_PATH
+    python -m src.services.viz_materialize --db path/to/graphrag.db
+"""
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+from typing import Dict, Optional
+from urllib.parse import quote
+
+from src.config import DB_PATH
+from src.services.db import get_pool, migrate_graph_db
+from src.services.graph_service import (
+    VizContext,
+    VizOverview,
+    bucket_community_links,
+    build_viz_context,
+    gc_paused,
+    load_community_summaries,
+    summarize_communities,
+)
+from src.services.graph_store import load_graph_store
+
+logger = logging.getLogger(__name__)
+
+# Bump when the tables' layout or meaning changes; older tables then count as missing
+VIZ_FORMAT_VERSION = 2
+
+VIZ_SCHEMA = """
+CREATE TABLE IF NOT EXISTS viz_materialized (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    format_version INTEGER NOT NULL,
+    stale INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+DROP TABLE IF EXISTS viz_community_stats;
+CREATE TABLE viz_community_stats (
+    include_orphans INTEGER NOT NULL,
+    community_id INTEGER NOT NULL,
+    member_count INTEGER NOT NULL,
+    top_members TEXT NOT NULL,
+    pagerank_sum REAL NOT NULL,
+    PRIMARY KEY (include_orphans, community_id)
+);
+DROP TABLE IF EXISTS viz_inter_community_edges;
+CREATE TABLE viz_inter_community_edges (
+    include_orphans INTEGER NOT NULL,
+    source_community INTEGER NOT NULL,
+    target_community INTEGER NOT NULL,
+    edge_count INTEGER NOT NULL,
+    first_edge INTEGER NOT NULL,
+    descriptions TEXT NOT NULL,
+    PRIMARY KEY (include_orphans, source_community, target_community)
+);
+DROP TABLE IF EXISTS viz_community_positions;
+CREATE TABLE viz_community_positions (
+    include_orphans INTEGER NOT NULL,
+    community_id INTEGER NOT NULL,
+    x REAL NOT NULL,
+    y REAL NOT NULL,
+    z REAL NOT NULL,
+    PRIMARY KEY (include_orphans, community_id)
+);
+DROP TABLE IF EXISTS viz_entity_positions;
+CREATE TABLE viz_entity_positions (
+    include_orphans INTEGER NOT NULL,
+    entity_name TEXT NOT NULL,
+    x REAL NOT NULL,
+    y REAL NOT NULL,
+    z REAL NOT NULL,
+    PRIMARY KEY (include_orphans, entity_name)
+);
+"""
+
+# Any write to the tables the viz tables are derived from marks them stale
+_STALE_TRIGGERS = [
+    (f"viz_stale_{table}_{event.lower()}", table, event)
+    for table in ("entities", "relationships")
+    for event in ("INSERT", "UPDATE", "DELETE")
+]
+
+
+def materialize_viz(db_path: str) -> Dict[str, int]:
+    """Recompute the viz tables from the graph in db_path, replacing any earlier ones.
+
+    Returns the number of rows written per table.
+    """
+    conn = sqlite3.connect(f"file:{quote(os.path.abspath(db_path))}?mode=rw", uri=True, timeout=30.0)
+    try:
+        store = load_graph_store(conn.cursor())
+        stats_rows, edge_rows, position_rows, entity_position_rows = [], [], [], []
+        for include_orphans in (False, True):
+            with gc_paused():
+                ctx = build_viz_context(store, {}, {}, [], {}, include_orphans=include_orphans, layout_hints=True)
+            for comm_id, count in ctx.viz_community_counts.items():
+                top_members, pr_sum = ctx.community_top_members(comm_id)
+                stats_rows.append((include_orphans, comm_id, count, json.dumps(top_members), pr_sum))
+            for (src_comm, tgt_comm), link in ctx.community_links.items():
+                edge_rows.append((include_orphans, src_comm, tgt_comm, link["count"], link["first_edge"],
+                                  json.dumps(link["descriptions"])))
+            for comm_id, (x, y, z) in (ctx.community_positions() or {}).items():
+                position_rows.append((include_orphans, comm_id, x, y, z))
+                for i, (x, y, z) in zip(ctx.community_members[comm_id], ctx.member_positions(comm_id)):
+                    entity_position_rows.append((include_orphans, store.names[i], x, y, z))
+        with conn:
+            conn.executescript(f"BEGIN; {VIZ_SCHEMA}")
+            conn.executemany("INSERT INTO viz_community_stats VALUES (?, ?, ?, ?, ?)", stats_rows)
+            conn.executemany("INSERT INTO viz_inter_community_edges VALUES (?, ?, ?, ?, ?, ?)", edge_rows)
+            conn.executemany("INSERT INTO viz_community_positions VALUES (?, ?, ?, ?, ?)", position_rows)
+            conn.executemany("INSERT OR REPLACE INTO viz_entity_positions VALUES (?, ?, ?, ?, ?)", entity_position_rows)
+            for name, table, event in _STALE_TRIGGERS:
+                conn.execute(f"""CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} ON {table}
+                    BEGIN UPDATE viz_materialized SET stale = 1; END""")
+            conn.execute("""INSERT INTO viz_materialized (id, format_version, stale) VALUES (1, ?, 0)
+                ON CONFLICT(id) DO UPDATE SET format_version = excluded.format_version, stale = 0,
+                created_at = CURRENT_TIMESTAMP""", (VIZ_FORMAT_VERSION,))
+    finally:
+        conn.close()
+    return {"viz_community_stats": len(stats_rows), "viz_inter_community_edges": len(edge_rows),
+            "viz_community_positions": len(position_rows), "viz_entity_positions": len(entity_position_rows)}
+
+
+def viz_tables_fresh(cursor) -> bool:
+    """Whether materialized tables of the current format exist and no graph write has happened since."""
+    try:
+        row = cursor.execute("SELECT format_version, stale FROM viz_materialized WHERE id = 1").fetchone()
+    except sqlite3.OperationalError:
+        return False
+    if row is None or row[0] != VIZ_FORMAT_VERSION or row[1]:
+        return False
+    # Recreating entities or relationships drops their triggers, and then nothing would mark us stale
+    names = [name for name, _, _ in _STALE_TRIGGERS]
+    found = cursor.execute(
+        f"SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name IN ({', '.join('?' * len(names))})", names
+    ).fetchone()[0]
+    return found == len(names)
+
+
+def load_viz_overview(db_path: str, include_orphans: bool, min_community_size: int,
+                      layout_hints: bool = False) -> Optional[VizOverview]:
+    """The overview inputs for the whole graph from the viz tables, or None if they are missing or stale.
+
+    layout_hints also reads the community positions, if the tables were written with numpy available.
+    """
+    if not os.path.exists(db_path):
+        return None
+    try:
+        with get_pool(db_path).connection() as conn:
+            cursor = conn.cursor()
+            if not viz_tables_fresh(cursor):
+                return None
+            community_summaries = load_community_summaries(cursor)
+            counts, top_members = {}, {}
+            for comm_id, count, members, pr_sum in cursor.execute(
+                    "SELECT community_id, member_count, top_members, pagerank_sum FROM viz_community_stats "
+                    "WHERE include_orphans = ? ORDER BY rowid", (include_orphans,)):
+                counts[comm_id] = count
+                top_members[comm_id] = (json.loads(members), pr_sum)
+            links = {}
+            for src_comm, tgt_comm, count, first_edge, descriptions in cursor.execute(
+                    "SELECT source_community, target_community, edge_count, first_edge, descriptions "
+                    "FROM viz_inter_community_edges WHERE include_orphans = ?", (include_orphans,)):
+                links[(src_comm, tgt_comm)] = {"count": count, "first_edge": first_edge,
+                                               "descriptions": [tuple(d) for d in json.loads(descriptions)]}
+            positions = None
+            if layout_hints:
+                positions = {comm_id: (x, y, z) for comm_id, x, y, z in cursor.execute(
+                    "SELECT community_id, x, y, z FROM viz_community_positions WHERE include_orphans = ?",
+                    (include_orphans,))} or None
+    except sqlite3.Error as e:
+        logger.warning("Could not read viz tables from %s: %s", db_path, e)
+        return None
+
+    cyto_community_summaries, other_community_count, other_node_count, comm_count_bounds = summarize_communities(
+        community_summaries, counts, min_community_size)
+    return VizOverview(
+        cyto_community_summaries=cyto_community_summaries,
+        viz_community_counts=counts,
+        other_community_count=other_community_count,
+        other_node_count=other_node_count,
+        comm_count_bounds=comm_count_bounds,
+        inter_comm_edges=bucket_community_links(links, cyto_community_summaries),
+        top_members=top_members,
+        positions=positions,
+    )
+
+
+def load_viz_positions(ctx: VizContext, db_path: str, include_orphans: bool) -> bool:
+    """Fill a whole-graph context's layout caches from the viz tables instead of computing the layouts.
+
+    Communities whose members don't all have a stored position (the graph
+    changed since) are left to be laid out on demand. Returns whether the
+    community positions were loaded.
+    """
+    if not ctx.layout_hints or not os.path.exists(db_path):
+        return False
+    try:
+        with get_pool(db_path).connection() as conn:
+            cursor = conn.cursor()
+            if not viz_tables_fresh(cursor):
+                return False
+            meta = {comm_id: (x, y, z) for comm_id, x, y, z in cursor.execute(
+                "SELECT community_id, x, y, z FROM viz_community_positions WHERE include_orphans = ?",
+                (include_orphans,))}
+            if not meta or any(comm_id not in meta for comm_id in ctx.viz_community_counts):
+                return False
+            by_name = {name: (x, y, z) for name, x, y, z in cursor.execute(
+                "SELECT entity_name, x, y, z FROM viz_entity_positions WHERE include_orphans = ?",
+                (include_orphans,))}
+    except sqlite3.Error as e:
+        logger.warning("Could not read viz positions from %s: %s", db_path, e)
+        return False
+
+    ctx.meta_positions = meta
+    names = ctx.store.names
+    for comm_id, members in ctx.community_members.items():
+        positions = [by_name.get(names[i]) for i in members]
+        if None not in positions:
+            ctx.entity_positions[comm_id] = positions
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write the precomputed visualization tables into graphrag.db")
+    parser.add_argument("--db", default=DB_PATH, help="path to graphrag.db")
+    args = parser.parse_args()
+    if not os.path.exists(args.db):
+        parser.error(f"{args.db} not found")
+    for step in migrate_graph_db(args.db, timeout=30.0):
+        print(f"migrated: {step}")
+    for table, rows in materialize_viz(args.db).items():
+        print(f"{table}: {rows} rows")
+
+
+if __name__ == "__main__":
+    main()
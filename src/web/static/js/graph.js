@@ -9,6 +9,15 @@
   var Graph; // 3d-force-graph instance
   var expandedCommunities = new Set();
   var graphData = null;
+  var graphQuery = ''; // filter params shared by the overview and lazy community/chunk fetches
+  var pendingCommunities = {}; // commId -> in-flight fetch promise
+  var chunkTextCache = {}; // content hash -> chunk text, shared by every entity citing that text
+  const GRAPH_SYNC_INTERVAL_MS = 60000; // how often an open page checks /delta for a new ingest
+  const CHUNK_BATCH_SIZE = 200; // MAX_CHUNK_IDS in src/api/graph.py
+  const COMMUNITY_PAGE_SIZE = 300; // entities per /community page; the rest wait behind an "N more" node
+  const COLUMNAR_TYPE = 'application/vnd.graphrag.columnar'; // COLUMNAR_MEDIA_TYPE in src/services/columnar.py
+  const SPHERE_RADIUS = 300; // globe the nodes are constrained to
+  const HINTED_COOLDOWN_TICKS = 100; // engine ticks per data change once the server has placed the nodes
 
   var currentNodes = [];
   var currentLinks = [];
@@ -50,10 +59,20 @@
   function processMetaNodes(elements) {
     return elements.filter(el => !el.data.source).map(el => {
       // 3d-force-graph needs id at the root of the object
-      return Object.assign({ id: el.data.id }, el.data);
+      return applyLayoutHint(Object.assign({ id: el.data.id }, el.data));
     });
   }
 
+  // fx/fy/fz from the server (GRAPH_LAYOUT_HINTS in src/config.py) are unit-sphere coordinates.
+  // Pinned there, the simulation only has client-side nodes like chunks left to place.
+  function applyLayoutHint(node) {
+    if (node.fx == null) return node;
+    node.x = node.fx *= SPHERE_RADIUS;
+    node.y = node.fy *= SPHERE_RADIUS;
+    node.z = node.fz *= SPHERE_RADIUS;
+    return node;
+  }
+
   function processMetaLinks(elements) {
     return elements.filter(el => el.data.source).map(el => {
       return Object.assign({ source: el.data.source, target: el.data.target }, el.data);
@@ -74,21 +93,24 @@
     });
 
     Object.keys(graphData.communityData).forEach(function (commId) {
-      var comm = graphData.communityData[commId];
-      // When a community is expanded, its internal entities are part of the "active" group
-      if (comm.entities) {
-        comm.entities.forEach(function (ent) {
-          if (ent.data) ent.data.color = COLOR_ACTIVE;
-        });
-      }
-      if (comm.semantic_groups) {
-        comm.semantic_groups.forEach(function (sg) {
-          if (sg.data) sg.data._sgColor = COLOR_ACTIVE;
-        });
-      }
+      remapCommunityColors(graphData.communityData[commId]);
     });
   }
 
+  function remapCommunityColors(comm) {
+    // When a community is expanded, its internal entities are part of the "active" group
+    if (comm.entities) {
+      comm.entities.forEach(function (ent) {
+        if (ent.data) ent.data.color = COLOR_ACTIVE;
+      });
+    }
+    if (comm.semantic_groups) {
+      comm.semantic_groups.forEach(function (sg) {
+        if (sg.data) sg.data._sgColor = COLOR_ACTIVE;
+      });
+    }
+  }
+
   function updateNeighbors() {
     linksByNode = {};
     currentLinks.forEach(link => {
@@ -130,6 +152,10 @@
     }
 
     loadData();
+    setInterval(syncGraphData, GRAPH_SYNC_INTERVAL_MS);
+    document.addEventListener('visibilitychange', function () {
+      if (document.visibilityState === 'visible') syncGraphData();
+    });
   });
 
   window.toggleFilter = function (btnId) {
@@ -147,20 +173,88 @@
     loadData();
   };
 
+  // ── Wire Format ──────────────────────────────────────────────
+  // Overview and community payloads are requested as typed column arrays; errors still arrive as JSON
+  function fetchGraphPayload(url) {
+    return fetch(url, { headers: { Accept: COLUMNAR_TYPE + ', application/json;q=0.9' } });
+  }
+
+  function readGraphPayload(r) {
+    if ((r.headers.get('Content-Type') || '').indexOf(COLUMNAR_TYPE) === 0) {
+      return r.arrayBuffer().then(decodeColumnar);
+    }
+    return r.json();
+  }
+
+  // Inverse of encode_columnar: a JSON header whose {"$elements": ...} tables point into
+  // little-endian buffers that follow it, aligned so typed arrays can view them without copying.
+  // String columns index the header's shared string table
+  function decodeColumnar(buffer) {
+    var view = new DataView(buffer);
+    var magic = String.fromCharCode(view.getUint8(0), view.getUint8(1), view.getUint8(2), view.getUint8(3));
+    if (magic !== 'GRC1') throw new Error('Unexpected graph payload format');
+    var headerLen = view.getUint32(4, true);
+    var header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 8, headerLen)));
+    var base = Math.ceil((8 + headerLen) / 4) * 4;
+    var strings = header.strings;
+
+    function column(spec, n) {
+      var i, out;
+      switch (spec.type) {
+        case 'json': return spec.values;
+        case 'i32': return new Int32Array(buffer, base + spec.offset, n);
+        case 'str':
+          var index = new Uint32Array(buffer, base + spec.offset, n);
+          out = new Array(n);
+          for (i = 0; i < n; i++) out[i] = strings[index[i]];
+          return out;
+        case 'f32':
+          var floats = new Float32Array(buffer, base + spec.offset, n);
+          out = new Array(n);
+          for (i = 0; i < n; i++) out[i] = isNaN(floats[i]) ? null : floats[i];
+          return out;
+      }
+      throw new Error('Unknown column type ' + spec.type);
+    }
+
+    function restore(value) {
+      if (Array.isArray(value)) return value.map(restore);
+      if (value === null || typeof value !== 'object') return value;
+      var tables = value.$elements;
+      if (tables && Object.keys(value).length === 1) {
+        var elements = [];
+        tables.forEach(function (table) {
+          var cols = table.columns.map(function (c) { return column(c[1], table.n); });
+          var names = table.columns.map(function (c) { return c[0]; });
+          for (var i = 0; i < table.n; i++) {
+            // Keys are added in the same order for every row, so rows of a table share a hidden class
+            var row = {};
+            for (var k = 0; k < names.length; k++) row[names[k]] = cols[k][i];
+            elements.push({ data: row });
+          }
+        });
+        return elements;
+      }
+      var obj = {};
+      Object.keys(value).forEach(function (key) { obj[key] = restore(value[key]); });
+      return obj;
+    }
+
+    return restore(header.data);
+  }
+
   function loadData() {
     const incOrphans = document.getElementById('btn-toggle-orphans')?.classList.contains('active') ? 'true' : 'false';
     const minSize = document.getElementById('btn-toggle-tiny')?.classList.contains('active') ? '1' : '2';
-    fetch(`/api/graph/data?include_orphans=${incOrphans}&min_community_size=${minSize}`)
-      .then(function (r) { return r.json(); })
+    graphQuery = `include_orphans=${incOrphans}&min_community_size=${minSize}`;
+    pendingCommunities = {};
+    // Level 0 only: community entities and chunk text are fetched lazily on expand/click
+    fetchGraphPayload(`/api/graph/overview?${graphQuery}`)
+      .then(readGraphPayload)
       .then(function (data) {
-        graphData = data;
-        remapColors();
-
-        currentNodes = processMetaNodes(graphData.metaElements);
-        currentLinks = processMetaLinks(graphData.metaElements);
-
+        if (data.error) throw new Error(data.error);
+        applyOverview(data);
         initGraph();
-        buildLegend();
       })
       .catch(function (err) {
         document.getElementById('cy').innerHTML =
@@ -170,6 +264,91 @@
       });
   }
 
+  function applyOverview(data) {
+    graphData = {
+      version: data.version,
+      metaElements: data.metaElements,
+      commSummaries: data.commSummaries,
+      communityData: {},
+      semanticGroups: {}
+    };
+    expandedCommunities.clear();
+    remapColors();
+
+    currentNodes = processMetaNodes(graphData.metaElements);
+    currentLinks = processMetaLinks(graphData.metaElements);
+    buildLegend();
+  }
+
+  // ── Incremental Refresh ──────────────────────────────────────
+  // After an ingest only the changed parts are fetched and patched in, keeping layout and expansions
+  function syncGraphData() {
+    if (!Graph || !graphData || !graphData.version) return;
+    var requested = graphData;
+    fetch(`/api/graph/delta?since=${encodeURIComponent(graphData.version)}&${graphQuery}`)
+      .then(function (r) { return r.ok ? r.json() : null; })
+      .then(function (delta) {
+        if (!delta || delta.error || requested !== graphData || delta.version === graphData.version) return;
+        if (delta.full) {
+          clearChunks();
+          applyOverview(delta);
+          refreshGraphData();
+          updateLevelIndicator();
+          return;
+        }
+        applyGraphDelta(delta);
+      })
+      .catch(function (err) { console.error(err); });
+  }
+
+  function applyGraphDelta(delta) {
+    var meta = delta.metaElements;
+    var upserts = meta.changed.concat(meta.added);
+    var replaced = new Set(meta.removed.concat(upserts.map(function (el) { return el.data.id; })));
+    graphData.metaElements = graphData.metaElements
+      .filter(function (el) { return !replaced.has(el.data.id); })
+      .concat(upserts);
+    Object.assign(graphData.commSummaries, delta.commSummaries.changed);
+    delta.commSummaries.removed.forEach(function (commId) { delete graphData.commSummaries[commId]; });
+    graphData.version = delta.version;
+
+    // Drop stale community payloads; expanded ones are collapsed now and refetched below
+    var stale = new Set(delta.communities.changed.concat(delta.communities.removed));
+    var reexpand = [];
+    stale.forEach(function (commId) {
+      delete graphData.communityData[commId];
+      if (expandedCommunities.has(commId)) {
+        expandedCommunities.delete(commId);
+        if (delta.communities.changed.indexOf(commId) >= 0) reexpand.push(commId);
+      }
+    });
+    if (stale.size) {
+      clearChunks();
+      currentNodes = currentNodes.filter(function (n) { return !stale.has(n.parentComm); });
+      currentLinks = currentLinks.filter(function (l) { return !stale.has(l.parentComm); });
+    }
+
+    // Patch meta nodes in place so the force layout keeps their positions
+    remapColors();
+    var removed = new Set(meta.removed);
+    var byId = {};
+    currentNodes = currentNodes.filter(function (n) { return !removed.has(n.id); });
+    currentNodes.forEach(function (n) { byId[n.id] = n; });
+    processMetaNodes(upserts).forEach(function (n) {
+      if (byId[n.id]) Object.assign(byId[n.id], n);
+      else currentNodes.push(n);
+    });
+    currentLinks = currentLinks
+      .filter(function (l) { return !replaced.has(l.id); })
+      .concat(processMetaLinks(upserts));
+
+    refreshGraphData();
+    updateHighlight();
+    updateLevelIndicator();
+    buildLegend();
+    reexpand.forEach(expandCommunity);
+  }
+
   // ── WebGL Graph Init ─────────────────────────────────────────
   function initGraph() {
     var container = document.getElementById('cy');
@@ -280,13 +459,12 @@
 
     levelIndicator.textContent = 'Level 0 — ' + currentNodes.length + ' communities loaded';
 
-    // Spherical layout variables
-    const SPHERE_RADIUS = 300;
-
     // Force layout constraints
     Graph.d3Force('charge').strength(-120);
     // Disable center force to prevent conflicts with our hard spherical constraints around 0,0,0
     Graph.d3Force('center', null);
+    // With server-placed nodes there is nothing to settle beyond the few unpinned ones
+    if (currentNodes.some(n => n.fx != null)) Graph.cooldownTicks(HINTED_COOLDOWN_TICKS);
 
     // Add Central Sphere Mapping (Premium Glass + Wireframe)
     const sphereGeometry = new THREE.SphereGeometry(SPHERE_RADIUS, 32, 32);
@@ -368,6 +546,11 @@
       return;
     }
 
+    if (d.type === 'MORE') {
+      loadMorePage(d);
+      return;
+    }
+
     if (d.type === 'COMMUNITY') {
       var commId = d.community;
       if (commId === -1) return;
@@ -407,12 +590,96 @@
     }
   }
 
+  function fetchCommunity(commId) {
+    if (graphData.communityData[commId]) return Promise.resolve(graphData.communityData[commId]);
+    if (pendingCommunities[commId]) return pendingCommunities[commId];
+
+    var requested = graphData;
+    pendingCommunities[commId] = fetchGraphPayload(communityPageUrl(commId, 0))
+      .then(function (r) {
+        if (!r.ok) throw new Error('Community ' + commId + ' unavailable (' + r.status + ')');
+        return readGraphPayload(r);
+      })
+      .then(function (data) {
+        if (requested !== graphData) return null; // filters changed while in flight
+        remapCommunityColors(data);
+        graphData.communityData[commId] = data;
+        Object.assign(graphData.semanticGroups, data.semanticGroups || {});
+        return data;
+      })
+      .finally(function () {
+        delete pendingCommunities[commId];
+      });
+    return pendingCommunities[commId];
+  }
+
+  function communityPageUrl(commId, offset) {
+    return `/api/graph/community/${commId}?${graphQuery}&max_entities=${COMMUNITY_PAGE_SIZE}&offset=${offset}`;
+  }
+
+  // Replaces an "N more" placeholder with the next page of its community
+  function loadMorePage(node) {
+    var commId = node.community;
+    var comm = graphData.communityData[commId];
+    if (!comm || pendingCommunities[node.id]) return;
+    var requested = graphData;
+    pendingCommunities[node.id] = fetchGraphPayload(communityPageUrl(commId, node.next_offset))
+      .then(function (r) {
+        if (!r.ok) throw new Error('Community ' + commId + ' unavailable (' + r.status + ')');
+        return readGraphPayload(r);
+      })
+      .then(function (page) {
+        if (requested !== graphData || graphData.communityData[commId] !== comm) return;
+        remapCommunityColors(page);
+        comm.entities = comm.entities.concat(page.entities);
+        comm.edges = comm.edges.concat(page.edges);
+        comm.semantic_groups = comm.semantic_groups.concat(page.semantic_groups);
+        comm.more = page.more;
+        Object.assign(graphData.semanticGroups, page.semanticGroups || {});
+        if (!expandedCommunities.has(commId)) return;
+        currentNodes = currentNodes.filter(n => n.id !== node.id);
+        currentLinks = currentLinks.filter(l => (l.source.id || l.source) !== node.id);
+        addCommunityNodes(commId, page);
+        refreshGraphData();
+        updateHighlight();
+      })
+      .catch(function (err) { console.error(err); })
+      .finally(function () {
+        delete pendingCommunities[node.id];
+      });
+  }
+
   function expandCommunity(commId) {
     if (expandedCommunities.has(commId)) return;
-    var data = graphData.communityData[commId];
-    if (!data) return;
+    if (!graphData.communityData[commId]) {
+      fetchCommunity(commId)
+        .then(function (data) {
+          if (data) {
+            expandCommunity(commId);
+            showCommunitySummary(commId);
+          }
+        })
+        .catch(function (err) { console.error(err); });
+      return;
+    }
+    addCommunityNodes(commId, graphData.communityData[commId]);
+
+    expandedCommunities.add(commId);
+
+    // Traffic Light: Active community becomes GREEN
+    var rootNode = currentNodes.find(n => n.id === 'comm-' + commId);
+    if (rootNode) {
+      rootNode.color = COLOR_ACTIVE;
+    }
+
+    refreshGraphData();
+    updateHighlight(); // Force color property re-evaluation on globe
+    updateLevelIndicator();
+    buildLegend();
+  }
 
-    var newNodes = processMetaNodes([].concat(data.entities, data.semantic_groups));
+  function addCommunityNodes(commId, data) {
+    var newNodes = processMetaNodes([].concat(data.entities, data.semantic_groups, data.more || []));
     var newLinks = processMetaLinks(data.edges);
 
     newNodes.forEach(n => n.parentComm = commId);
@@ -433,19 +700,6 @@
     // Push mutates arrays directly avoiding GC reallocation spikes
     currentNodes.push(...newNodes);
     currentLinks.push(...newLinks);
-
-    expandedCommunities.add(commId);
-
-    // Traffic Light: Active community becomes GREEN
-    var rootNode = currentNodes.find(n => n.id === 'comm-' + commId);
-    if (rootNode) {
-      rootNode.color = COLOR_ACTIVE;
-    }
-
-    refreshGraphData();
-    updateHighlight(); // Force color property re-evaluation on globe
-    updateLevelIndicator();
-    buildLegend();
   }
 
   function collapseCommunity(commId) {
@@ -487,16 +741,39 @@
     refreshGraphData();
   }
 
+  // Fetches the bodies of chunk refs whose content hash isn't cached yet, in /chunks-sized batches
+  function loadChunkTexts(refs) {
+    var missing = [];
+    refs.forEach(function (ref) {
+      if (!(ref.hash in chunkTextCache) && missing.indexOf(ref.index) < 0) missing.push(ref.index);
+    });
+    var batches = [];
+    for (var i = 0; i < missing.length; i += CHUNK_BATCH_SIZE) {
+      batches.push(fetch('/api/graph/chunks?ids=' + missing.slice(i, i + CHUNK_BATCH_SIZE).join(','))
+        .then(function (r) { return r.ok ? r.json() : { texts: {} }; })
+        .then(function (data) { Object.assign(chunkTextCache, data.texts || {}); }));
+    }
+    return Promise.all(batches);
+  }
+
   function showChunks(entityNode) {
     clearChunks();
     var entityId = entityNode.id;
-    var refs = graphData.chunkRefs[entityId];
-    if (!refs || refs.length === 0) return;
-
-    var chunks = refs.map(function (r) {
-      return { index: r.index, source_id: r.source_id, text: graphData.chunkTexts[r.text_idx] };
-    });
+    fetch(`/api/graph/entity/${encodeURIComponent(entityId)}/chunks?${graphQuery}`)
+      .then(function (r) { return r.ok ? r.json() : { chunks: [] }; })
+      .then(function (data) {
+        var refs = data.chunks || [];
+        if (refs.length === 0) return;
+        return loadChunkTexts(refs).then(function () {
+          renderChunks(entityId, refs.map(function (ref) {
+            return { index: ref.index, source_id: ref.source_id, text: chunkTextCache[ref.hash] || '' };
+          }));
+        });
+      })
+      .catch(function (err) { console.error(err); });
+  }
 
+  function renderChunks(entityId, chunks) {
     var addedNodes = [];
     var addedLinks = [];
 
@@ -607,8 +884,9 @@
     var color = expanded ? COLOR_ACTIVE : COLOR_INACTIVE;
     var s = graphData.commSummaries[commId];
     if (!s) return;
+    var metaEl = graphData.metaElements.find(function (el) { return el.data.id === 'comm-' + commId; });
     var memberCount = graphData.communityData[commId]
-      ? graphData.communityData[commId].entities.length : 0;
+      ? graphData.communityData[commId].entities.length : (metaEl ? metaEl.data.member_count : 0);
 
     var html = '<div class="name" style="color:' + color + '">Community ' + commId + '</div>';
     html += '<span class="type-badge" style="background:' + color + '33;color:' + color + '">COMMUNITY</span>';
@@ -27,6 +27,9 @@ def mock_db_path():
     c.execute("INSERT INTO entities (id, name, type, community_id, pagerank) VALUES (2, 'EntityB', 'ORGANIZATION', 0, 0.8)")
     c.execute("INSERT INTO relationships (source_id, target_id, description, weight) VALUES (1, 2, 'works at', 1.0)")
     c.execute("INSERT INTO community_summaries (community_id, title, summary, key_entities, key_insights) VALUES (0, 'Test Comm', 'Testing summary', '[]', '[]')")
+    c.execute("INSERT INTO chunks (chunk_index, content, source_ref) VALUES (0, 'EntityA works at EntityB.', 'web:test')")
+    c.execute("INSERT INTO entity_chunk_map (entity_name, chunk_index, source_id) VALUES ('EntityA', 0, 'web:test')")
+    c.execute("INSERT INTO semantic_groups (group_id, canonical, members, member_similarities) VALUES (0, 'EntityA', '[\"EntityA\", \"EntityB\"]', '{\"EntityB\": 0.9}')")
     
     conn.commit()
     conn.close()
@@ -38,12 +41,15 @@ def mock_db_path():
 def client(mock_db_path):
     old_base_path = config.DB_PATH
     old_graph_path = graph.DB_PATH
+    old_warmer = config.GRAPH_WARMER_ENABLED
     
     config.DB_PATH = mock_db_path
     graph.DB_PATH = mock_db_path
+    config.GRAPH_WARMER_ENABLED = False  # tests drive cache state themselves
     
     with TestClient(app) as c:
         yield c
         
     config.DB_PATH = old_base_path
     graph.DB_PATH = old_graph_path
+    config.GRAPH_WARMER_ENABLED = old_warmer
@@ -0,0 +1,110 @@
+import json
+import os
+import random
+import sqlite3
+
+import pytest
+
+from src.services.ann_index import (ann_index_dir, build_ann_indexes, load_ann_index, read_ivf_index,
+                                    write_ivf_index)
+from src.services.retrieval import load_retrieval_index, search
+from tests.test_retrieval import DIM, write_retrieval_db
+
+np = pytest.importorskip("numpy")
+
+
+def clustered(n, dim=32, clusters=40, seed=3):
+    """Unit vectors around random centres, like embeddings of a corpus with topics."""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centres[rng.integers(0, clusters, n)] + 0.35 * rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def exact_top(vectors, query, k):
+    return set(np.argsort(-(vectors @ (query / np.linalg.norm(query))))[:k].tolist())
+
+
+def test_ivf_recall_against_exact_search(tmp_path):
+    vectors = clustered(6000)
+    ids = np.arange(1000, 7000)
+    index = write_ivf_index(str(tmp_path / "ivf"), ids, vectors.copy(), nlist=64)
+    assert len(index) == 6000 and index.nlist == 64 and index.offsets[-1] == 6000
+    assert sorted(index.ids.tolist()) == ids.tolist()
+
+    queries = clustered(30, seed=9)
+    recall = []
+    for query in queries:
+        rows, scores = index.search(query, 10, nprobe=8)
+        assert list(scores) == sorted(scores, reverse=True)
+        expected = {int(ids[i]) for i in exact_top(vectors, query, 10)}
+        recall.append(len(expected & set(index.ids[rows].tolist())) / 10)
+        # Probing every list is exact search
+        rows, _ = index.search(query, 10, nprobe=index.nlist)
+        assert set(index.ids[rows].tolist()) == expected
+    assert np.mean(recall) >= 0.9
+
+
+def test_index_is_memory_mapped_and_checked_on_load(tmp_path):
+    directory = str(tmp_path / "ivf")
+    write_ivf_index(directory, list(range(500)), clustered(500), nlist=8, signature="abc")
+    index = read_ivf_index(directory, "abc")
+    assert isinstance(index.vectors, np.memmap) and not index.vectors.flags.writeable
+    assert np.allclose(np.linalg.norm(index.vectors, axis=1), 1.0, atol=1e-5)
+    assert read_ivf_index(directory, "other") is None
+    assert read_ivf_index(str(tmp_path / "missing")) is None
+
+    # Rebuilding replaces the directory whole; an older format version counts as missing
+    write_ivf_index(directory, list(range(300)), clustered(300), nlist=4, signature="def")
+    assert len(read_ivf_index(directory, "def")) == 300
+    meta_path = os.path.join(directory, "meta.json")
+    with open(meta_path) as f:
+        meta = json.load(f)
+    with open(meta_path, "w") as f:
+        json.dump({**meta, "version": 0}, f)
+    assert read_ivf_index(directory) is None
+    assert not [name for name in os.listdir(tmp_path) if name != "ivf"]
+
+
+def test_small_tables_fall_back_to_exact_search(tmp_path):
+    path = str(tmp_path / "graphrag.db")
+    write_retrieval_db(path)
+    # An index of a table that is no longer indexed (chunk vectors aren't searched) is removed
+    retired = ann_index_dir(path, "chunk_embeddings")
+    os.makedirs(retired)
+    results = build_ann_indexes(path, min_rows=100_000)
+    assert list(results) == ["entity_embeddings"] and "skipped" in results["entity_embeddings"]
+    assert not os.path.exists(retired)
+    assert not os.path.exists(ann_index_dir(path, "entity_embeddings"))
+    assert load_retrieval_index(path).ann is None
+
+
+def test_search_uses_index_built_for_current_vectors(tmp_path):
+    path = str(tmp_path / "graphrag.db")
+    vectors = write_retrieval_db(path)
+    results = build_ann_indexes(path, min_rows=50, nlist=8)
+    assert results["entity_embeddings"]["rows"] == len(vectors)
+
+    index = load_retrieval_index(path)
+    assert index.ann is not None and np.shares_memory(index.embeddings, index.ann.vectors)
+    query = [random.Random(1).gauss(0, 1) for _ in range(DIM)]
+    exact = search(index, path, query, top_k=10, exact=True)
+    assert [r.entity_id for r in exact] == [r.entity_id for r in search(load_retrieval_index(path, use_ann=False),
+                                                                         path, query, top_k=10)]
+    approximate = index.top_k(query, 10, nprobe=8)
+    assert [int(index.ids[row]) for row in approximate[0]] == [r.entity_id for r in exact]
+    hits = search(index, path, query, top_k=10)
+    assert len(hits) == 10 and all(a.final_score >= b.final_score for a, b in zip(hits, hits[1:]))
+    # Entities leading on pagerank and recency are candidates even when their lists aren't probed
+    weights = dict(semantic_weight=0.1, temporal_weight=0.3, graph_weight=0.6, content_age_days=30.0)
+    assert index.top_k(query, 10, nprobe=1, **weights)[0].tolist() == \
+        index.top_k(query, 10, exact=True, **weights)[0].tolist()
+
+    # Once the table's vectors change, the index no longer matches and search is exact again
+    conn = sqlite3.connect(path)
+    conn.execute("DELETE FROM entity_embeddings WHERE entity_id = ?", (exact[0].entity_id,))
+    conn.commit()
+    conn.close()
+    assert load_ann_index(path) is None
+    index = load_retrieval_index(path)
+    assert index.ann is None and len(index) == len(vectors) - 1
@@ -1,3 +1,21 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import httpx
+import pytest
+
+from src.api import graph
+from src.main import app
+from src.services.columnar import COLUMNAR_MEDIA_TYPE, decode_columnar
+from src.services import graph_service
+from src.services.db import content_hash
+from src.services.graph_layout import LAYOUT_AVAILABLE
+from src.services.viz_materialize import materialize_viz
+
 def test_get_graph_data_endpoint(client):
     response = client.get("/api/graph/data")
     assert response.status_code == 200
@@ -21,3 +39,259 @@ def test_get_graph_data_endpoint_filters(client):
     assert "metaElements" in data
     assert "communityData" in data
     assert "error" not in data
+
+def test_graph_data_cache_holds_multiple_param_combinations(client):
+    graph._cache.clear()
+    client.get("/api/graph/data?include_orphans=false")
+    client.get("/api/graph/data?include_orphans=true")
+    before = client.get("/api/graph/cache").json()["payloads"]
+
+    client.get("/api/graph/data?include_orphans=false")
+    client.get("/api/graph/data?include_orphans=true")
+    after = client.get("/api/graph/cache").json()["payloads"]
+
+    assert after["hits"] - before["hits"] == 2
+    assert after["misses"] == before["misses"]
+    assert after["size"] == 2
+
+def test_graph_data_etag_and_not_modified(client):
+    first = client.get("/api/graph/data", headers={"Accept-Encoding": "gzip"})
+    assert first.status_code == 200
+    assert first.headers["content-encoding"] == "gzip"
+    etag = first.headers["etag"]
+
+    second = client.get("/api/graph/data", headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.content == b""
+    assert second.headers["etag"] == etag
+
+    other = client.get("/api/graph/data?min_community_size=1", headers={"If-None-Match": etag})
+    assert other.status_code == 200
+    assert other.headers["etag"] != etag
+
+def test_graph_overview_omits_entity_payloads(client):
+    response = client.get("/api/graph/overview")
+    assert response.status_code == 200
+    data = response.json()
+    assert [el["data"]["id"] for el in data["metaElements"]] == ["comm-0"]
+    assert "0" in data["commSummaries"]
+    assert "communityData" not in data
+    assert "chunkHashes" not in data
+
+def test_graph_community_endpoint(client):
+    response = client.get("/api/graph/community/0")
+    assert response.status_code == 200
+    data = response.json()
+    assert {e["data"]["label"] for e in data["entities"]} == {"EntityA", "EntityB"}
+    assert len(data["edges"]) == 1
+    assert [sg["data"]["id"] for sg in data["semantic_groups"]] == ["sg-0"]
+    assert data["semanticGroups"]["0"]["canonical"] == "EntityA"
+
+    assert client.get("/api/graph/community/42").status_code == 404
+
+def test_graph_community_pages_behind_more_placeholder(client):
+    first = client.get("/api/graph/community/0?max_entities=1").json()
+    assert [e["data"]["label"] for e in first["entities"]] == ["EntityB"]  # highest pagerank first
+    assert first["edges"] == [] and first["total_entities"] == 2
+    (more,) = first["more"]
+    assert more["data"]["type"] == "MORE" and more["data"]["member_count"] == 1 and more["data"]["edge_count"] == 1
+
+    second = client.get(f"/api/graph/community/0?max_entities=1&offset={more['data']['next_offset']}").json()
+    assert [e["data"]["label"] for e in second["entities"]] == ["EntityA"]
+    assert len(second["edges"]) == 1 and second["more"] == []
+    # The group came with the first page; later members only point at it
+    assert second["semantic_groups"] == [] and second["entities"][0]["data"]["parent"] == "sg-0"
+
+    data = client.get("/api/graph/data?max_entities=1").json()
+    assert data["communityData"]["0"]["entities"] == first["entities"]
+    assert client.get("/api/graph/community/0?max_entities=-1").status_code == 400
+
+def test_graph_entity_chunks_endpoint(client):
+    response = client.get("/api/graph/entity/EntityA/chunks")
+    assert response.status_code == 200
+    assert response.json()["chunks"] == [{"index": 0, "source_id": "web:test", "hash": content_hash("EntityA works at EntityB.")}]
+
+    assert client.get("/api/graph/entity/Nope/chunks").status_code == 404
+
+def test_graph_chunk_texts_endpoint(client):
+    digest = content_hash("EntityA works at EntityB.")
+    response = client.get("/api/graph/chunks?ids=0,0,7")
+    assert response.status_code == 200
+    assert response.json() == {"chunks": [{"index": 0, "hash": digest}], "texts": {digest: "EntityA works at EntityB."}}
+
+    assert client.get("/api/graph/chunks?ids=a,b").status_code == 400
+    assert client.get("/api/graph/chunks?ids=" + ",".join(map(str, range(graph.MAX_CHUNK_IDS + 1)))).status_code == 400
+
+def _touch(path):
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+def test_concurrent_misses_share_one_build(client, mock_db_path, monkeypatch):
+    builds = []
+    real_get_viz_context = graph.get_viz_context
+
+    def counting_get_viz_context(*args, **kwargs):
+        builds.append(threading.get_ident())
+        time.sleep(0.2)  # keep the build in flight while the other requests arrive
+        return real_get_viz_context(*args, **kwargs)
+
+    monkeypatch.setattr(graph, "get_viz_context", counting_get_viz_context)
+    _touch(mock_db_path)
+
+    async def fire():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+            return await asyncio.gather(*(ac.get("/api/graph/data") for _ in range(50)))
+
+    responses = asyncio.run(fire())
+    assert [r.status_code for r in responses] == [200] * 50
+    assert len({r.headers["etag"] for r in responses}) == 1
+    assert len(builds) == 1
+    assert builds[0] != threading.get_ident()
+
+def test_rebuild_does_not_block_event_loop(client, mock_db_path, monkeypatch):
+    release = threading.Event()
+    real_get_viz_context = graph.get_viz_context
+
+    def blocked_get_viz_context(*args, **kwargs):
+        release.wait(5)
+        return real_get_viz_context(*args, **kwargs)
+
+    monkeypatch.setattr(graph, "get_viz_context", blocked_get_viz_context)
+    _touch(mock_db_path)
+
+    async def fire():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+            slow = asyncio.ensure_future(ac.get("/api/graph/data"))
+            fast = await asyncio.wait_for(ac.get("/api/graph/cache"), timeout=2)
+            assert not slow.done()
+            release.set()
+            return fast, await slow
+
+    fast, slow = asyncio.run(fire())
+    assert fast.status_code == 200
+    assert slow.status_code == 200
+
+def test_stale_while_revalidate_swap(client, mock_db_path, monkeypatch):
+    graph._cache.clear()
+    first = client.get("/api/graph/data")
+    graph.hold_stale_caches()
+    _touch(mock_db_path)
+
+    builds = []
+
+    def unexpected_build(*args, **kwargs):
+        builds.append(1)
+        raise graph.GraphDataError("unexpected build")
+
+    monkeypatch.setattr(graph, "get_viz_context", unexpected_build)
+    stale = client.get("/api/graph/data")
+    assert stale.status_code == 200
+    assert stale.headers["etag"] == first.headers["etag"]
+    assert builds == []
+
+    monkeypatch.undo()
+    new_fingerprint = graph.db_fingerprint(mock_db_path)
+    assert asyncio.run(graph.refresh_caches(new_fingerprint)) is True
+    fresh = client.get("/api/graph/data")
+    assert fresh.headers["etag"] != first.headers["etag"]
+    assert fresh.json() == first.json()
+    assert client.get("/api/graph/cache").json()["payloads"]["stale"] is False
+
+def test_graph_delta_endpoint(client):
+    version = client.get("/api/graph/overview").json()["version"]
+    assert version
+
+    delta = client.get(f"/api/graph/delta?since={version}").json()
+    assert delta["full"] is False
+    assert delta["version"] == version
+    assert delta["communities"] == {"added": [], "changed": [], "removed": []}
+    assert delta["metaElements"] == {"added": [], "changed": [], "removed": []}
+
+    fallback = client.get("/api/graph/delta?since=evicted").json()
+    assert fallback["full"] is True
+    assert fallback["version"] == version
+    assert [el["data"]["id"] for el in fallback["metaElements"]] == ["comm-0"]
+
+def test_graph_stream_reassembles_data_payload(client):
+    data = client.get("/api/graph/data").json()
+    response = client.get("/api/graph/stream")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert records[0]["type"] == "header" and records[-1]["type"] == "end"
+
+    meta = [r["element"] for r in records if r["type"] in ("meta", "metaEdge")]
+    assert meta == data["metaElements"]
+    communities = {str(r["id"]): r for r in records if r["type"] == "community"}
+    assert set(communities) == set(data["communityData"])
+    for comm_id, comm in data["communityData"].items():
+        assert communities[comm_id]["entities"] == comm["entities"]
+        assert communities[comm_id]["edges"] == comm["edges"]
+    assert {r["entity"] for r in records if r["type"] == "chunkRefs"} == set(data["chunkRefs"])
+
+    cached = client.get("/api/graph/stream", headers={"If-None-Match": response.headers["etag"]})
+    assert cached.status_code == 304
+
+def test_graph_payloads_negotiate_columnar_format(client):
+    accept = {"Accept": f"{COLUMNAR_MEDIA_TYPE}, application/json;q=0.9"}
+    json_data = client.get("/api/graph/community/0").json()
+    response = client.get("/api/graph/community/0", headers=accept)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == COLUMNAR_MEDIA_TYPE
+    assert "Accept" in response.headers["vary"]
+    decoded = decode_columnar(response.content)
+    assert [e["data"]["label"] for e in decoded["entities"]] == [e["data"]["label"] for e in json_data["entities"]]
+    assert decoded["semanticGroups"] == json_data["semanticGroups"]
+
+    data = client.get("/api/graph/data", headers=accept)
+    assert data.headers["content-type"] == COLUMNAR_MEDIA_TYPE
+    assert data.headers["etag"] != client.get("/api/graph/data").headers["etag"]
+    assert set(decode_columnar(data.content)["communityData"]) == {"0"}
+
+def test_graph_overview_served_from_materialized_tables(client, mock_db_path, monkeypatch):
+    live = client.get("/api/graph/overview?min_community_size=1").json()
+    materialize_viz(mock_db_path)
+    graph._cache.clear()
+    graph._contexts.clear()
+    monkeypatch.setattr(graph, "_build_context", lambda *args: pytest.fail("overview loaded the graph"))
+
+    materialized = client.get("/api/graph/overview?min_community_size=1").json()
+    assert materialized["metaElements"] == live["metaElements"]
+    assert materialized["commSummaries"] == live["commSummaries"]
+
+@pytest.mark.skipif(not (LAYOUT_AVAILABLE and graph.GRAPH_LAYOUT_HINTS), reason="layout hints off or numpy missing")
+def test_graph_data_reads_materialized_layout(client, mock_db_path, monkeypatch):
+    live = client.get("/api/graph/data?min_community_size=1").json()
+    materialize_viz(mock_db_path)
+    graph._cache.clear()
+    monkeypatch.setattr(graph_service, "sphere_layout", lambda *args: pytest.fail("/data laid out communities"))
+    monkeypatch.setattr(graph_service, "cap_layout", lambda *args: pytest.fail("/data laid out entities"))
+
+    materialized = client.get("/api/graph/data?min_community_size=1").json()
+    assert materialized == live
+    assert all("fx" in ent["data"] for comm in materialized["communityData"].values() for ent in comm["entities"])
+
+def test_graph_data_shares_context_and_history(client, mock_db_path, monkeypatch):
+    _touch(mock_db_path)
+    loads = []
+    real_get_viz_context = graph.get_viz_context
+    monkeypatch.setattr(graph, "get_viz_context", lambda *a, **kw: loads.append(1) or real_get_viz_context(*a, **kw))
+
+    assert client.get("/api/graph/data").status_code == 200
+    version = graph.fingerprint_version(graph.db_fingerprint(mock_db_path))
+    assert graph._history.get((0, False, 2), version) is not None
+    overview = client.get("/api/graph/overview").json()
+    assert overview["version"] == version
+    assert client.get("/api/graph/community/0").status_code == 200
+    assert client.get(f"/api/graph/delta?since={version}").json()["full"] is False
+    assert loads == [1]
+
+@pytest.mark.skipif(graph.DB_MIGRATE, reason="GRAPHRAG_DB_MIGRATE opts the service into migrating")
+def test_service_leaves_pipeline_db_unmigrated(client, mock_db_path):
+    assert asyncio.run(graph.refresh_caches(graph.db_fingerprint(mock_db_path))) is True
+    conn = sqlite3.connect(mock_db_path)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(chunks)")}
+    conn.close()
+    assert "content_hash" not in columns
@@ -0,0 +1,87 @@
+import sqlite3
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src import config
+from src.api import search
+from src.main import app
+from tests.test_retrieval import DIM, write_retrieval_db
+
+pytest.importorskip("numpy")
+
+
+@pytest.fixture
+def search_client(tmp_path, monkeypatch):
+    path = str(tmp_path / "graphrag.db")
+    write_retrieval_db(path)
+    queries = []
+
+    async def embed_query(text):
+        queries.append(text)
+        return [float(len(text))] + [1.0] * (DIM - 1)
+
+    monkeypatch.setattr(search, "DB_PATH", path)
+    monkeypatch.setattr(search, "_embed_query", embed_query)
+    monkeypatch.setattr(config, "GRAPH_WARMER_ENABLED", False)
+    search._indexes.clear()
+    with TestClient(app) as client:
+        yield client, path, queries
+    search._indexes.clear()
+
+
+def test_search_returns_ranked_entities(search_client):
+    client, _, queries = search_client
+    data = client.get("/api/search", params={"q": "chip makers", "top_k": 5}).json()
+    assert queries == ["chip makers"]
+    assert data["query"] == "chip makers" and data["entities"] > 0
+    scores = [r["final_score"] for r in data["results"]]
+    assert len(scores) == 5 and scores == sorted(scores, reverse=True)
+    assert {"entity_id", "name", "semantic_score", "temporal_score", "graph_score", "source_refs"} <= set(data["results"][0])
+
+    semantic_only = client.get("/api/search", params={"q": "chip makers", "top_k": 5, "semantic_weight": 1,
+                                                      "temporal_weight": 0, "graph_weight": 0}).json()
+    assert [r["final_score"] for r in semantic_only["results"]] == [r["semantic_score"] for r in semantic_only["results"]]
+
+
+def test_index_is_loaded_once_per_database_version(search_client):
+    client, path, _ = search_client
+    start = client.get("/api/search/cache").json()["index"]
+    client.get("/api/search", params={"q": "a"})
+    client.get("/api/search", params={"q": "b"})
+    stats = client.get("/api/search/cache").json()["index"]
+    assert (stats["misses"] - start["misses"], stats["hits"] - start["hits"]) == (1, 1)
+
+    conn = sqlite3.connect(path)
+    conn.execute("DELETE FROM entity_embeddings WHERE entity_id IN (SELECT entity_id FROM entity_embeddings LIMIT 10)")
+    conn.commit()
+    conn.close()
+    before = client.get("/api/search", params={"q": "a"}).json()["entities"]
+    assert client.get("/api/search/cache").json()["index"]["misses"] - start["misses"] == 2
+    assert client.get("/api/search", params={"q": "a"}).json()["entities"] == before
+
+
+def test_search_rejects_bad_parameters_and_reports_missing_embeddings(search_client):
+    client, path, _ = search_client
+    assert client.get("/api/search", params={"q": " "}).status_code == 400
+    assert client.get("/api/search", params={"q": "x", "top_k": 0}).status_code == 400
+
+    conn = sqlite3.connect(path)
+    conn.execute("DROP TABLE entity_embeddings")
+    conn.commit()
+    conn.close()
+    assert "error" in client.get("/api/search", params={"q": "x"}).json()
+
+
+def test_search_uses_ann_index_when_built(search_client):
+    from src.services.ann_index import build_ann_indexes
+
+    client, path, _ = search_client
+    params = {"q": "chip makers", "top_k": 5}
+    assert client.get("/api/search", params=params).json()["ann"] is False
+    build_ann_indexes(path, min_rows=10, nlist=4)
+    search._indexes.clear()
+    approximate = client.get("/api/search", params=params).json()
+    exact = client.get("/api/search", params={**params, "exact": True}).json()
+    assert approximate["ann"] is True and exact["ann"] is False
+    assert [r["entity_id"] for r in approximate["results"]] == [r["entity_id"] for r in exact["results"]]
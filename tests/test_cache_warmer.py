@@ -0,0 +1,82 @@
+import asyncio
+import os
+import sqlite3
+
+from src.services.cache_warmer import CacheWarmer, writer_active
+from src.services.graph_cache import db_fingerprint
+
+
+def _write(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def test_warmer_waits_for_writer_then_refreshes_once(tmp_path):
+    path = str(tmp_path / "graph.db")
+    _write(path, b"v1")
+    events = []
+
+    async def refresh(fingerprint):
+        events.append(("refresh", fingerprint))
+        return True
+
+    async def scenario():
+        warmer = CacheWarmer(lambda: path, on_change=lambda: events.append(("change",)), refresh=refresh,
+                             interval=0.01, settle_polls=5)
+        warmer.start()
+        await asyncio.sleep(0.05)
+        # Writer rewrites the file over several polls
+        for i in range(3):
+            _write(path, b"v2" * (i + 2))
+            st = os.stat(path)
+            os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + (i + 1) * 10**9))
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.2)
+        await warmer.stop()
+        return warmer
+
+    warmer = asyncio.run(scenario())
+    final = db_fingerprint(path)
+    assert events[0][0] == "refresh"  # startup warm
+    assert [e for e in events[1:] if e[0] == "change"] == [("change",)]
+    assert [e for e in events[1:] if e[0] == "refresh"] == [("refresh", final)]
+    assert warmer.current == final
+
+
+def test_warmer_releases_stale_on_failed_refresh(tmp_path):
+    path = str(tmp_path / "graph.db")
+    _write(path, b"v1")
+    released = []
+
+    async def refresh(fingerprint):
+        raise RuntimeError("schema missing")
+
+    async def scenario():
+        warmer = CacheWarmer(lambda: path, on_change=lambda: None, refresh=refresh,
+                             on_failure=lambda: released.append(True), interval=0.01, settle_polls=1)
+        warmer.start()
+        await asyncio.sleep(0.05)
+        await warmer.stop()
+        return warmer
+
+    warmer = asyncio.run(scenario())
+    assert warmer.failures == 1  # not retried for an unchanged file
+    assert released == [True]
+
+
+def test_writer_active_detects_wal_writers(tmp_path):
+    path = str(tmp_path / "graph.db")
+    assert not writer_active(path)
+    writer = sqlite3.connect(path, isolation_level=None)
+    writer.execute("PRAGMA journal_mode=WAL")
+    writer.execute("CREATE TABLE t (x)")
+    writer.execute("BEGIN IMMEDIATE")
+    writer.execute("INSERT INTO t VALUES (1)")
+    assert os.path.getsize(path + "-wal") > 0 and not os.path.exists(path + "-journal")
+    assert writer_active(path)
+
+    # The WAL keeps its frames after the commit, but nobody holds the write lock any more
+    writer.execute("COMMIT")
+    assert os.path.getsize(path + "-wal") > 0
+    assert not writer_active(path)
+    writer.close()
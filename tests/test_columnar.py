@@ -0,0 +1,52 @@
+import struct
+
+import pytest
+
+from benchmarks.synthetic import synthetic_graph_inputs
+from src.services.columnar import COLUMNAR_MAGIC, decode_columnar, encode_columnar
+from src.services.graph_service import build_viz_payload
+from src.services.graph_store import GraphStore
+
+
+def _assert_close(actual, expected):
+    """Equal, except floats only to float32 precision."""
+    if isinstance(expected, float):
+        assert actual == pytest.approx(expected, rel=1e-6, abs=1e-30)
+    elif isinstance(expected, dict):
+        assert list(actual) == [str(k) if isinstance(k, int) else k for k in expected]
+        for key, value in expected.items():
+            _assert_close(actual[str(key) if isinstance(key, int) else key], value)
+    elif isinstance(expected, list):
+        assert len(actual) == len(expected)
+        for a, e in zip(actual, expected):
+            _assert_close(a, e)
+    else:
+        assert actual == expected
+
+
+def test_viz_payload_round_trips():
+    inputs = synthetic_graph_inputs(400, seed=9)
+    entities, edges = inputs.pop("entities"), inputs.pop("edges")
+    data = build_viz_payload(GraphStore.from_dicts(entities, edges), **inputs)
+    body = encode_columnar(data)
+    assert body[:4] == COLUMNAR_MAGIC
+    _assert_close(decode_columnar(body), data)
+
+
+def test_columns_pick_typed_encodings():
+    elements = [{"data": {"id": f"n{i}", "color": "#fff", "size": 1.5 * i, "count": i, "weight": None if i % 2 else 0.25}}
+                for i in range(10)]
+    body = encode_columnar({"entities": elements, "other": [{"data": {"id": "x"}}, {"data": {"label": "y"}}]})
+    (header_len,) = struct.unpack_from("<I", body, 4)
+    header = body[8:8 + header_len].decode()
+    decoded = decode_columnar(body)
+    assert decoded["entities"] == elements
+    assert decoded["other"] == [{"data": {"id": "x"}}, {"data": {"label": "y"}}]
+    assert header.count('"#fff"') == 1  # repeated strings are sent once
+    assert header.count('"n0"') == 1  # ids and labels share the table too
+    assert '"size"' in header and "1.5" not in header  # floats live in the binary buffers
+
+
+def test_rejects_other_bodies():
+    with pytest.raises(ValueError):
+        decode_columnar(b'{"metaElements": []}')
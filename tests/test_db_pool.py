@@ -0,0 +1,108 @@
+import os
+import sqlite3
+
+import pytest
+
+from src.services.db import ConnectionPool, content_hash, get_pool, migrate_graph_db
+
+
+def _make_db(path, value):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE t (v INTEGER)")
+    conn.execute("INSERT INTO t VALUES (?)", (value,))
+    conn.commit()
+    conn.close()
+
+
+def test_pool_reuses_connections(tmp_path):
+    path = str(tmp_path / "graph.db")
+    _make_db(path, 1)
+    pool = ConnectionPool(path)
+
+    with pool.connection() as first:
+        assert first.execute("SELECT v FROM t").fetchone() == (1,)
+    with pool.connection() as second:
+        assert second is first
+
+    stats = pool.stats()
+    assert stats["opened"] == 1
+    assert stats["reused"] == 1
+    pool.close()
+
+
+def test_pool_connections_are_read_only(tmp_path):
+    path = str(tmp_path / "graph.db")
+    _make_db(path, 1)
+    pool = ConnectionPool(path)
+    with pool.connection() as conn:
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("INSERT INTO t VALUES (2)")
+    pool.close()
+
+
+def test_pool_does_not_block_writer(tmp_path):
+    path = str(tmp_path / "graph.db")
+    _make_db(path, 1)
+    pool = ConnectionPool(path)
+    with pool.connection() as conn:
+        conn.execute("SELECT v FROM t").fetchall()
+
+    writer = sqlite3.connect(path, timeout=0)
+    writer.execute("INSERT INTO t VALUES (2)")
+    writer.commit()
+    writer.close()
+
+    with pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone() == (2,)
+    pool.close()
+
+
+def test_pool_resets_when_database_is_recreated(tmp_path):
+    path = str(tmp_path / "graph.db")
+    _make_db(path, 1)
+    pool = ConnectionPool(path)
+    with pool.connection() as conn:
+        assert conn.execute("SELECT v FROM t").fetchone() == (1,)
+
+    # Keep the old inode alive so the new file can't reuse it
+    os.rename(path, str(tmp_path / "old.db"))
+    _make_db(path, 2)
+
+    with pool.connection() as conn:
+        assert conn.execute("SELECT v FROM t").fetchone() == (2,)
+    assert pool.stats()["resets"] == 1
+    assert pool.stats()["opened"] == 2
+    pool.close()
+
+
+def test_get_pool_is_shared_per_path(tmp_path):
+    path = str(tmp_path / "graph.db")
+    assert get_pool(path) is get_pool(os.path.join(str(tmp_path), ".", "graph.db"))
+
+
+def test_migrate_graph_db_is_idempotent(tmp_path):
+    path = str(tmp_path / "graph.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE entities (id INTEGER PRIMARY KEY, name TEXT, community_id INTEGER)")
+    conn.execute("CREATE TABLE relationships (id INTEGER PRIMARY KEY, source_id INTEGER, target_id INTEGER)")
+    conn.execute("CREATE INDEX rel_src ON relationships(source_id)")
+    conn.execute("CREATE TABLE chunks (chunk_index INTEGER PRIMARY KEY, content TEXT)")
+    conn.executemany("INSERT INTO chunks (content) VALUES (?)", [("same",), ("same",), (None,)])
+    conn.commit()
+    conn.close()
+
+    # existing indexes under other names, rowid aliases and missing tables are left alone
+    assert migrate_graph_db(path) == ["idx_entities_community", "idx_relationships_target", "chunks.content_hash", "content_hash for 2 chunks"]
+    mtime = os.stat(path).st_mtime_ns
+    assert migrate_graph_db(path) == []
+    assert os.stat(path).st_mtime_ns == mtime
+    assert migrate_graph_db(str(tmp_path / "missing.db")) == []
+
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT content_hash FROM chunks ORDER BY chunk_index").fetchall() == [
+        (content_hash("same"),), (content_hash("same"),), (None,)]
+    # rows the pipeline adds later are backfilled on the next run
+    conn.execute("INSERT INTO chunks (content) VALUES ('new')")
+    conn.commit()
+    conn.close()
+    assert migrate_graph_db(path) == ["content_hash for 1 chunks"]
@@ -0,0 +1,142 @@
+import asyncio
+import sqlite3
+import struct
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from benchmarks.synthetic import write_synthetic_db
+from src.services.embedding import EMBEDDING_TARGETS, EmbeddingCache, EmbeddingClient, embed_graph, float32_blobs
+
+DIM = 4
+
+
+def vector(text):
+    return [float(len(text)), float(text.count(" ")), 0.1, -2.5]
+
+
+def stub_embedder(latency=0.005, fail_on=None):
+    """Ollama /api/embed stand-in: a 4-float vector per input derived from the text."""
+    app = FastAPI()
+    app.state.in_flight = app.state.max_in_flight = app.state.requests = 0
+
+    @app.post("/api/embed")
+    async def embed(request: Request):
+        texts = (await request.json())["input"]
+        app.state.requests += 1
+        app.state.in_flight += 1
+        app.state.max_in_flight = max(app.state.max_in_flight, app.state.in_flight)
+        try:
+            await asyncio.sleep(latency)
+        finally:
+            app.state.in_flight -= 1
+        if fail_on is not None and any(fail_on in text for text in texts):
+            return JSONResponse({"error": "boom"}, status_code=500)
+        return {"model": "stub", "embeddings": [vector(text) for text in texts]}
+
+    return app
+
+
+def _db(tmp_path):
+    tmp_path.mkdir(exist_ok=True)
+    path = str(tmp_path / "graphrag.db")
+    write_synthetic_db(path, 200, seed=3)
+    conn = sqlite3.connect(path)
+    # Plain tables with the vec0 tables' columns, as sqlite-vec isn't needed to test the writes
+    for target in EMBEDDING_TARGETS:
+        conn.execute(f"CREATE TABLE {target.table} ({target.id_column} INTEGER PRIMARY KEY, embedding BLOB)")
+    conn.commit()
+    return conn
+
+
+def _embed(app, conn, concurrency=3, batch_size=16, model="stub", **kwargs):
+    async def go():
+        async with EmbeddingClient(base_url="http://stub", model=model, concurrency=concurrency, retry_backoff=0,
+                                   transport=httpx.ASGITransport(app=app)) as client:
+            return await embed_graph(client, conn, batch_size=batch_size, **kwargs)
+    return asyncio.run(go())
+
+
+def test_float32_blobs_match_struct_packing():
+    vectors = [vector("a b c"), vector("longer text here")]
+    assert float32_blobs(vectors) == [struct.pack(f"{DIM}f", *v) for v in vectors]
+
+
+def test_graph_is_embedded_in_concurrent_batches(tmp_path):
+    conn = _db(tmp_path)
+    app = stub_embedder()
+    counts = _embed(app, conn)
+
+    for target in EMBEDDING_TARGETS:
+        rows = conn.execute(target.query).fetchall()
+        assert counts[target.table]["written"] == len(rows) > 0
+        stored = dict(conn.execute(f"SELECT {target.id_column}, embedding FROM {target.table}"))
+        assert stored == {row[0]: struct.pack(f"{DIM}f", *vector(target.text(*row[1:]))) for row in rows}
+    assert app.state.requests == sum((c["embedded"] + 15) // 16 for c in counts.values())
+    assert app.state.max_in_flight == 3
+
+
+def test_failed_run_keeps_previous_embeddings(tmp_path):
+    conn = _db(tmp_path)
+    _embed(stub_embedder(), conn)
+    snapshot = "SELECT (SELECT COUNT(*) FROM claim_embeddings), (SELECT COUNT(*) FROM embedding_state)"
+    before = conn.execute(snapshot).fetchone()
+
+    chunk = conn.execute("SELECT content FROM chunks LIMIT 1").fetchone()[0]
+    try:
+        _embed(stub_embedder(fail_on=chunk[:20]), conn, full=True)
+    except httpx.HTTPStatusError:
+        pass
+    else:
+        raise AssertionError("the failing batch should raise")
+    assert conn.execute(snapshot).fetchone() == before
+    assert conn.execute("SELECT COUNT(*) FROM entity_embeddings").fetchone()[0] > 0
+    # Nothing was lost, so the next run has nothing to do
+    app = stub_embedder()
+    _embed(app, conn)
+    assert app.state.requests == 0
+
+
+def test_only_new_and_changed_rows_are_embedded_again(tmp_path):
+    conn = _db(tmp_path)
+    _embed(stub_embedder(), conn)
+
+    app = stub_embedder()
+    counts = _embed(app, conn)
+    assert app.state.requests == 0
+    assert all(c["written"] == c["removed"] == 0 and c["unchanged"] > 0 for c in counts.values())
+
+    conn.execute("UPDATE entities SET description = 'rewritten' WHERE id = 1")
+    conn.execute("DELETE FROM claims WHERE id IN (1, 2)")
+    conn.execute("INSERT INTO chunks (content, chunk_index, source_ref) VALUES ('brand new text', 0, 'web:x')")
+    conn.commit()
+    counts = _embed(app, conn)
+    assert {table: (c["written"], c["removed"]) for table, c in counts.items()} == {
+        "entity_embeddings": (1, 0), "chunk_embeddings": (1, 0), "claim_embeddings": (0, 2),
+    }
+    assert conn.execute("SELECT embedding FROM entity_embeddings WHERE entity_id = 1").fetchone()[0] == \
+        struct.pack(f"{DIM}f", *vector(EMBEDDING_TARGETS[0].text(*conn.execute(
+            "SELECT name, type, description FROM entities WHERE id = 1").fetchone())))
+    assert conn.execute("SELECT COUNT(*) FROM claim_embeddings WHERE claim_id IN (1, 2)").fetchone()[0] == 0
+
+    # A different model invalidates every vector
+    counts = _embed(app, conn, model="stub-v2")
+    for target in EMBEDDING_TARGETS:
+        rows = conn.execute(f"SELECT COUNT(*) FROM ({target.query})").fetchone()[0]
+        assert counts[target.table]["written"] == rows
+        assert conn.execute(f"SELECT COUNT(*) FROM {target.table}").fetchone()[0] == rows
+
+
+def test_cache_spares_a_rebuilt_database_from_embedding(tmp_path):
+    cache_path = str(tmp_path / "embeddings.db")
+    with EmbeddingCache(cache_path) as cache:
+        _embed(stub_embedder(), _db(tmp_path / "first"), cache=cache)
+
+    conn = _db(tmp_path / "second")
+    app = stub_embedder()
+    with EmbeddingCache(cache_path) as cache:
+        counts = _embed(app, conn, cache=cache)
+        assert cache.misses == 0
+    assert app.state.requests == 0
+    assert all(c["embedded"] == 0 and c["written"] > 0 for c in counts.values())
@@ -0,0 +1,124 @@
+import asyncio
+import json
+import re
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from src.services.extraction import Entity, LLMClient, Relationship, extract_documents
+from src.services.llm_cache import LLMResponseCache
+
+
+def stub_llm(latency=0.01, fail_first=(), broken=()):
+    """Ollama /api/chat stand-in answering each extraction prompt with canned JSON about its chunk.
+
+    Chunks are texts like "doc-a 3"; entity names and claims echo them. Chunks
+    in fail_first get one 500 before answering, those in broken always fail.
+    """
+    app = FastAPI()
+    app.state.in_flight = app.state.max_in_flight = app.state.requests = 0
+    failed = set()
+
+    @app.post("/api/chat")
+    async def chat(request: Request):
+        body = await request.json()
+        prompt = body["messages"][-1]["content"]
+        text = re.search(r"TEXT:\n(.*)\n", prompt).group(1)
+        app.state.requests += 1
+        app.state.in_flight += 1
+        app.state.max_in_flight = max(app.state.max_in_flight, app.state.in_flight)
+        try:
+            await asyncio.sleep(latency)
+        finally:
+            app.state.in_flight -= 1
+        if text in broken or (text in fail_first and text not in failed):
+            failed.add(text)
+            return JSONResponse({"error": "overloaded"}, status_code=500)
+        if "named entities" in prompt:
+            content = [{"name": f"{text} one", "type": "CONCEPT", "description": text},
+                       {"name": f"{text} two", "type": "CONCEPT", "description": text}]
+        elif "relationships" in prompt:
+            content = [{"source": f"{text} one", "target": f"{text} two", "description": text, "strength": 8}]
+        else:
+            content = [{"subject": f"{text} one", "claim_type": "FACT", "description": text}]
+        return {"message": {"role": "assistant", "content": "```json\n" + json.dumps(content) + "\n```"}}
+
+    return app
+
+
+def _run(app, source_chunks, concurrency=4, cache=None, **kwargs):
+    async def go():
+        async with LLMClient(base_url="http://stub", concurrency=concurrency, retry_backoff=0, cache=cache,
+                             transport=httpx.ASGITransport(app=app)) as llm:
+            return await extract_documents(llm, source_chunks, **kwargs)
+    return asyncio.run(go())
+
+
+SOURCES = {"doc-a": [f"doc-a {i}" for i in range(6)], "doc-b": [f"doc-b {i}" for i in range(5)]}
+
+
+def test_results_keep_document_and_chunk_order():
+    app = stub_llm()
+    results, skipped = _run(app, SOURCES)
+    assert skipped == []
+    assert list(results) == ["doc-a", "doc-b"]
+    for source_id, chunks in SOURCES.items():
+        result = results[source_id]
+        assert result["chunks"] == chunks
+        assert [e.description for e in result["entities"]] == [text for text in chunks for _ in range(2)]
+        assert [r.description for r in result["relationships"]] == chunks
+        assert [c.description for c in result["claims"]] == chunks
+    # Chunk ids run across documents in order
+    assert [e.source_chunk for e in results["doc-b"]["entities"]][::2] == list(range(6, 11))
+    assert results["doc-a"]["relationships"][0].strength == 0.8
+    assert app.state.requests == 3 * 11
+
+
+def test_requests_in_flight_are_bounded_by_concurrency():
+    app = stub_llm(latency=0.02)
+    _run(app, SOURCES, concurrency=3)
+    assert app.state.max_in_flight == 3
+
+    serial = stub_llm(latency=0.02)
+    _run(serial, SOURCES, concurrency=1)
+    assert serial.state.max_in_flight == 1
+
+
+def test_failures_are_retried_then_skipped():
+    app = stub_llm(fail_first={"doc-a 1"}, broken={"doc-b 2"})
+    results, skipped = _run(app, SOURCES)
+    assert [c.description for c in results["doc-a"]["claims"]] == SOURCES["doc-a"]
+    assert [c.description for c in results["doc-b"]["claims"]] == ["doc-b 0", "doc-b 1", "doc-b 3", "doc-b 4"]
+    assert [(s["source_id"], s["chunk_index"], s["chunk_id"]) for s in skipped] == [("doc-b", 2, 8)]
+    assert skipped[0]["error"].startswith("HTTPStatusError")
+
+
+def test_nlp_mode_uses_local_extractors_without_llm_calls():
+    def ner(text, chunk_id):
+        return [Entity(f"{text} x", "CONCEPT", "", chunk_id), Entity(f"{text} y", "CONCEPT", "", chunk_id)]
+
+    def cooccurrence(text, entities, chunk_id):
+        return [Relationship(entities[0].name, entities[1].name, text, 1.0, chunk_id)]
+
+    app = stub_llm()
+    results, _ = _run(app, SOURCES, mode="nlp", ner=ner, cooccurrence=cooccurrence)
+    assert app.state.requests == 0
+    assert [r.description for r in results["doc-b"]["relationships"]] == SOURCES["doc-b"]
+    assert results["doc-b"]["claims"] == []
+
+
+def test_rerun_is_answered_from_the_response_cache(tmp_path):
+    path = str(tmp_path / "llm.db")
+    first = stub_llm(broken={"doc-b 2"})
+    with LLMResponseCache(path) as cache:
+        expected, _ = _run(first, SOURCES, cache=cache)
+
+    # Only the chunk that failed last time goes back to the LLM
+    second = stub_llm()
+    with LLMResponseCache(path) as cache:
+        results, skipped = _run(second, SOURCES, cache=cache)
+        assert cache.stats()["hits"] == 3 * 10
+    assert second.state.requests == 3
+    assert skipped == []
+    assert results["doc-a"] == expected["doc-a"]
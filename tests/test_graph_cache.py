@@ -0,0 +1,76 @@
+import os
+
+from src.services.graph_cache import GraphCache, db_fingerprint
+
+def test_graph_cache_lru_eviction():
+    cache = GraphCache(maxsize=2)
+    fp = (1, 1, 1)
+    cache.put("a", {"v": 1}, fp)
+    cache.put("b", {"v": 2}, fp)
+    assert cache.get("a", fp) == {"v": 1}  # "a" becomes most recently used
+    cache.put("c", {"v": 3}, fp)
+
+    assert cache.get("b", fp) is None
+    assert cache.get("a", fp) == {"v": 1}
+    assert cache.get("c", fp) == {"v": 3}
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 3
+    assert stats["misses"] == 1
+
+def test_graph_cache_fingerprint_change_drops_all_entries():
+    cache = GraphCache(maxsize=4)
+    cache.put("a", 1, (1, 1, 1))
+    cache.put("b", 2, (1, 1, 1))
+    assert cache.get("a", (2, 1, 1)) is None
+    assert cache.get("b", (2, 1, 1)) is None
+    assert cache.stats()["size"] == 0
+    assert cache.stats()["invalidations"] == 1
+
+def test_db_fingerprint_tracks_file_changes(tmp_path):
+    path = str(tmp_path / "graph.db")
+    assert db_fingerprint(path) is None
+    with open(path, "wb") as f:
+        f.write(b"x")
+    first = db_fingerprint(path)
+    with open(path, "ab") as f:
+        f.write(b"y")
+    os.utime(path, ns=(first[0] + 10**9, first[0] + 10**9))
+    assert db_fingerprint(path) != first
+
+def test_graph_cache_serves_stale_until_swap():
+    cache = GraphCache(maxsize=4)
+    old, new = (1, 1, 1), (2, 1, 1)
+    cache.put("a", "old-a", old)
+    cache.put("b", "old-b", old)
+    cache.hold_stale()
+
+    assert cache.get("a", new) == "old-a"
+    assert cache.get("b", None) == "old-b"  # DB deleted mid-pipeline
+    assert cache.stats()["stale_hits"] == 2
+
+    cache.swap({"a": "new-a"}, new)
+    assert cache.get("a", new) == "new-a"
+    assert cache.get("b", new) is None
+    assert cache.stats()["stale"] is False
+
+def test_graph_cache_release_invalidates_on_next_access():
+    cache = GraphCache(maxsize=4)
+    cache.put("a", 1, (1, 1, 1))
+    cache.hold_stale()
+    cache.release()
+    assert cache.get("a", (2, 1, 1)) is None
+    assert cache.stats()["size"] == 0
+
+def test_graph_cache_drops_late_put_for_older_version():
+    cache = GraphCache(maxsize=4)
+    old, new = (1, 1, 1), (2, 1, 1)
+    cache.put("a", "old-a", old)
+    assert cache.get("a", new) is None  # readers moved on to the new version
+    cache.put("a", "new-a", new)
+    cache.put("b", "old-b", old)  # a build started on the old version finishes late
+
+    assert cache.get("a", new) == "new-a"
+    assert cache.get("b", new) is None
+    assert cache.stats()["size"] == 1
+    assert cache.stats()["invalidations"] == 1
@@ -0,0 +1,109 @@
+import json
+import sqlite3
+
+import pytest
+
+from benchmarks.synthetic import write_synthetic_db
+from src.services.graph_cache import db_fingerprint
+from src.services.graph_delta import SnapshotHistory, build_graph_delta, snapshot_context
+from src.services.graph_layout import LAYOUT_AVAILABLE
+from src.services.graph_service import get_community_data, get_viz_context
+
+
+def _context(path, layout_hints=False):
+    ctx = get_viz_context(path, layout_hints=layout_hints)
+    ctx.fingerprint = db_fingerprint(path)
+    return ctx
+
+
+@pytest.mark.parametrize("layout_hints", [
+    False, pytest.param(True, marks=pytest.mark.skipif(not LAYOUT_AVAILABLE, reason="layout hints need numpy"))])
+def test_delta_reports_only_changed_communities(tmp_path, layout_hints):
+    path = str(tmp_path / "graphrag.db")
+    write_synthetic_db(path, 400, seed=4)
+    old_ctx = _context(path, layout_hints)
+    old = snapshot_context(old_ctx)
+    comm_ids = sorted(old.communities)
+    edited, dropped = comm_ids[0], comm_ids[-1]
+
+    conn = sqlite3.connect(path)
+    conn.execute("UPDATE entities SET description = 'edited' WHERE id = (SELECT MIN(id) FROM entities WHERE community_id = ?)", (edited,))
+    conn.execute("UPDATE community_summaries SET title = 'Renamed' WHERE community_id = ?", (edited,))
+    conn.execute("DELETE FROM community_summaries WHERE community_id = ?", (dropped,))
+    conn.commit()
+    conn.close()
+    ctx = _context(path, layout_hints)
+    new = snapshot_context(ctx)
+    assert new.version != old.version
+
+    delta = build_graph_delta(ctx, old, new)
+    assert delta["full"] is False
+    assert (delta["version"], delta["since"]) == (new.version, old.version)
+    assert delta["communities"] == {"added": [], "changed": [edited], "removed": [dropped]}
+    assert list(delta["commSummaries"]["changed"]) == [edited]
+    assert delta["commSummaries"]["changed"][edited]["title"] == "Renamed"
+    assert delta["commSummaries"]["removed"] == [dropped]
+    assert f"comm-{dropped}" in delta["metaElements"]["removed"]
+    assert f"comm-{edited}" in [el["data"]["id"] for el in delta["metaElements"]["changed"]]
+    assert get_community_data(ctx, edited) != get_community_data(old_ctx, edited)
+
+
+def _changed_communities(path, edit):
+    old = snapshot_context(_context(path))
+    conn = sqlite3.connect(path)
+    edit(conn)
+    conn.commit()
+    conn.close()
+    ctx = _context(path)
+    return ctx, build_graph_delta(ctx, old, snapshot_context(ctx))["communities"]["changed"]
+
+
+def test_delta_reports_num_sources_change(tmp_path):
+    path = str(tmp_path / "graphrag.db")
+    write_synthetic_db(path, 400, seed=4)
+    comm_id = sorted(_context(path).cyto_community_summaries)[0]
+    edit = lambda conn: conn.execute("UPDATE entities SET num_sources = 7 WHERE id = "
+                                     "(SELECT MIN(id) FROM entities WHERE community_id = ?)", (comm_id,))
+    assert _changed_communities(path, edit)[1] == [comm_id]
+
+
+def test_delta_reports_semantic_group_similarity_change(tmp_path):
+    path = str(tmp_path / "graphrag.db")
+    write_synthetic_db(path, 400, seed=4)
+    ctx = _context(path)
+    touched = {comm_id: [group["group_id"] for group, _ in groups]
+               for comm_id, groups in ctx.community_semantic_groups.items() if comm_id in ctx.cyto_community_summaries}
+    comm_id = min(touched)
+    gid = touched[comm_id][0]
+    expected = sorted(c for c, gids in touched.items() if gid in gids)
+    similarities = {m: 0.5 for m in ctx.cyto_semantic_groups[gid]["member_similarities"]}
+    edit = lambda conn: conn.execute("UPDATE semantic_groups SET member_similarities = ? WHERE group_id = ?",
+                                     (json.dumps(similarities), gid))
+    new_ctx, changed = _changed_communities(path, edit)
+    assert sorted(changed) == expected and comm_id in changed
+    assert new_ctx.cyto_semantic_groups[gid]["member_similarities"] == similarities
+
+
+def test_delta_without_base_is_full_overview(tmp_path):
+    path = str(tmp_path / "graphrag.db")
+    write_synthetic_db(path, 100, seed=1)
+    ctx = _context(path)
+    current = snapshot_context(ctx)
+    assert build_graph_delta(ctx, current, current)["communities"] == {"added": [], "changed": [], "removed": []}
+
+    full = build_graph_delta(ctx, None, current)
+    assert full["full"] is True
+    assert full["version"] == current.version
+    assert full["metaElements"]
+
+
+def test_snapshot_history_is_bounded():
+    history = SnapshotHistory(versions=2, max_keys=1)
+    snapshots = [type("S", (), {"version": v})() for v in ("a", "b", "c")]
+    for snap in snapshots:
+        history.record("k", snap)
+    assert history.get("k", "a") is None
+    assert history.get("k", "c") is snapshots[2]
+    history.record("other", snapshots[0])
+    assert history.get("k", "c") is None
+    assert history.stats() == {"keys": 1, "versions": 1}
@@ -0,0 +1,83 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from benchmarks.synthetic import synthetic_graph_inputs
+from src.services import graph_layout
+from src.services.graph_layout import cap_layout, force_layout, sphere_layout
+from src.services.graph_store import GraphStore
+
+
+def _graph(n_entities, seed=3):
+    inputs = synthetic_graph_inputs(n_entities, seed=seed)
+    store = GraphStore.from_dicts(inputs["entities"], inputs["edges"])
+    return len(store.names), np.array(store.edge_src), np.array(store.edge_tgt)
+
+
+def _edge_to_random_ratio(pos, src, tgt):
+    rng = np.random.default_rng(0)
+    a, b = rng.integers(0, len(pos), 5000), rng.integers(0, len(pos), 5000)
+    return np.linalg.norm(pos[src] - pos[tgt], axis=1).mean() / np.linalg.norm(pos[a] - pos[b], axis=1).mean()
+
+
+@pytest.mark.parametrize("dim", [2, 3])
+def test_layout_is_deterministic_and_rescaled(dim):
+    n, src, tgt = _graph(300)
+    pos = force_layout(n, src, tgt, dim=dim, iterations=20)
+    assert pos.shape == (n, dim)
+    assert np.abs(pos).max() == pytest.approx(1.0)
+    np.testing.assert_array_equal(pos, force_layout(n, src, tgt, dim=dim, iterations=20))
+    assert _edge_to_random_ratio(pos, src, tgt) < 0.5
+
+
+def test_mesh_repulsion_approximates_exact_sum():
+    rng = np.random.default_rng(1)
+    pos = rng.random((2000, 2))
+    k = (1.0 / len(pos)) ** 0.5
+    exact = graph_layout._exact_repulsion(pos, k, 0.01 * k)
+    mesh = graph_layout._mesh_repulsion(pos, k, 256)
+    cosine = (exact * mesh).sum(axis=1) / (np.linalg.norm(exact, axis=1) * np.linalg.norm(mesh, axis=1))
+    assert np.median(cosine) > 0.95
+
+
+def test_large_graph_uses_mesh_and_keeps_edges_short(monkeypatch):
+    n, src, tgt = _graph(3000)
+    monkeypatch.setattr(graph_layout, "EXACT_REPULSION_LIMIT", {2: 100, 3: 100})
+    pos = force_layout(n, src, tgt, iterations=30)
+    assert np.isfinite(pos).all()
+    assert _edge_to_random_ratio(pos, src, tgt) < 0.3
+
+
+def _shape(pos):
+    """Positions up to translation and scale, which plotly's autoscaled axes ignore."""
+    pos = pos - pos.mean(axis=0)
+    return pos / np.sqrt((pos * pos).sum(axis=1).mean())
+
+
+def test_seeded_layout_stays_close_and_places_new_nodes_by_neighbours():
+    n, src, tgt = _graph(500)
+    before = force_layout(n, src, tgt)
+    seed = before.copy()
+    new = np.arange(0, n, 50)
+    seed[new] = np.nan
+    after = force_layout(n, src, tgt, pos=seed, iterations=10, temperature=0.01)
+    unseeded = force_layout(n, src, tgt, seed=7)
+    old = np.setdiff1d(np.arange(n), new)
+
+    def drift(pos):
+        return np.linalg.norm(_shape(pos)[old] - _shape(before)[old], axis=1).mean()
+
+    assert drift(after) < 0.25 < drift(unseeded)
+    assert _edge_to_random_ratio(after, src, tgt) < 0.5
+
+
+def test_sphere_and_cap_layouts_stay_on_the_unit_sphere():
+    n, src, tgt = _graph(300)
+    pos = sphere_layout(n, src, tgt)
+    assert np.allclose(np.linalg.norm(pos, axis=1), 1.0)
+    center = pos[0]
+    for size in (1, 5, 40):
+        cap = cap_layout(center, size, [k for k in range(size - 1)], [k + 1 for k in range(size - 1)], 0.2)
+        assert np.allclose(np.linalg.norm(cap, axis=1), 1.0)
+        # Within the cap's angular radius of its center (the tangent plane wrap only shrinks angles)
+        assert (np.arccos(np.clip(cap @ center, -1.0, 1.0)) <= 0.2 + 1e-9).all()
@@ -1,4 +1,5 @@
-from src.services.graph_service import get_graph_data
+from benchmarks.synthetic import write_synthetic_db
+from src.services.graph_service import MAX_EDGES_PER_ENTITY, build_graph_overview, get_community_data, get_graph_data, get_viz_context
 
 def test_get_graph_data_service(mock_db_path):
     data = get_graph_data(mock_db_path)
@@ -16,3 +17,42 @@ def test_get_graph_data_service_filters(mock_db_path):
     assert "communityData" in data
     assert "error" not in data
     assert len(data["metaElements"]) > 0
+
+def test_lazy_slices_match_full_payload(mock_db_path):
+    full = get_graph_data(mock_db_path)
+    ctx = get_viz_context(mock_db_path)
+
+    overview = build_graph_overview(ctx)
+    assert overview["metaElements"] == full["metaElements"]
+    assert overview["commSummaries"] == full["commSummaries"]
+
+    community = get_community_data(ctx, 0)
+    assert community["entities"] == full["communityData"][0]["entities"]
+    assert community["edges"] == full["communityData"][0]["edges"]
+    assert get_community_data(ctx, 99) is None
+
+def test_paged_community_covers_members_once_with_bounded_edges(tmp_path):
+    path = str(tmp_path / "graphrag.db")
+    write_synthetic_db(path, 1500, n_communities=3, n_semantic_groups=200, seed=8)
+    ctx = get_viz_context(path)
+    comm_id = max(ctx.cyto_community_summaries, key=lambda c: ctx.viz_community_counts[c])
+    full = get_community_data(ctx, comm_id)
+
+    seen, groups, offset = [], [], 0
+    while True:
+        page = get_community_data(ctx, comm_id, max_entities=100, offset=offset)
+        assert page["total_entities"] == len(full["entities"])
+        assert len(page["entities"]) <= 100
+        assert len(page["edges"]) <= MAX_EDGES_PER_ENTITY * len(page["entities"])
+        seen += [ent["data"]["id"] for ent in page["entities"]]
+        groups += [sg["data"]["id"] for sg in page["semantic_groups"]]
+        if not page["more"]:
+            break
+        (more,) = page["more"]
+        assert more["data"]["member_count"] == len(full["entities"]) - len(seen)
+        offset = more["data"]["next_offset"]
+
+    assert sorted(seen) == sorted(ent["data"]["id"] for ent in full["entities"])
+    assert sorted(groups) == sorted(sg["data"]["id"] for sg in full["semantic_groups"])
+    pagerank = [ent["data"]["pagerank"] for ent in get_community_data(ctx, comm_id, max_entities=100)["entities"]]
+    assert pagerank == sorted(pagerank, reverse=True)
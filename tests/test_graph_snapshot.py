@@ -0,0 +1,63 @@
+import sqlite3
+
+from benchmarks.synthetic import write_synthetic_db
+from src.services.graph_service import build_viz_payload, load_graph_inputs
+from src.services.graph_snapshot import cached_build, load_graph_snapshot, read_latest, write_latest
+
+
+def _db(tmp_path):
+    path = str(tmp_path / "graphrag.db")
+    write_synthetic_db(path, 300, seed=4)
+    return path
+
+
+def test_snapshot_round_trips_graph_inputs(tmp_path):
+    path, cache = _db(tmp_path), str(tmp_path / "cache")
+    first = load_graph_snapshot(path, 5, include_orphans=False, cache_dir=cache)
+    second = load_graph_snapshot(path, 5, include_orphans=False, cache_dir=cache)
+    expected = build_viz_payload(**load_graph_inputs(path, 5, include_orphans=False))
+    assert build_viz_payload(**first) == build_viz_payload(**second) == expected
+    assert len(list((tmp_path / "cache").iterdir())) == 1
+
+
+def test_cached_build_reuses_snapshot_until_db_changes(tmp_path):
+    path, cache = _db(tmp_path), str(tmp_path / "cache")
+    calls = []
+
+    def build():
+        calls.append(1)
+        return {"n": len(calls)}
+
+    assert cached_build(path, "k", build, cache) == {"n": 1}
+    assert cached_build(path, "k", build, cache) == {"n": 1}
+    assert cached_build(path, "other", build, cache) == {"n": 2}
+
+    conn = sqlite3.connect(path)
+    conn.execute("UPDATE entities SET pagerank = 0.5 WHERE id = 1")
+    conn.commit()
+    conn.close()
+
+    assert cached_build(path, "k", build, cache) == {"n": 3}
+    # Snapshots of the previous DB version are pruned on the first write after the change
+    assert len(list((tmp_path / "cache").iterdir())) == 1
+
+
+def test_unreadable_snapshot_is_rebuilt(tmp_path):
+    path, cache = _db(tmp_path), str(tmp_path / "cache")
+    cached_build(path, "k", lambda: [1, 2, 3], cache)
+    (snapshot,) = (tmp_path / "cache").iterdir()
+    snapshot.write_bytes(b"not a pickle")
+    assert cached_build(path, "k", lambda: [4], cache) == [4]
+    assert cached_build(path, "k", lambda: [5], cache) == [4]
+
+
+def test_latest_values_survive_db_changes(tmp_path):
+    path, cache = _db(tmp_path), str(tmp_path / "cache")
+    assert read_latest(path, "layout", cache) is None
+    write_latest(path, "layout", "v1", {"A": (0.0, 1.0)}, cache)
+    conn = sqlite3.connect(path)
+    conn.execute("UPDATE entities SET pagerank = 0.5 WHERE id = 1")
+    conn.commit()
+    conn.close()
+    cached_build(path, "k", lambda: 1, cache)  # prunes older versions' snapshots
+    assert read_latest(path, "layout", cache) == ("v1", {"A": (0.0, 1.0)})
@@ -0,0 +1,139 @@
+import sqlite3
+
+import pytest
+
+from benchmarks.synthetic import synthetic_graph_inputs, write_synthetic_db
+from src.services.db import content_hash, migrate_graph_db
+from src.services.graph_service import (
+    build_viz_payload,
+    get_graph_data,
+    load_chunk_lookup,
+    load_community_summaries,
+    load_entities,
+    load_entity_chunk_map,
+    load_relationships,
+    load_semantic_groups,
+    prepare_viz_data,
+)
+from src.services.graph_store import GraphScope, GraphStore, load_graph_store
+
+
+def test_load_graph_store_matches_dict_loaders(tmp_path):
+    path = str(tmp_path / "graphrag.db")
+    write_synthetic_db(path, 300, seed=5)
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    entities = load_entities(cursor)
+    edges = load_relationships(cursor)
+    store = load_graph_store(cursor)
+    conn.close()
+
+    assert store.names[:store.n_entities] == list(entities)
+    for i, name in enumerate(store.names[:store.n_entities]):
+        e = entities[name]
+        assert store.community_of(i) == e["community"]
+        assert store.pagerank[i] == (e["pagerank"] or 0.0)
+        assert store.types[store.type_ids[i]] == e["type"]
+        assert store.num_sources_of(i) == e["num_sources"]
+    assert [(store.names[store.edge_src[k]], store.names[store.edge_tgt[k]], store.weight_of(k))
+            for k in range(store.n_edges)] == [(s, t, a["weight"]) for s, t, a in edges]
+
+
+def test_store_and_dict_paths_build_the_same_payload():
+    inputs = synthetic_graph_inputs(400, seed=9)
+    entities, edges = inputs.pop("entities"), inputs.pop("edges")
+    store = GraphStore.from_dicts(entities, edges)
+    assert build_viz_payload(store, **inputs) == prepare_viz_data(entities, edges, **inputs)
+
+
+def test_degrees_count_endpoints_without_entity_rows():
+    entities = {name: {"community": c} for name, c in [("A", 0), ("B", 0), ("C", 1), ("D", None)]}
+    edges = [("A", "B", {}), ("B", "C", {}), ("A", "GHOST", {}), ("D", "A", {"weight": None})]
+    store = GraphStore.from_dicts(entities, edges)
+    assert list(store.degrees()) == [3, 2, 1, 1, 1]
+    assert store.community_of(3) is None
+    assert store.weight_of(3) is None
+
+
+def _filter_in_python(path, top_communities):
+    """The old load-everything-then-filter path, as an oracle for the scoped loaders."""
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    entities = load_entities(cursor)
+    edges = load_relationships(cursor)
+    inputs = dict(community_summaries=load_community_summaries(cursor), chunk_lookup=load_chunk_lookup(cursor),
+                  semantic_groups=load_semantic_groups(cursor), entity_chunk_map=load_entity_chunk_map(cursor))
+    conn.close()
+    if top_communities > 0:
+        counts = {}
+        for e in entities.values():
+            if e["community"] is not None and e["community"] >= 0:
+                counts[e["community"]] = counts.get(e["community"], 0) + 1
+        top_set = set(sorted(counts, key=lambda c: -counts[c])[:top_communities])
+        entities = {n: e for n, e in entities.items() if e["community"] in top_set}
+        edges = [(s, t, a) for s, t, a in edges if s in entities and t in entities]
+        inputs["community_summaries"] = {k: v for k, v in inputs["community_summaries"].items() if k in top_set}
+    return entities, edges, inputs
+
+
+@pytest.fixture(scope="module")
+def synthetic_db(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("scoped") / "graphrag.db")
+    write_synthetic_db(path, 800, seed=13)
+    return path
+
+
+@pytest.mark.parametrize("top_communities", [0, 1, 5, 40])
+@pytest.mark.parametrize("include_orphans", [False, True])
+def test_scoped_loads_match_python_filtering(synthetic_db, top_communities, include_orphans):
+    entities, edges, inputs = _filter_in_python(synthetic_db, top_communities)
+    expected = prepare_viz_data(entities, edges, include_orphans=include_orphans, **inputs)
+    actual = get_graph_data(synthetic_db, top_communities=top_communities, include_orphans=include_orphans)
+    assert actual == expected
+
+
+def test_scope_reads_only_kept_rows(synthetic_db):
+    entities, edges, _ = _filter_in_python(synthetic_db, 3)
+    degree = {}
+    for s, t, _ in edges:
+        degree[s] = degree.get(s, 0) + 1
+        degree[t] = degree.get(t, 0) + 1
+    conn = sqlite3.connect(synthetic_db)
+    cursor = conn.cursor()
+    top = sorted({e["community"] for e in entities.values()})
+    store = load_graph_store(cursor, GraphScope(tuple(top), include_orphans=False))
+    chunk_map = load_entity_chunk_map(cursor, GraphScope(tuple(top), include_orphans=False))
+    conn.close()
+
+    assert store.names == [n for n in entities if degree.get(n)]
+    assert store.n_edges == len(edges)
+    assert set(chunk_map) <= set(store.names)
+
+
+def test_chunk_lookup_hashes_match_before_and_after_migration(tmp_path):
+    path = str(tmp_path / "graphrag.db")
+    write_synthetic_db(path, 200, seed=2)
+    conn = sqlite3.connect(path)
+    stored = load_chunk_lookup(conn.cursor())  # hashes the pipeline wrote at insert time
+    # Databases from before the pipeline wrote content_hash have no such column
+    conn.execute("ALTER TABLE chunks DROP COLUMN content_hash")
+    conn.commit()
+    before = load_chunk_lookup(conn.cursor())
+    conn.close()
+    assert before == stored
+    assert "chunks.content_hash" in migrate_graph_db(path)
+    conn = sqlite3.connect(path)
+    after = load_chunk_lookup(conn.cursor())
+    conn.close()
+    assert before == after
+    assert all("text" not in c for c in after.values())
+
+    # Rows written after the migration without a hash are hashed from their text, not left as None
+    conn = sqlite3.connect(path)
+    conn.executemany("INSERT INTO chunks (content, chunk_index, source_ref) VALUES (?, ?, 'web:new')",
+                     [("first new text", 900), ("second new text", 901)])
+    added = load_chunk_lookup(conn.cursor())
+    conn.close()
+    assert {i: added[i] for i in after} == after
+    assert added[900]["hash"] == content_hash("first new text")
+    assert added[901]["hash"] == content_hash("second new text")
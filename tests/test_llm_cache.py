@@ -0,0 +1,40 @@
+from src.services.llm_cache import LLMResponseCache, llm_cache_key
+
+
+def test_key_covers_model_template_prompt_and_options():
+    base = llm_cache_key("m", "entities/1", "prompt", options={"temperature": 0.0})
+    assert base == llm_cache_key("m", "entities/1", "prompt", options={"temperature": 0.0})
+    assert base != llm_cache_key("other", "entities/1", "prompt", options={"temperature": 0.0})
+    assert base != llm_cache_key("m", "entities/2", "prompt", options={"temperature": 0.0})
+    assert base != llm_cache_key("m", "entities/1", "prompt!", options={"temperature": 0.0})
+    assert base != llm_cache_key("m", "entities/1", "prompt", system="be brief", options={"temperature": 0.0})
+    assert base != llm_cache_key("m", "entities/1", "prompt", options={"temperature": 0.3})
+
+
+def test_responses_persist_across_instances(tmp_path):
+    path = str(tmp_path / "llm.db")
+    with LLMResponseCache(path) as cache:
+        assert cache.get("k") is None
+        cache.put("k", "answer")
+        assert cache.get("k") == "answer"
+        assert cache.stats()["hit_rate"] == 0.5
+    with LLMResponseCache(path) as cache:
+        assert cache.get("k") == "answer"
+        assert cache.stats() | {"max_bytes": 0} == {
+            "entries": 1, "bytes": 6, "max_bytes": 0, "hits": 1, "misses": 0,
+            "writes": 0, "evictions": 0, "hit_rate": 1.0,
+        }
+
+
+def test_least_recently_used_entries_are_evicted_by_size(tmp_path):
+    with LLMResponseCache(str(tmp_path / "llm.db"), max_bytes=350) as cache:
+        for key in "abc":
+            cache.put(key, key * 100)
+        assert cache.get("a") == "a" * 100  # now the most recently used
+        cache.put("d", "d" * 100)
+        assert cache.get("b") is None
+        assert [cache.get(key) is not None for key in "acd"] == [True, True, True]
+        cache.put("e", "e" * 1000)  # larger than the whole cache: not stored
+        assert cache.get("e") is None
+        stats = cache.stats()
+        assert (stats["entries"], stats["bytes"], stats["evictions"]) == (3, 300, 1)
@@ -0,0 +1,45 @@
+import gzip
+import json
+
+from src.services.columnar import COLUMNAR_MEDIA_TYPE
+from src.services.payload import JSON_MEDIA_TYPE, choose_encoding, choose_media_type, encode_payload, etag_matches, ndjson_chunks
+
+def test_encode_payload_variants_round_trip():
+    data = {"metaElements": [{"data": {"id": "comm-0", "label": "Café"}}], "communityData": {0: {}}}
+    payload = encode_payload(data, (1, 2, 3), (0, False, 2))
+    assert json.loads(payload.body) == {"metaElements": [{"data": {"id": "comm-0", "label": "Café"}}], "communityData": {"0": {}}}
+    assert gzip.decompress(payload.gzip) == payload.body
+    assert payload.etag.startswith('"') and payload.etag.endswith('"')
+
+def test_etag_depends_on_fingerprint_and_params():
+    a = encode_payload({}, (1, 2, 3), (0, False, 2))
+    assert encode_payload({}, (1, 2, 3), (0, False, 2)).etag == a.etag
+    assert encode_payload({}, (9, 2, 3), (0, False, 2)).etag != a.etag
+    assert encode_payload({}, (1, 2, 3), (0, True, 2)).etag != a.etag
+    assert etag_matches(f'"other", {a.etag}', a.etag)
+    assert not etag_matches(None, a.etag)
+
+def test_choose_encoding_respects_q_values():
+    payload = encode_payload({}, (1,), "k")
+    assert choose_encoding("gzip, deflate", payload) == "gzip"
+    assert choose_encoding("gzip;q=0", payload) == "identity"
+    assert choose_encoding("", payload) == "identity"
+    expected = "br" if payload.br is not None else "gzip"
+    assert choose_encoding("gzip, br", payload) == expected
+
+def test_ndjson_chunks_batch_whole_records():
+    records = [{"type": "community", "id": i, "label": "Café"} for i in range(50)]
+    chunks = list(ndjson_chunks(iter(records), flush_bytes=200))
+    assert len(chunks) > 1
+    assert all(c.endswith(b"\n") for c in chunks)
+    assert [json.loads(line) for line in b"".join(chunks).splitlines()] == records
+    assert list(ndjson_chunks(iter([]))) == []
+
+def test_choose_media_type_and_columnar_etag():
+    assert choose_media_type("") == JSON_MEDIA_TYPE
+    assert choose_media_type("application/json, */*") == JSON_MEDIA_TYPE
+    assert choose_media_type(f"{COLUMNAR_MEDIA_TYPE}, application/json;q=0.9") == COLUMNAR_MEDIA_TYPE
+    assert choose_media_type(f"{COLUMNAR_MEDIA_TYPE};q=0") == JSON_MEDIA_TYPE
+    columnar = encode_payload({}, (1,), "k", COLUMNAR_MEDIA_TYPE)
+    assert columnar.media_type == COLUMNAR_MEDIA_TYPE
+    assert columnar.etag != encode_payload({}, (1,), "k").etag
@@ -0,0 +1,86 @@
+import json
+import random
+import sqlite3
+import struct
+
+import pytest
+
+from benchmarks.synthetic import write_synthetic_db
+from src.services.retrieval import HALF_LIVES, load_retrieval_index, search
+
+np = pytest.importorskip("numpy")
+
+DIM = 16
+
+
+def write_retrieval_db(path, n_entities=300, seed=5):
+    """Synthetic graph plus random entity embeddings (most entities) and sources of every content type."""
+    write_synthetic_db(path, n_entities, seed=seed)
+    rnd = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.executemany("INSERT INTO sources (source_id, content_type) VALUES (?, ?)",
+                     [("arxiv:1", "research_paper"), ("wiki:1", "reference")])
+    ids = [row[0] for row in conn.execute("SELECT id FROM entities ORDER BY id")]
+    for entity_id in ids[:40]:
+        refs = rnd.choice([["arxiv:1"], ["wiki:1"], ["web:synthetic", "arxiv:1"], ["unknown"], []])
+        conn.execute("UPDATE entities SET source_refs = ? WHERE id = ?", (json.dumps(refs), entity_id))
+    conn.execute("CREATE TABLE entity_embeddings (entity_id INTEGER PRIMARY KEY, embedding BLOB)")
+    vectors = {entity_id: [rnd.gauss(0, 1) for _ in range(DIM)] for entity_id in ids if rnd.random() < 0.9}
+    conn.executemany("INSERT INTO entity_embeddings VALUES (?, ?)",
+                     [(entity_id, struct.pack(f"{DIM}f", *v)) for entity_id, v in vectors.items()])
+    conn.commit()
+    conn.close()
+    return vectors
+
+
+def reference_scores(path, vectors, query, weights, age):
+    """Notebook 03's per-entity scoring, over every embedded entity."""
+    conn = sqlite3.connect(path)
+    types = dict(conn.execute("SELECT source_id, content_type FROM sources"))
+    rows = {r[0]: r[1:] for r in conn.execute("SELECT id, pagerank, source_refs FROM entities")}
+    conn.close()
+    max_pagerank = max(rows[entity_id][0] for entity_id in vectors)
+    q = np.array(query) / np.linalg.norm(query)
+    scores = {}
+    for entity_id, vector in vectors.items():
+        pagerank, refs = rows[entity_id]
+        half_life = max([HALF_LIVES["news"]] + [HALF_LIVES.get(types.get(s), 7) for s in json.loads(refs or "[]")])
+        semantic = float(np.dot(vector, q) / np.linalg.norm(vector))
+        temporal = 0.5 ** (age / half_life)
+        scores[entity_id] = weights[0] * semantic + weights[1] * temporal + weights[2] * pagerank / max_pagerank
+    return scores
+
+
+@pytest.mark.parametrize("weights,age", [((0.6, 0.2, 0.2), 0.0), ((0.5, 0.3, 0.2), 20.0), ((1.0, 0.0, 0.0), 3.0)])
+def test_vectorized_scores_match_row_by_row_scoring(tmp_path, weights, age):
+    path = str(tmp_path / "graphrag.db")
+    vectors = write_retrieval_db(path)
+    index = load_retrieval_index(path)
+    assert len(index) == len(vectors) and index.dim == DIM
+
+    query = [random.Random(1).gauss(0, 1) for _ in range(DIM)]
+    results = search(index, path, query, top_k=12, semantic_weight=weights[0], temporal_weight=weights[1],
+                     graph_weight=weights[2], content_age_days=age)
+    expected = reference_scores(path, vectors, query, weights, age)
+    best = sorted(expected, key=lambda entity_id: -expected[entity_id])[:12]
+
+    assert [r.entity_id for r in results] == best
+    for r in results:
+        assert r.final_score == pytest.approx(expected[r.entity_id], abs=1e-5)
+        assert r.name and r.entity_type
+    assert all(a.final_score >= b.final_score for a, b in zip(results, results[1:]))
+
+
+def test_index_handles_small_and_empty_tables(tmp_path):
+    path = str(tmp_path / "graphrag.db")
+    write_retrieval_db(path, n_entities=30)
+    index = load_retrieval_index(path)
+    assert len(search(index, path, [1.0] * DIM, top_k=1000)) == len(index)
+    with pytest.raises(ValueError):
+        index.top_k([1.0] * (DIM + 1))
+
+    conn = sqlite3.connect(path)
+    conn.execute("DELETE FROM entity_embeddings")
+    conn.commit()
+    conn.close()
+    assert search(load_retrieval_index(path), path, [1.0] * DIM) == []
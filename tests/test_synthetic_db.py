@@ -0,0 +1,32 @@
+import sqlite3
+
+from benchmarks.synthetic import write_synthetic_db
+from src.services.graph_service import get_graph_data
+
+
+def test_write_synthetic_db_sizes(tmp_path):
+    db_path = str(tmp_path / "graphrag.db")
+    counts = write_synthetic_db(db_path, 300, n_edges=900, n_communities=12, n_chunks=50, n_semantic_groups=8, seed=3)
+    assert counts["entities"] == 300
+    assert counts["relationships"] == 900
+    assert counts["community_summaries"] == 12
+    assert counts["chunks"] == 50
+    assert counts["semantic_groups"] == 8
+    assert counts["entity_chunk_map"] > 0
+
+    conn = sqlite3.connect(db_path)
+    dangling = conn.execute(
+        "SELECT COUNT(*) FROM relationships r LEFT JOIN entities e ON e.id = r.source_id WHERE e.id IS NULL"
+    ).fetchone()[0]
+    conn.close()
+    assert dangling == 0
+
+
+def test_synthetic_db_loads_through_graph_service(tmp_path):
+    db_path = str(tmp_path / "graphrag.db")
+    write_synthetic_db(db_path, 500, seed=5)
+    data = get_graph_data(db_path)
+    assert "error" not in data
+    assert data["metaElements"]
+    assert data["communityData"]
+    assert data["chunkHashes"]
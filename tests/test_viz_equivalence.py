@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+from benchmarks.synthetic import synthetic_graph_inputs
+from src.services.db import content_hash
+from src.services.graph_service import prepare_viz_data
+from tests.reference_viz import prepare_viz_data as reference_prepare_viz_data
+
+def canonical(data):
+    """Payload with hash-order-dependent parts normalized.
+
+    The reference iterates entities in set order, the columnar builder in
+    entity id order, so entity element order and chunk text numbering differ
+    between the two while the content must not. The reference inlines chunk
+    texts where the builder sends content hashes, so both become hashes.
+    """
+    data = json.loads(json.dumps(data))
+    for block in data["communityData"].values():
+        block["entities"].sort(key=lambda el: el["data"]["id"])
+    if "chunkTexts" in data:
+        texts = [content_hash(text) for text in data.pop("chunkTexts")]
+        key = "text_idx"
+    else:
+        texts, key = data.pop("chunkHashes"), "hash_idx"
+    for refs in data["chunkRefs"].values():
+        for ref in refs:
+            ref["hash"] = texts[ref.pop(key)]
+    return json.dumps(data, sort_keys=True)
+
+@pytest.mark.parametrize("include_orphans", [False, True])
+@pytest.mark.parametrize("min_community_size", [1, 2, 5])
+def test_columnar_builder_matches_reference(include_orphans, min_community_size):
+    inputs = synthetic_graph_inputs(600, seed=7)
+    expected = reference_prepare_viz_data(**inputs, include_orphans=include_orphans, min_community_size=min_community_size)
+    actual = prepare_viz_data(**inputs, include_orphans=include_orphans, min_community_size=min_community_size)
+    assert canonical(actual) == canonical(expected)
+
+def test_columnar_builder_matches_reference_on_irregular_data():
+    inputs = synthetic_graph_inputs(200, seed=3)
+    entities = inputs["entities"]
+    entities["ENTITY 1"]["community"] = None  # unassigned entities and sanitizer-hostile names
+    entities["A.B(c)"] = dict(entities["ENTITY 2"])
+    entities["   "] = dict(entities["ENTITY 3"])
+    inputs["edges"].append(("A.B(c)", "ENTITY 1", {"description": "", "weight": 1.0}))
+    inputs["edges"].append(("ENTITY 1", "ENTITY 1", {"description": "self", "weight": 1.0}))
+    inputs["edges"].append(("ENTITY 4", "NOT AN ENTITY", {"description": "dangling", "weight": 1.0}))
+    inputs["semantic_groups"].append({"group_id": 999, "canonical": "A.B(c)", "members": ["A.B(c)", "ENTITY 2", "ENTITY 2"], "member_similarities": {}})
+
+    expected = reference_prepare_viz_data(**inputs, include_orphans=True, min_community_size=1)
+    actual = prepare_viz_data(**inputs, include_orphans=True, min_community_size=1)
+    assert canonical(actual) == canonical(expected)
+
+def test_columnar_builder_orders_entities_by_load_order():
+    inputs = synthetic_graph_inputs(300, seed=11)
+    position = {name: i for i, name in enumerate(inputs["entities"])}
+    data = prepare_viz_data(**inputs)
+    for block in data["communityData"].values():
+        labels = [el["data"]["label"] for el in block["entities"]]
+        assert labels == sorted(labels, key=position.__getitem__)
@@ -0,0 +1,65 @@
+import sqlite3
+
+import pytest
+
+from benchmarks.synthetic import write_synthetic_db
+from src.services.graph_layout import LAYOUT_AVAILABLE
+from src.services.graph_service import build_community_block, build_graph_overview, get_viz_context
+from src.services.viz_materialize import load_viz_overview, load_viz_positions, materialize_viz
+
+
+@pytest.fixture
+def synthetic_db(tmp_path):
+    path = str(tmp_path / "graphrag.db")
+    write_synthetic_db(path, 600, seed=21)
+    return path
+
+
+def test_load_viz_overview_needs_materialized_tables(synthetic_db):
+    assert load_viz_overview(synthetic_db, False, 2) is None
+    counts = materialize_viz(synthetic_db)
+    assert counts["viz_community_stats"] > 0 and counts["viz_inter_community_edges"] > 0
+    assert load_viz_overview(synthetic_db, False, 2) is not None
+
+
+@pytest.mark.parametrize("include_orphans", [False, True])
+@pytest.mark.parametrize("min_community_size", [1, 2, 8])
+def test_materialized_overview_matches_live(synthetic_db, include_orphans, min_community_size):
+    materialize_viz(synthetic_db)
+    overview = load_viz_overview(synthetic_db, include_orphans, min_community_size)
+    ctx = get_viz_context(synthetic_db, include_orphans=include_orphans, min_community_size=min_community_size)
+    assert build_graph_overview(overview) == build_graph_overview(ctx)
+
+
+@pytest.mark.skipif(not LAYOUT_AVAILABLE, reason="layout hints need numpy")
+@pytest.mark.parametrize("include_orphans", [False, True])
+def test_materialized_layout_hints_match_live(synthetic_db, include_orphans):
+    materialize_viz(synthetic_db)
+    live = get_viz_context(synthetic_db, include_orphans=include_orphans, layout_hints=True)
+    stored = get_viz_context(synthetic_db, include_orphans=include_orphans, layout_hints=True)
+    assert load_viz_positions(stored, synthetic_db, include_orphans)
+    assert len(stored.entity_positions) == len(stored.community_members)
+
+    overview = load_viz_overview(synthetic_db, include_orphans, 2, layout_hints=True)
+    assert build_graph_overview(overview) == build_graph_overview(stored) == build_graph_overview(live)
+    assert all("fx" in el["data"] for el in build_graph_overview(live)["metaElements"] if "source" not in el["data"])
+    for comm_id in live.cyto_community_summaries:
+        block = build_community_block(live, comm_id)
+        assert build_community_block(stored, comm_id) == block
+        assert all({"fx", "fy", "fz"} <= el["data"].keys() for el in block["entities"] + block["semantic_groups"])
+
+
+def test_graph_writes_mark_tables_stale(synthetic_db):
+    materialize_viz(synthetic_db)
+    conn = sqlite3.connect(synthetic_db)
+    conn.execute("UPDATE entities SET pagerank = 1.0 WHERE id = (SELECT MIN(id) FROM entities)")
+    conn.commit()
+    conn.close()
+    assert load_viz_overview(synthetic_db, False, 2) is None
+
+    materialize_viz(synthetic_db)
+    conn = sqlite3.connect(synthetic_db)
+    conn.execute("DROP TRIGGER viz_stale_relationships_delete")
+    conn.commit()
+    conn.close()
+    assert load_viz_overview(synthetic_db, False, 2) is None